@@ -0,0 +1,330 @@
+from __future__ import annotations
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import numpy as np
+from datetime import datetime, timezone
+from typing import Callable, Optional, Any, Sequence
+from fragments.params import ParamStorage
+from fragments.strategy import (
+    Strategy,
+    ConditionalStrategy,
+    ConditionType,
+    CrossoverStrategy,
+    LimiterStrategy,
+    InvertingStrategy,
+)
+from fragments.indicators import Indicator, RSI, SMA, ATR
+from fragments.optim import optimize
+from fragments import stats, metrics, vectorized, compiled
+
+
+def gbm_ohlcv(
+    n_bars: int,
+    seed: int = 0,
+    start: float = 100.0,
+    drift: float = 0.0,
+    volatility: float = 0.002,
+) -> np.ndarray:
+    # geometric brownian motion closes, every bar opens at the previous close
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(drift - volatility**2 / 2, volatility, n_bars)
+    close = start * np.exp(np.cumsum(returns))
+    ohlcv = np.empty((n_bars, 5), dtype=np.float64)
+    ohlcv[:, 3] = close
+    ohlcv[0, 0] = start
+    ohlcv[1:, 0] = close[:-1]
+    wicks = np.abs(rng.normal(0, volatility / 2, (2, n_bars)))
+    ohlcv[:, 1] = np.maximum(ohlcv[:, 0], close) * (1 + wicks[0])
+    ohlcv[:, 2] = np.minimum(ohlcv[:, 0], close) * (1 - wicks[1])
+    ohlcv[:, 4] = rng.lognormal(10, 1, n_bars)
+    return ohlcv
+
+
+def _crossover(param_storage: ParamStorage) -> CrossoverStrategy:
+    strategy = CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage)
+    strategy.first_indicator.period.value = 10
+    strategy.second_indicator.period.value = 50
+    return strategy
+
+
+def _conditional(param_storage: ParamStorage) -> ConditionalStrategy:
+    strategy = ConditionalStrategy(RSI(param_storage), param_storage)
+    strategy.indicator.period.value = 14
+    strategy.condition_threshold.value = 50
+    strategy.condition_type.value = ConditionType.MORE_THAN
+    return strategy
+
+
+def _limiter(param_storage: ParamStorage) -> LimiterStrategy:
+    strategy = LimiterStrategy(
+        ATR(param_storage), param_storage, _crossover(param_storage)
+    )
+    strategy.indicator.period.value = 14
+    strategy.limiter_multiplier.value = 200
+    return strategy
+
+
+def _inverting(param_storage: ParamStorage) -> InvertingStrategy:
+    strategy = InvertingStrategy(None, param_storage, _crossover(param_storage))
+    strategy.invert_drawdown_duration.value = 30
+    return strategy
+
+
+STRATEGIES: dict[str, Callable[[ParamStorage], Strategy]] = {
+    "conditional": _conditional,
+    "crossover": _crossover,
+    "limiter": _limiter,
+    "inverting": _inverting,
+}
+
+ENGINES: dict[str, Optional[Callable]] = {
+    "per_bar": None,
+    "vectorized": vectorized.forward_all,
+    "compiled": compiled.forward_all,
+    "compiled_top": compiled.forward_top,
+}
+
+
+def _measure(run: Callable[[], Any], repeat: int, memory: bool) -> dict[str, Any]:
+    # timings come from untraced runs, tracemalloc slows python code down a lot
+    times = list()
+    for _ in range(repeat):
+        Indicator.cache.clear()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        Indicator.cache.clear()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": min(times), "peak_memory": peak}
+
+
+def _run(
+    strategy: Strategy,
+    engine: Optional[Callable],
+    ohlcv: np.ndarray,
+    ohlcv_list: list,
+    precalculation: bool,
+) -> Callable[[], Any]:
+    def run():
+        if engine is not None:
+            return engine(strategy, ohlcv)
+        if precalculation:
+            Indicator.enable_precalculation(ohlcv)
+        try:
+            strategy.forward_all(ohlcv_list)
+        finally:
+            Indicator.disable_precalculation()
+
+    return run
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = (10**4, 10**5, 10**6),
+    strategies: Sequence[str] = tuple(STRATEGIES),
+    engines: Sequence[str] = tuple(ENGINES),
+    per_bar_limit: int = 10**6,
+    optimize_limit: int = 10**5,
+    n_calls: int = 20,
+    repeat: int = 1,
+    memory: bool = True,
+    seed: int = 0,
+    verbose: bool = False,
+) -> list[dict[str, Any]]:
+    results = list()
+
+    def record(n_bars: int, n_runs: int = 1, **entry):
+        entry["n_bars"] = n_bars
+        entry["bars_per_second"] = (
+            n_bars * n_runs / entry["seconds"] if entry["seconds"] else None
+        )
+        results.append(entry)
+        if verbose:
+            print(
+                " ".join(f"{key}={value}" for key, value in entry.items()),
+                file=sys.stderr,
+            )
+
+    for n_bars in sizes:
+        ohlcv = gbm_ohlcv(n_bars, seed)
+        # the per-bar engine is fed rows the way pickled data is
+        ohlcv_list = ohlcv.tolist() if n_bars <= per_bar_limit else list()
+        for name in strategies:
+            for engine_name in engines:
+                engine = ENGINES[engine_name]
+                if engine is None and n_bars > per_bar_limit:
+                    continue
+                for precalculation in [False, True] if engine is None else [False]:
+                    strategy = STRATEGIES[name](ParamStorage())
+                    record(
+                        n_bars,
+                        benchmark="forward_all",
+                        strategy=name,
+                        engine=engine_name,
+                        precalculation=precalculation,
+                        **_measure(
+                            _run(strategy, engine, ohlcv, ohlcv_list, precalculation),
+                            repeat,
+                            memory,
+                        ),
+                    )
+
+            strategy = STRATEGIES[name](ParamStorage())
+            vectorized.forward_all(strategy, ohlcv)
+            for metric, func in [
+                ("equity", stats.equity),
+                ("total_profit", stats.total_profit),
+                ("sqn", stats.sqn),
+                ("compute_metrics", metrics.compute_metrics),
+            ]:
+                record(
+                    n_bars,
+                    benchmark="stats",
+                    strategy=name,
+                    metric=metric,
+                    n_trades=len(strategy.trades),
+                    **_measure(lambda: func(strategy), repeat, memory),
+                )
+
+            if n_bars > optimize_limit:
+                continue
+            for engine_name in engines:
+                engine = ENGINES[engine_name]
+                if engine is None and n_bars > per_bar_limit:
+                    continue
+                strategy = STRATEGIES[name](ParamStorage())
+
+                def run_optimize():
+                    if engine is None:
+                        Indicator.enable_precalculation(ohlcv)
+                    try:
+                        optimize(
+                            strategy,
+                            stats.equity,
+                            ohlcv_list if engine is None else ohlcv,
+                            engine,
+                            n_calls=n_calls,
+                            random_state=seed,
+                        )
+                    finally:
+                        Indicator.disable_precalculation()
+
+                # every call runs the whole dataset once
+                record(
+                    n_bars,
+                    n_calls,
+                    benchmark="optimize",
+                    strategy=name,
+                    engine=engine_name,
+                    n_calls=n_calls,
+                    **_measure(run_optimize, 1, False),
+                )
+    return results
+
+
+def environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _key(entry: dict[str, Any]) -> tuple:
+    return tuple(
+        (key, value)
+        for key, value in sorted(entry.items())
+        if key not in ("seconds", "bars_per_second", "peak_memory", "n_trades")
+    )
+
+
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any]
+) -> list[tuple[dict[str, Any], float]]:
+    # time ratios current / baseline of the benchmarks both files ran
+    seconds = {_key(entry): entry["seconds"] for entry in baseline["results"]}
+    return [
+        (entry, entry["seconds"] / seconds[_key(entry)])
+        for entry in current["results"]
+        if seconds.get(_key(entry))
+    ]
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m fragments.benchmark",
+        description="time fragments on synthetic GBM data",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES))
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES))
+    parser.add_argument("--per-bar-limit", type=int, default=10**6)
+    parser.add_argument("--optimize-limit", type=int, default=10**5)
+    parser.add_argument("--n-calls", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="earlier output to compare against")
+    args = parser.parse_args(argv)
+
+    report = {
+        "environment": environment(),
+        "results": run_benchmarks(
+            args.sizes,
+            args.strategies,
+            args.engines,
+            args.per_bar_limit,
+            args.optimize_limit,
+            args.n_calls,
+            args.repeat,
+            not args.no_memory,
+            args.seed,
+            verbose=True,
+        ),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for entry, ratio in compare(baseline, report):
+            name = " ".join(
+                str(value)
+                for key, value in entry.items()
+                if key not in ("seconds", "bars_per_second", "peak_memory", "n_trades")
+            )
+            print(f"{ratio:6.2f}x {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import numpy as np
+from typing import Optional
+from fragments import cproc
+from fragments.indicators import OHLCV
+from fragments.strategy import (
+    Strategy,
+    FrozenStrategy,
+    ConditionalStrategy,
+    CrossoverStrategy,
+    LimiterStrategy,
+    InvertingStrategy,
+)
+from fragments.vectorized import (
+    as_ohlcv_array,
+    get_chain,
+    frozen_actions,
+    duration_multiplier,
+)
+
+
+SUPPORTED_LAYERS = (
+    ConditionalStrategy,
+    LimiterStrategy,
+    CrossoverStrategy,
+    InvertingStrategy,
+)
+
+
+def _series(indicator, ohlcv: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(indicator.series(ohlcv), dtype=np.float64)
+
+
+def build_kernel(chain: list[Strategy], ohlcv: np.ndarray) -> cproc.ChainKernel:
+    kernel = cproc.ChainKernel(
+        ohlcv.shape[0], chain[-1].context.fee, len(chain)
+    )
+    configure_kernel(kernel, chain, ohlcv)
+    return kernel
+
+
+def configure_kernel(
+    kernel: cproc.ChainKernel, chain: list[Strategy], ohlcv: np.ndarray
+):
+    # writes the current parameter values and indicator series of every layer
+    for index, layer in enumerate(chain):
+        if isinstance(layer, ConditionalStrategy):
+            lower_bound, upper_bound = layer.condition_threshold.bounds
+            kernel.set_conditional(
+                index,
+                _series(layer.indicator, ohlcv),
+                layer.condition_threshold.value,
+                layer.condition_type.value,
+                layer.condition_logic.value if layer.condition_logic else 0,
+                layer.on_condition.value,
+                layer._freeze_bounds,
+                lower_bound,
+                upper_bound,
+            )
+        elif isinstance(layer, LimiterStrategy):
+            kernel.set_limiter(
+                index,
+                _series(layer.indicator, ohlcv),
+                layer.limiter_multiplier.value,
+                layer.limiter_type.value,
+                layer._limiter_threshold,
+            )
+        elif isinstance(layer, CrossoverStrategy):
+            kernel.set_crossover(
+                index,
+                _series(layer.first_indicator, ohlcv),
+                _series(layer.second_indicator, ohlcv),
+                layer.crossover_handling.value,
+            )
+        elif isinstance(layer, InvertingStrategy):
+            layer._duration_multiplier = duration_multiplier(layer)
+            if layer.indicator is not None:
+                layer.indicator.reset()
+            kernel.set_inverting(
+                index,
+                layer.invert_drawdown_duration.value * layer._duration_multiplier,
+                layer._invert,
+                layer.indicator.stream if layer.indicator is not None else None,
+            )
+        else:
+            raise NotImplementedError(
+                f"{type(layer).__name__} is not supported by the compiled engine"
+            )
+
+
+def store_results(
+    chain: list[Strategy],
+    kernel: cproc.ChainKernel,
+    n_bars: int,
+    record: Optional[list[bool]] = None,
+):
+    # layers that did not record keep the results of their last full run, only
+    # the bounds a run fits are taken over
+    for index, layer in enumerate(chain):
+        layer_kernel = kernel.kernel(index)
+        state = kernel.layer_state(index)
+        if record is not None and not record[index]:
+            if isinstance(layer, ConditionalStrategy):
+                layer.condition_threshold.bounds = state["bounds"]
+            continue
+        layer.iteration = n_bars
+        layer.action = state["action"]
+        layer.equity = layer_kernel.equity
+        layer.hist_equity = layer_kernel.hist_equity()
+        layer.trade_log = layer_kernel.trade_log()
+        layer._in_trade = layer_kernel.in_trade
+        layer._last_trade_equity = layer_kernel.last_trade_equity
+        if isinstance(layer, ConditionalStrategy):
+            layer.condition_threshold.bounds = state["bounds"]
+        elif isinstance(layer, LimiterStrategy):
+            layer._limiter_threshold = state["limiter_threshold"]
+        elif isinstance(layer, CrossoverStrategy):
+            layer._prev_first_value, layer._prev_second_value = state["prev_values"]
+        elif isinstance(layer, InvertingStrategy):
+            layer._peak_equity = state["peak_equity"]
+            layer._drawdown_duration = state["drawdown_duration"]
+            layer._invert = state["invert"]
+
+
+class CompiledChain:
+    strategy: Strategy
+    chain: list[Strategy]
+    frozen: Optional[FrozenStrategy]
+    record: list[bool]
+    _layers: list[Strategy]
+    _kernel: Optional[cproc.ChainKernel]
+    _kernel_for: Optional[tuple[int, float]]
+
+    def __init__(self, strategy: Strategy, keep_intermediate: bool = False):
+        # the chain is walked and checked once, every run only reads the current
+        # parameter values into a kernel that runs all layers in one loop over the bars
+        self.strategy = strategy
+        self._layers = get_chain(strategy)
+        self.chain = self._layers
+        self.frozen = None
+        if isinstance(self.chain[0], FrozenStrategy):
+            self.frozen = self.chain[0]
+            self.chain = self.chain[1:]
+        for layer in self.chain:
+            if not isinstance(layer, SUPPORTED_LAYERS):
+                raise NotImplementedError(
+                    f"{type(layer).__name__} is not supported by the compiled engine"
+                )
+        # intermediate layers only pass their actions on, unless they trade on
+        # their own results or the caller wants their equity and trades
+        self.record = [
+            keep_intermediate
+            or layer is strategy
+            or isinstance(layer, (LimiterStrategy, InvertingStrategy))
+            for layer in self.chain
+        ]
+        self._kernel = None
+        self._kernel_for = None
+
+    def __getstate__(self) -> dict:
+        # kernels hold raw buffers, copies compile their own on their first run
+        return {**vars(self), "_kernel": None, "_kernel_for": None}
+
+    def compiles(self, strategy: Strategy) -> bool:
+        # whether strategy is still the chain this was compiled from
+        layers = get_chain(strategy)
+        return len(layers) == len(self._layers) and all(
+            a is b for a, b in zip(layers, self._layers)
+        )
+
+    def _prepare_kernel(self, n_bars: int) -> cproc.ChainKernel:
+        # the kernel and its buffers are kept while the bars and the fee stay the
+        # same, runs only configure it again
+        kernel = self._kernel
+        fee = self.strategy.context.fee
+        if kernel is None or self._kernel_for != (n_bars, fee):
+            kernel = self._kernel = cproc.ChainKernel(n_bars, fee, len(self.chain))
+            self._kernel_for = (n_bars, fee)
+            for index, record in enumerate(self.record):
+                if not record:
+                    kernel.set_record(index, False)
+        else:
+            kernel.reset()
+        return kernel
+
+    def run(self, ohlcv_list: list[OHLCV] | np.ndarray) -> np.ndarray:
+        ohlcv = as_ohlcv_array(ohlcv_list)
+        self.strategy.plan().run(ohlcv)
+        previous_actions = None
+        if self.frozen is not None:
+            previous_actions = frozen_actions(self.frozen, ohlcv.shape[0])
+        actions = np.empty(ohlcv.shape[0], dtype=np.int32)
+        kernel = self._prepare_kernel(ohlcv.shape[0])
+        configure_kernel(kernel, self.chain, ohlcv)
+        kernel.run(ohlcv, previous_actions, actions)
+        store_results(self.chain, kernel, ohlcv.shape[0], self.record)
+        if isinstance(self.strategy, ConditionalStrategy):
+            self.strategy._freeze_bounds = True
+        return actions
+
+
+def compiled_chain(strategy: Strategy, keep_intermediate: bool) -> CompiledChain:
+    # the engines below keep what they compiled on the top layer, so repeated runs,
+    # such as those of optimize, compile a chain once and only write new values
+    chains = vars(strategy).setdefault("_compiled_chains", dict())
+    chain = chains.get(keep_intermediate)
+    if chain is None or not chain.compiles(strategy):
+        chain = chains[keep_intermediate] = CompiledChain(strategy, keep_intermediate)
+    return chain
+
+
+def forward_all(
+    strategy: Strategy, ohlcv_list: list[OHLCV] | np.ndarray
+) -> np.ndarray:
+    return compiled_chain(strategy, keep_intermediate=True).run(ohlcv_list)
+
+
+def forward_top(
+    strategy: Strategy, ohlcv_list: list[OHLCV] | np.ndarray
+) -> np.ndarray:
+    # an engine for optimize, which only scores the top layer
+    return compiled_chain(strategy, keep_intermediate=False).run(ohlcv_list)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+import threading
+from contextlib import contextmanager
+import numpy as np
+from typing import Optional, Iterator, Any
+from fragments.params import ParamStorage
+
+_local = threading.local()
+
+
+def _members(strategy: Any) -> Iterator[Any]:
+    from fragments.strategy import FrozenStrategy
+    from fragments.indicators import Indicator
+
+    layer = strategy
+    while layer is not None:
+        yield layer
+        for attribute in vars(layer).values():
+            if isinstance(attribute, Indicator):
+                yield attribute
+        if isinstance(layer, FrozenStrategy):
+            yield from _members(layer.strategy)
+        layer = layer.previous
+
+
+class BacktestContext:
+    fee: float
+    precalc_ohlcv: Optional[np.ndarray]
+    _param_storage: ParamStorage
+
+    def __init__(
+        self,
+        fee: float = 0.0,
+        precalc_ohlcv: Optional[Any] = None,
+        param_storage: Optional[ParamStorage] = None,
+    ):
+        self.fee = fee
+        self.precalc_ohlcv = None
+        if precalc_ohlcv is not None:
+            self.enable_precalculation(precalc_ohlcv)
+        self._param_storage = (
+            param_storage if param_storage is not None else ParamStorage()
+        )
+
+    @property
+    def param_storage(self) -> ParamStorage:
+        # where strategies and indicators created without a storage put their cells
+        return self._param_storage
+
+    @property
+    def precalc(self) -> bool:
+        return self.precalc_ohlcv is not None
+
+    def enable_precalculation(self, ohlcv_list: Any):
+        self.precalc_ohlcv = np.asarray(ohlcv_list, dtype=np.float64)
+
+    def disable_precalculation(self):
+        self.precalc_ohlcv = None
+
+    def bind(self, strategy: Any):
+        # every layer and indicator of the chain keeps this context, whatever thread
+        # or active context it runs under
+        for member in _members(strategy):
+            member._context = self
+
+    @contextmanager
+    def bound(self, strategy: Any) -> Iterator[BacktestContext]:
+        members = list(_members(strategy))
+        previous = [member._context for member in members]
+        for member in members:
+            member._context = self
+        try:
+            yield self
+        finally:
+            for member, context in zip(members, previous):
+                member._context = context
+
+    def __deepcopy__(self, memo: dict) -> BacktestContext:
+        # copies of a strategy keep running in the context of the original
+        return self
+
+    def __enter__(self) -> BacktestContext:
+        if not hasattr(_local, "stack"):
+            _local.stack = list()
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, *_):
+        _local.stack.pop()
+
+
+class _DefaultContext(BacktestContext):
+    # the process wide context the class methods always worked on, its storage is
+    # ParamStorage.global_storage
+    def __init__(self):
+        self.fee = 0.0
+        self.precalc_ohlcv = None
+
+    @property
+    def param_storage(self) -> ParamStorage:
+        if not ParamStorage.global_storage_active:
+            ParamStorage.new_global()
+        return ParamStorage.global_storage
+
+
+default_context: BacktestContext = _DefaultContext()
+
+
+def current_context() -> BacktestContext:
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else default_context
+
+
+def unbind(strategy: Any):
+    # the chain follows the active context again
+    for member in _members(strategy):
+        member._context = None
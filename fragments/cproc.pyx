@@ -10,6 +10,173 @@ cpdef enum TradeDirection:
     SHORT = 2
 
 
+cimport cython
+from libc.stdlib cimport malloc, calloc, realloc, free
+from libc.string cimport memcpy
+from libc.math cimport isnan, sqrt, fabs, fma, NAN
+import numpy as np
+
+
+# One trade of a TradeLog. TRADE_DTYPE describes the same layout to NumPy, so the
+# log is a structured array that C code writes through a plain pointer.
+cdef struct TradeEntry:
+    int direction
+    long long iteration
+    long long exit_iteration
+    double value
+    double fee
+    double entry_close
+    double exit_close
+    double profit
+    char liquidation
+
+
+TRADE_DTYPE = np.dtype(
+    [
+        ("direction", np.int32),
+        ("iteration", np.int64),
+        ("exit_iteration", np.int64),
+        ("value", np.float64),
+        ("fee", np.float64),
+        ("entry_close", np.float64),
+        ("exit_close", np.float64),
+        ("profit", np.float64),
+        ("liquidation", np.bool_),
+    ],
+    align=True,
+)
+if TRADE_DTYPE.itemsize != sizeof(TradeEntry):
+    raise ImportError("TRADE_DTYPE does not match the TradeEntry layout")
+
+
+cdef inline void _init_trade(
+    TradeEntry* trade, int direction, double value, long long iteration, double fee
+) noexcept nogil:
+    trade.direction = direction
+    trade.iteration = iteration
+    trade.exit_iteration = iteration
+    trade.value = value
+    trade.fee = fee
+    trade.entry_close = NAN
+    trade.exit_close = NAN
+    trade.profit = -(value / 100 * fee) if fee != 0 else 0.0
+    trade.liquidation = 0
+
+
+@cython.cdivision(True)
+cdef inline void _mark_trade(
+    TradeEntry* trade, double close, long long iteration
+) noexcept nogil:
+    # profit follows from the entry close and the latest close, the opening fee is
+    # charged on the whole position; a liquidated trade stays liquidated
+    cdef double ratio, opening_profit
+    trade.exit_iteration = iteration
+    if trade.liquidation:
+        return
+    trade.exit_close = close
+    if isnan(trade.entry_close):
+        trade.entry_close = close
+        return
+    ratio = close / trade.entry_close
+    opening_profit = -(trade.value / 100 * trade.fee) if trade.fee != 0 else 0.0
+    if trade.direction == TradeDirection.LONG:
+        trade.profit = (trade.value + opening_profit) * ratio - trade.value
+    else:
+        trade.profit = trade.value - (trade.value - opening_profit) * ratio
+    if trade.profit <= -trade.value:
+        trade.liquidation = 1
+        trade.profit = -trade.value
+
+
+cdef class TradeLog:
+    cdef object _records
+    cdef TradeEntry* _entries
+    cdef Py_ssize_t size
+
+    def __cinit__(self, Py_ssize_t capacity=64):
+        self._allocate(capacity)
+        self.size = 0
+
+    cdef int _allocate(self, Py_ssize_t capacity) except -1:
+        cdef unsigned char[::1] raw
+        records = np.zeros(max(capacity, 1), dtype=TRADE_DTYPE)
+        if self.size:
+            records[: self.size] = self._records[: self.size]
+        raw = records.view(np.uint8)
+        self._records = records
+        self._entries = <TradeEntry*>&raw[0]
+        return 0
+
+    cdef TradeEntry* last(self) noexcept:
+        return &self._entries[self.size - 1]
+
+    cdef int open_trade(
+        self, int direction, double value, long long iteration, double fee
+    ) except -1:
+        if self.size == self._records.shape[0]:
+            self._allocate(self.size * 2)
+        _init_trade(&self._entries[self.size], direction, value, iteration, fee)
+        self.size += 1
+        return 0
+
+    cdef int extend(self, const TradeEntry* entries, Py_ssize_t n) except -1:
+        if self.size + n > self._records.shape[0]:
+            self._allocate(self.size + n)
+        if n:
+            memcpy(&self._entries[self.size], entries, n * sizeof(TradeEntry))
+        self.size += n
+        return 0
+
+    def open(self, int direction, double value, long long iteration, double fee):
+        self.open_trade(direction, value, iteration, fee)
+
+    def mark(self, double close, long long iteration):
+        if self.size == 0:
+            raise IndexError("no open trade")
+        _mark_trade(self.last(), close, iteration)
+
+    @property
+    def capacity(self):
+        return self._records.shape[0]
+
+    def view(self):
+        records = self._records[: self.size].view(np.recarray)
+        records.flags.writeable = False
+        return records
+
+    def copy(self):
+        return TradeLog.from_records(self._records[: self.size])
+
+    @staticmethod
+    def from_records(records):
+        records = np.asarray(records, dtype=TRADE_DTYPE)
+        cdef TradeLog trade_log = TradeLog(records.shape[0])
+        trade_log._records[: records.shape[0]] = records
+        trade_log.size = records.shape[0]
+        return trade_log
+
+    @staticmethod
+    def from_trades(trades):
+        cdef TradeLog trade_log = TradeLog(len(trades))
+        cdef TradeEntry* entry
+        for trade in trades:
+            trade_log.open_trade(trade.direction, trade.value, trade.iteration, trade.fee)
+            entry = trade_log.last()
+            entry.exit_iteration = trade.iteration + max(trade.duration - 1, 0)
+            entry.profit = trade.profit
+            entry.liquidation = trade.liquidation
+        return trade_log
+
+    def __len__(self):
+        return self.size
+
+    def __reduce__(self):
+        return (TradeLog.from_records, (np.array(self._records[: self.size]),))
+
+    def __repr__(self):
+        return f"TradeLog(size={self.size}, capacity={self.capacity})"
+
+
 def apply_strategy_action(self, ohlcv, int action, int logic_only = 0):
     cdef int action_logic, result_action
     cdef int direction_switch = 0
@@ -27,33 +194,35 @@ def apply_strategy_action(self, ohlcv, int action, int logic_only = 0):
         return
 
     cdef int in_trade = self._in_trade
+    cdef TradeLog trade_log = self.trade_log
+    cdef double close = ohlcv[3]
 
     if result_action == Action.BUY:
         if not in_trade:
             self._in_trade = True
             self._new_trade(TradeDirection.LONG)
-        elif self._in_trade and self.trades[-1].direction == TradeDirection.SHORT:
-            self.trades[-1].forward(ohlcv)
-            self.equity = self._last_trade_equity + self.trades[-1].profit
+        elif self._in_trade and trade_log.last().direction == TradeDirection.SHORT:
+            _mark_trade(trade_log.last(), close, self.iteration)
+            self.equity = self._last_trade_equity + trade_log.last().profit
             direction_switch = 1
             self._new_trade(TradeDirection.LONG)
     elif result_action == Action.SELL:
         if not in_trade:
             self._in_trade = True
             self._new_trade(TradeDirection.SHORT)
-        elif self._in_trade and self.trades[-1].direction == TradeDirection.LONG:
-            self.trades[-1].forward(ohlcv)
-            self.equity = self._last_trade_equity + self.trades[-1].profit
+        elif self._in_trade and trade_log.last().direction == TradeDirection.LONG:
+            _mark_trade(trade_log.last(), close, self.iteration)
+            self.equity = self._last_trade_equity + trade_log.last().profit
             direction_switch = 1
             self._new_trade(TradeDirection.SHORT)
     elif result_action == Action.CANCEL:
         self._in_trade = False
     if self._in_trade:
-        self.trades[-1].forward(ohlcv)
+        _mark_trade(trade_log.last(), close, self.iteration)
         # if direction_switch:
         #     self.equity = self.hist_equity[self.trades[-2].iteration - 2] + self.trades[-2].profit
         # else:
-        self.equity = self._last_trade_equity + self.trades[-1].profit
+        self.equity = self._last_trade_equity + trade_log.last().profit
     self.hist_equity.append(self.equity)
 
 
@@ -111,10 +280,11 @@ cpdef enum LimiterType:
 def forward_limiter(self, ohlcv):
     cdef int action
     cdef float trade_profit, limiter_threshold
+    cdef TradeLog trade_log = self.trade_log
     action = Action.PASS
     indicator_value = self.indicator.forward(ohlcv)
-    if len(self.trades) != 0:
-        trade_profit = self.trades[-1].profit
+    if trade_log.size != 0:
+        trade_profit = trade_log.last().profit
         if trade_profit == 0 and indicator_value is not None:
             limiter_threshold = indicator_value * (
                 self.limiter_multiplier.value / 100
@@ -203,4 +373,998 @@ def forward_inverting(self, ohlcv):
             action = Action.SELL
         elif current_action == Action.SELL:
             action = Action.BUY
-    apply_strategy_action(self, ohlcv, action)
\ No newline at end of file
+    apply_strategy_action(self, ohlcv, action)
+
+# Streaming indicators. Constant work and memory per bar, and the same floating
+# point operations in the same order as TA-Lib 0.6, so every value is bit for bit
+# the one of the precalculated series. Its ATR is built twice and picks the build
+# that fuses the smoothing into one multiply-add on CPUs that have FMA; the
+# streaming ATR makes the same choice.
+
+cdef extern from *:
+    """
+    static int fragments_cpu_has_fma(void) {
+    #if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+        __builtin_cpu_init();
+        return __builtin_cpu_supports("fma");
+    #else
+        return 0;
+    #endif
+    }
+    """
+    int fragments_cpu_has_fma() nogil
+
+cdef bint _fused_atr = fragments_cpu_has_fma()
+
+cpdef enum StreamKind:
+    SMA = 1
+    RSI = 2
+    ATR = 3
+
+
+cdef struct StreamState:
+    int kind
+    int period
+    # inputs seen, leading NaN inputs are skipped like TA-Lib does
+    Py_ssize_t count
+    double total
+    double prev_value
+    double gain
+    double loss
+    double* window
+
+
+cdef inline double _true_range(
+    double high, double low, double prev_close
+) noexcept nogil:
+    cdef double greatest = high - low
+    cdef double value = fabs(prev_close - high)
+    if value > greatest:
+        greatest = value
+    value = fabs(prev_close - low)
+    if value > greatest:
+        greatest = value
+    return greatest
+
+
+cdef inline double _rsi_value(double gain, double loss) noexcept nogil:
+    cdef double total = gain + loss
+    if total > 0:
+        return (gain / total) * 100.0
+    return 0.0
+
+
+# The steps take the bar's index t since the first input, and what they share with
+# other series of the same data: the trailing close of a window, the difference
+# of two closes and the true range.
+
+cdef inline double _sma_step(
+    StreamState* stream, Py_ssize_t t, double close, double trailing
+) noexcept nogil:
+    cdef double value
+    stream.total += close
+    if t < stream.period - 1:
+        return NAN
+    value = stream.total
+    stream.total -= trailing
+    return value / stream.period
+
+
+cdef inline double _rsi_step(StreamState* stream, Py_ssize_t t, double diff) noexcept nogil:
+    cdef int period = stream.period
+    if t > period:
+        stream.loss *= period - 1
+        stream.gain *= period - 1
+    if diff > 0:
+        stream.gain += diff
+    else:
+        stream.loss -= diff
+    if t < period:
+        return NAN
+    stream.loss *= 1.0 / period
+    stream.gain *= 1.0 / period
+    return _rsi_value(stream.gain, stream.loss)
+
+
+cdef inline double _atr_step(
+    StreamState* stream, Py_ssize_t t, double true_range
+) noexcept nogil:
+    cdef int period = stream.period
+    cdef double factor
+    if period <= 1:
+        return true_range
+    if t < period:
+        stream.total += true_range
+        return NAN
+    if t == period:
+        stream.total += true_range
+        stream.total /= period
+        return stream.total
+    factor = <double>(period - 1) / period
+    if _fused_atr:
+        stream.total = fma(stream.total, factor, true_range * (1.0 - factor))
+    else:
+        stream.total = stream.total * factor + true_range * (1.0 - factor)
+    return stream.total
+
+
+cdef double _stream_update(
+    StreamState* stream, double high, double low, double close
+) noexcept nogil:
+    cdef Py_ssize_t t = stream.count
+    cdef int period = stream.period
+    cdef double previous
+    if t == 0 and (
+        isnan(close)
+        or (stream.kind == StreamKind.ATR and (isnan(high) or isnan(low)))
+    ):
+        return NAN
+    stream.count += 1
+    if stream.kind == StreamKind.SMA:
+        stream.window[t % period] = close
+        return _sma_step(stream, t, close, stream.window[(t + 1) % period])
+    previous = stream.prev_value
+    stream.prev_value = close
+    if t == 0:
+        return NAN
+    if stream.kind == StreamKind.RSI:
+        return _rsi_step(stream, t, close - previous)
+    return _atr_step(stream, t, _true_range(high, low, previous))
+
+
+cdef class StreamingIndicator:
+    cdef StreamState state
+
+    def __cinit__(self, int kind, int period):
+        if period < 1:
+            raise ValueError(f"period must be at least 1, got {period}")
+        self.state.kind = kind
+        self.state.period = period
+        if kind == StreamKind.SMA:
+            self.state.window = <double*>malloc(period * sizeof(double))
+            if self.state.window == NULL:
+                raise MemoryError()
+        self.reset()
+
+    def __dealloc__(self):
+        free(self.state.window)
+
+    @property
+    def kind(self):
+        return StreamKind(self.state.kind)
+
+    @property
+    def period(self):
+        return self.state.period
+
+    def reset(self):
+        self.state.count = 0
+        self.state.total = 0.0
+        self.state.prev_value = 0.0
+        self.state.gain = 0.0
+        self.state.loss = 0.0
+
+    cpdef double update(self, double high, double low, double close):
+        return _stream_update(&self.state, high, low, close)
+
+    def __reduce__(self):
+        # copies of a strategy continue the stream where the original is
+        cdef Py_ssize_t i
+        window = None
+        if self.state.window != NULL:
+            window = [self.state.window[i] for i in range(self.state.period)]
+        return (
+            _restore_stream,
+            (
+                self.state.kind,
+                self.state.period,
+                self.state.count,
+                self.state.total,
+                self.state.prev_value,
+                self.state.gain,
+                self.state.loss,
+                window,
+            ),
+        )
+
+    def run(self, const double[:, :] ohlcv):
+        # a whole series, NaN until the first value like the talib functions
+        cdef Py_ssize_t i
+        result = np.empty(ohlcv.shape[0], dtype=np.float64)
+        cdef double[::1] values = result
+        with nogil:
+            for i in range(ohlcv.shape[0]):
+                values[i] = _stream_update(
+                    &self.state, ohlcv[i, 1], ohlcv[i, 2], ohlcv[i, 3]
+                )
+        return result
+
+
+def _restore_stream(kind, period, count, total, prev_value, gain, loss, window):
+    cdef StreamingIndicator stream = StreamingIndicator(kind, period)
+    cdef Py_ssize_t i
+    stream.state.count = count
+    stream.state.total = total
+    stream.state.prev_value = prev_value
+    stream.state.gain = gain
+    stream.state.loss = loss
+    if window is not None:
+        for i in range(period):
+            stream.state.window[i] = window[i]
+    return stream
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def fused_series(const double[:, :] ohlcv, kinds, periods):
+    # every requested series in one pass over the bars, the close difference and
+    # the true range are computed once per bar for all RSI and ATR series
+    cdef Py_ssize_t n_series = len(kinds)
+    cdef Py_ssize_t n_bars = ohlcv.shape[0]
+    cdef Py_ssize_t i, j, t
+    cdef Py_ssize_t start_close = n_bars, start_bar = n_bars
+    cdef double close, diff = NAN, true_range = NAN
+    cdef StreamState* states
+    cdef double** outputs
+    cdef StreamState* state
+    cdef double[::1] view
+    if len(periods) != n_series:
+        raise ValueError("kinds and periods differ in length")
+    for i in range(n_bars):
+        if start_close == n_bars and not isnan(ohlcv[i, 3]):
+            start_close = i
+        if not (isnan(ohlcv[i, 1]) or isnan(ohlcv[i, 2]) or isnan(ohlcv[i, 3])):
+            start_bar = i
+            break
+    results = [np.empty(n_bars, dtype=np.float64) for _ in range(n_series)]
+    if n_bars == 0 or n_series == 0:
+        return results
+    states = <StreamState*>calloc(n_series, sizeof(StreamState))
+    outputs = <double**>calloc(n_series, sizeof(double*))
+    if states == NULL or outputs == NULL:
+        free(states)
+        free(outputs)
+        raise MemoryError()
+    try:
+        for j in range(n_series):
+            if periods[j] < 1:
+                raise ValueError(f"period must be at least 1, got {periods[j]}")
+            if kinds[j] not in (StreamKind.SMA, StreamKind.RSI, StreamKind.ATR):
+                raise ValueError(f"unknown stream kind {kinds[j]}")
+            states[j].kind = kinds[j]
+            states[j].period = periods[j]
+            view = results[j]
+            outputs[j] = &view[0]
+        with nogil:
+            for i in range(n_bars):
+                close = ohlcv[i, 3]
+                if i > start_close:
+                    diff = close - ohlcv[i - 1, 3]
+                if i > start_bar:
+                    true_range = _true_range(ohlcv[i, 1], ohlcv[i, 2], ohlcv[i - 1, 3])
+                for j in range(n_series):
+                    state = &states[j]
+                    if state.kind == StreamKind.ATR:
+                        t = i - start_bar
+                        outputs[j][i] = (
+                            _atr_step(state, t, true_range) if t > 0 else NAN
+                        )
+                    elif state.kind == StreamKind.RSI:
+                        t = i - start_close
+                        outputs[j][i] = _rsi_step(state, t, diff) if t > 0 else NAN
+                    else:
+                        t = i - start_close
+                        outputs[j][i] = (
+                            _sma_step(
+                                state,
+                                t,
+                                close,
+                                ohlcv[i - state.period + 1, 3]
+                                if t >= state.period - 1
+                                else 0.0,
+                            )
+                            if t >= 0
+                            else NAN
+                        )
+    finally:
+        free(states)
+        free(outputs)
+    return results
+
+
+# Whole-series kernels. They reproduce apply_strategy_action bar by bar on plain
+# C state, so that a layer's trades and equity can be computed from precalculated
+# action/indicator arrays without Python objects.
+
+cdef struct LayerState:
+    double equity
+    double last_trade_equity
+    bint in_trade
+    TradeEntry* trades
+    Py_ssize_t n_trades
+    Py_ssize_t trades_capacity
+    double* hist_equity
+    Py_ssize_t n_hist
+
+
+cdef inline int _new_trade(
+    LayerState* state, int direction, long iteration, double fee
+) noexcept nogil:
+    cdef TradeEntry* trades
+    cdef Py_ssize_t capacity
+    if state.n_trades == state.trades_capacity:
+        capacity = state.trades_capacity * 2 if state.trades_capacity else 64
+        trades = <TradeEntry*>realloc(state.trades, capacity * sizeof(TradeEntry))
+        if trades == NULL:
+            return -1
+        state.trades = trades
+        state.trades_capacity = capacity
+    state.last_trade_equity = state.equity
+    _init_trade(
+        &state.trades[state.n_trades],
+        direction,
+        100.0 if state.equity >= 100.0 else state.equity,
+        iteration,
+        fee,
+    )
+    state.n_trades += 1
+    return 0
+
+
+cdef inline int _apply_action(
+    LayerState* state, int action, double close, long iteration, double fee
+) noexcept nogil:
+    cdef TradeEntry* last
+    if state.equity < 0.01:
+        return 0
+    if action == Action.BUY:
+        if not state.in_trade:
+            state.in_trade = 1
+            if _new_trade(state, TradeDirection.LONG, iteration, fee):
+                return -1
+        elif state.trades[state.n_trades - 1].direction == TradeDirection.SHORT:
+            last = &state.trades[state.n_trades - 1]
+            _mark_trade(last, close, iteration)
+            state.equity = state.last_trade_equity + last.profit
+            if _new_trade(state, TradeDirection.LONG, iteration, fee):
+                return -1
+    elif action == Action.SELL:
+        if not state.in_trade:
+            state.in_trade = 1
+            if _new_trade(state, TradeDirection.SHORT, iteration, fee):
+                return -1
+        elif state.trades[state.n_trades - 1].direction == TradeDirection.LONG:
+            last = &state.trades[state.n_trades - 1]
+            _mark_trade(last, close, iteration)
+            state.equity = state.last_trade_equity + last.profit
+            if _new_trade(state, TradeDirection.SHORT, iteration, fee):
+                return -1
+    elif action == Action.CANCEL:
+        state.in_trade = 0
+    if state.in_trade:
+        last = &state.trades[state.n_trades - 1]
+        _mark_trade(last, close, iteration)
+        state.equity = state.last_trade_equity + last.profit
+    state.hist_equity[state.n_hist] = state.equity
+    state.n_hist += 1
+    return 0
+
+
+cdef inline int _resolve_action(int action, int previous_action) noexcept nogil:
+    if action == Action.PASS:
+        return previous_action
+    return action
+
+
+cdef class LayerKernel:
+    cdef LayerState state
+    cdef Py_ssize_t n_bars
+    cdef double fee
+    cdef object _hist_equity
+    cdef public double limiter_threshold
+    cdef public double peak_equity
+    cdef public long drawdown_duration
+    cdef public bint invert
+
+    def __cinit__(self, Py_ssize_t n_bars, double fee):
+        self.state.trades = NULL
+        self.state.trades_capacity = 0
+        self.n_bars = n_bars
+        self.fee = fee
+        self.reset()
+
+    def __dealloc__(self):
+        free(self.state.trades)
+
+    def reset(self):
+        # starts over for another run on as many bars, the trade buffer is kept but
+        # the history is new, earlier ones may still be referenced
+        cdef double[::1] hist_equity_view
+        self.state.equity = 100.0
+        self.state.last_trade_equity = 0.0
+        self.state.in_trade = 0
+        self.state.n_trades = 0
+        self.state.n_hist = 0
+        self._hist_equity = np.empty(max(self.n_bars, 1), dtype=np.float64)
+        hist_equity_view = self._hist_equity
+        self.state.hist_equity = &hist_equity_view[0]
+        self.limiter_threshold = 0.0
+        self.peak_equity = 0.0
+        self.drawdown_duration = 0
+        self.invert = 0
+
+    @property
+    def equity(self):
+        return self.state.equity
+
+    @property
+    def last_trade_equity(self):
+        return self.state.last_trade_equity
+
+    @property
+    def in_trade(self):
+        return bool(self.state.in_trade)
+
+    def hist_equity(self):
+        return self._hist_equity[: self.state.n_hist]
+
+    def trade_log(self):
+        cdef TradeLog trade_log = TradeLog(self.state.n_trades)
+        trade_log.extend(self.state.trades, self.state.n_trades)
+        return trade_log
+
+    def run_actions(self, const double[:] close, const int[:] actions):
+        cdef Py_ssize_t i
+        cdef int failed = 0
+        with nogil:
+            for i in range(close.shape[0]):
+                if _apply_action(&self.state, actions[i], close[i], i + 1, self.fee):
+                    failed = 1
+                    break
+        if failed:
+            raise MemoryError()
+
+    def run_limiter(
+        self,
+        const double[:] close,
+        const int[:] previous_actions,
+        const double[:] indicator,
+        int limiter_multiplier,
+        int limiter_type,
+        int[:] actions,
+    ):
+        cdef Py_ssize_t i
+        cdef int action, failed = 0
+        cdef float trade_profit, limiter_threshold
+        cdef float threshold = self.limiter_threshold
+        with nogil:
+            for i in range(close.shape[0]):
+                action = Action.PASS
+                if self.state.n_trades != 0:
+                    trade_profit = <float>self.state.trades[self.state.n_trades - 1].profit
+                    if trade_profit == 0 and not isnan(indicator[i]):
+                        limiter_threshold = <float>(
+                            indicator[i] * (limiter_multiplier / 100.0)
+                        )
+                        threshold = limiter_threshold
+                    else:
+                        limiter_threshold = threshold
+                    if (
+                        limiter_type == LimiterType.STOP_LOSS
+                        and trade_profit <= -limiter_threshold
+                    ):
+                        action = Action.CANCEL
+                    elif trade_profit > limiter_threshold:
+                        action = Action.CANCEL
+                action = _resolve_action(action, previous_actions[i])
+                actions[i] = action
+                if _apply_action(&self.state, action, close[i], i + 1, self.fee):
+                    failed = 1
+                    break
+        self.limiter_threshold = threshold
+        if failed:
+            raise MemoryError()
+
+    def run_inverting(
+        self,
+        const double[:] close,
+        const int[:] previous_actions,
+        StreamingIndicator stream,
+        double duration_limit,
+        int[:] actions,
+    ):
+        cdef Py_ssize_t i
+        cdef int action, previous_action, failed = 0
+        cdef double processed_equity
+        cdef StreamState* state = NULL
+        cdef double peak_equity = self.peak_equity
+        cdef long drawdown_duration = self.drawdown_duration
+        cdef bint invert = self.invert
+        if stream is not None:
+            state = &stream.state
+        with nogil:
+            for i in range(close.shape[0]):
+                previous_action = previous_actions[i]
+                processed_equity = self.state.equity
+                if state != NULL:
+                    processed_equity = _stream_update(state, 0.0, 0.0, processed_equity)
+                if not isnan(processed_equity):
+                    if processed_equity > peak_equity:
+                        peak_equity = processed_equity
+                        drawdown_duration = 0
+                    else:
+                        drawdown_duration += 1
+                if drawdown_duration > duration_limit:
+                    invert = not invert
+                    peak_equity = processed_equity
+                    drawdown_duration = 0
+                action = previous_action
+                if invert:
+                    if previous_action == Action.BUY:
+                        action = Action.SELL
+                    elif previous_action == Action.SELL:
+                        action = Action.BUY
+                actions[i] = action
+                if _apply_action(&self.state, action, close[i], i + 1, self.fee):
+                    failed = 1
+                    break
+        self.peak_equity = peak_equity
+        self.drawdown_duration = drawdown_duration
+        self.invert = invert
+        if failed:
+            raise MemoryError()
+
+
+cpdef enum LayerKind:
+    CONDITIONAL = 1
+    LIMITER = 2
+    CROSSOVER = 3
+    INVERTING = 4
+
+
+cdef struct ChainLayer:
+    int kind
+    int action
+    # whether the layer keeps its trades and equity, which only limiter and
+    # inverting layers read themselves
+    bint record
+    LayerState* state
+    const double* first
+    const double* second
+    # ConditionalStrategy
+    double condition_threshold
+    int condition_type
+    int condition_logic
+    int on_condition
+    bint freeze_bounds
+    int lower_bound
+    int upper_bound
+    # LimiterStrategy
+    int limiter_multiplier
+    int limiter_type
+    float limiter_threshold
+    # CrossoverStrategy
+    int crossover_handling
+    bint has_prev_values
+    float prev_first_value
+    float prev_second_value
+    # InvertingStrategy
+    StreamState* stream
+    double duration_limit
+    double peak_equity
+    long drawdown_duration
+    bint invert
+
+
+cdef inline int _conditional_action(
+    ChainLayer* layer, Py_ssize_t i, int previous_action, bint has_previous
+) noexcept nogil:
+    cdef int action = Action.PASS
+    cdef float indicator_value
+    if not isnan(layer.first[i]):
+        indicator_value = <float>layer.first[i]
+        if not layer.freeze_bounds:
+            if <int>indicator_value < layer.lower_bound:
+                layer.lower_bound = <int>indicator_value
+            elif <int>indicator_value > layer.upper_bound:
+                layer.upper_bound = <int>indicator_value
+        if layer.condition_type == ConditionType.LESS_THAN:
+            if <double>indicator_value < layer.condition_threshold:
+                action = layer.on_condition
+        elif layer.condition_type == ConditionType.MORE_THAN:
+            if <double>indicator_value >= layer.condition_threshold:
+                action = layer.on_condition
+    if has_previous and layer.condition_logic != 0:
+        if layer.condition_logic == ConditionLogic.AND and previous_action != action:
+            action = Action.CANCEL
+        elif (
+            layer.condition_logic == ConditionLogic.SAMEAND
+            and layer.on_condition == previous_action
+            and previous_action != action
+        ):
+            action = Action.CANCEL
+    return action
+
+
+cdef inline int _limiter_action(ChainLayer* layer, Py_ssize_t i) noexcept nogil:
+    cdef int action = Action.PASS
+    cdef float trade_profit, limiter_threshold
+    cdef LayerState* state = layer.state
+    if state.n_trades != 0:
+        trade_profit = <float>state.trades[state.n_trades - 1].profit
+        if trade_profit == 0 and not isnan(layer.first[i]):
+            limiter_threshold = <float>(
+                layer.first[i] * (layer.limiter_multiplier / 100.0)
+            )
+            layer.limiter_threshold = limiter_threshold
+        else:
+            limiter_threshold = layer.limiter_threshold
+        if (
+            layer.limiter_type == LimiterType.STOP_LOSS
+            and trade_profit <= -limiter_threshold
+        ):
+            action = Action.CANCEL
+        elif trade_profit > limiter_threshold:
+            action = Action.CANCEL
+    return action
+
+
+cdef inline int _crossover_action(ChainLayer* layer, Py_ssize_t i) noexcept nogil:
+    cdef int action = Action.PASS
+    cdef float first_value, second_value
+    if isnan(layer.first[i]) or isnan(layer.second[i]):
+        return action
+    first_value = <float>layer.first[i]
+    second_value = <float>layer.second[i]
+    if not layer.has_prev_values:
+        layer.has_prev_values = 1
+    elif (
+        layer.prev_first_value <= layer.prev_second_value
+        and first_value > second_value
+    ):
+        if layer.crossover_handling == CrossoverHandling.REGULAR:
+            action = Action.BUY
+        else:
+            action = Action.SELL
+    elif (
+        layer.prev_first_value >= layer.prev_second_value
+        and first_value < second_value
+    ):
+        if layer.crossover_handling == CrossoverHandling.REGULAR:
+            action = Action.SELL
+        else:
+            action = Action.BUY
+    layer.prev_first_value = first_value
+    layer.prev_second_value = second_value
+    return action
+
+
+cdef inline int _inverting_action(ChainLayer* layer, int previous_action) noexcept nogil:
+    cdef double processed_equity = layer.state.equity
+    if layer.stream != NULL:
+        processed_equity = _stream_update(layer.stream, 0.0, 0.0, processed_equity)
+    if not isnan(processed_equity):
+        if processed_equity > layer.peak_equity:
+            layer.peak_equity = processed_equity
+            layer.drawdown_duration = 0
+        else:
+            layer.drawdown_duration += 1
+    if layer.drawdown_duration > layer.duration_limit:
+        layer.invert = not layer.invert
+        layer.peak_equity = processed_equity
+        layer.drawdown_duration = 0
+    if layer.invert:
+        if previous_action == Action.BUY:
+            return Action.SELL
+        elif previous_action == Action.SELL:
+            return Action.BUY
+    return Action.PASS
+
+
+cdef int _forward_chain(
+    ChainLayer* layers,
+    Py_ssize_t n_layers,
+    const double[:, :] ohlcv,
+    double fee,
+    const int* previous_actions,
+    int* actions,
+) noexcept nogil:
+    cdef Py_ssize_t i, j
+    cdef int action, previous_action
+    cdef ChainLayer* layer
+    for i in range(ohlcv.shape[0]):
+        previous_action = Action.PASS
+        if previous_actions != NULL:
+            previous_action = previous_actions[i]
+        for j in range(n_layers):
+            layer = &layers[j]
+            if layer.kind == LayerKind.CONDITIONAL:
+                action = _conditional_action(
+                    layer, i, previous_action, j != 0 or previous_actions != NULL
+                )
+            elif layer.kind == LayerKind.LIMITER:
+                action = _limiter_action(layer, i)
+            elif layer.kind == LayerKind.CROSSOVER:
+                action = _crossover_action(layer, i)
+            else:
+                action = _inverting_action(layer, previous_action)
+            action = _resolve_action(action, previous_action)
+            layer.action = action
+            if layer.record and _apply_action(
+                layer.state, action, ohlcv[i, 3], i + 1, fee
+            ):
+                return -1
+            previous_action = action
+        if actions != NULL:
+            actions[i] = previous_action
+    return 0
+
+
+cdef class ChainKernel:
+    cdef ChainLayer* layers
+    cdef Py_ssize_t n_layers
+    cdef Py_ssize_t n_bars
+    cdef double fee
+    cdef list kernels
+    cdef list series
+
+    def __cinit__(self, Py_ssize_t n_bars, double fee, Py_ssize_t n_layers):
+        self.layers = <ChainLayer*>calloc(max(n_layers, 1), sizeof(ChainLayer))
+        if self.layers == NULL:
+            raise MemoryError()
+        self.n_layers = n_layers
+        self.n_bars = n_bars
+        self.fee = fee
+        self.kernels = list()
+        self.series = list()
+        cdef Py_ssize_t i
+        cdef LayerKernel kernel
+        for i in range(n_layers):
+            kernel = LayerKernel(n_bars, fee)
+            self.kernels.append(kernel)
+            self.layers[i].state = &kernel.state
+            self.layers[i].action = Action.PASS
+            self.layers[i].record = 1
+
+    def __dealloc__(self):
+        free(self.layers)
+
+    cdef const double* _keep(self, const double[::1] values) except NULL:
+        if values.shape[0] != self.n_bars:
+            raise ValueError(
+                f"indicator series has {values.shape[0]} values, expected {self.n_bars}"
+            )
+        self.series.append(values)
+        return &values[0]
+
+    def set_conditional(
+        self,
+        Py_ssize_t index,
+        const double[::1] values,
+        double condition_threshold,
+        int condition_type,
+        int condition_logic,
+        int on_condition,
+        bint freeze_bounds,
+        int lower_bound,
+        int upper_bound,
+    ):
+        cdef ChainLayer* layer = &self.layers[index]
+        layer.kind = LayerKind.CONDITIONAL
+        layer.first = self._keep(values)
+        layer.condition_threshold = condition_threshold
+        layer.condition_type = condition_type
+        layer.condition_logic = condition_logic
+        layer.on_condition = on_condition
+        layer.freeze_bounds = freeze_bounds
+        layer.lower_bound = lower_bound
+        layer.upper_bound = upper_bound
+
+    def set_limiter(
+        self,
+        Py_ssize_t index,
+        const double[::1] values,
+        int limiter_multiplier,
+        int limiter_type,
+        float limiter_threshold,
+    ):
+        cdef ChainLayer* layer = &self.layers[index]
+        layer.kind = LayerKind.LIMITER
+        layer.first = self._keep(values)
+        layer.limiter_multiplier = limiter_multiplier
+        layer.limiter_type = limiter_type
+        layer.limiter_threshold = limiter_threshold
+
+    def set_crossover(
+        self,
+        Py_ssize_t index,
+        const double[::1] first_values,
+        const double[::1] second_values,
+        int crossover_handling,
+    ):
+        cdef ChainLayer* layer = &self.layers[index]
+        layer.kind = LayerKind.CROSSOVER
+        layer.first = self._keep(first_values)
+        layer.second = self._keep(second_values)
+        layer.crossover_handling = crossover_handling
+        layer.has_prev_values = 0
+
+    def set_inverting(
+        self,
+        Py_ssize_t index,
+        double duration_limit,
+        bint invert,
+        StreamingIndicator stream = None,
+    ):
+        cdef ChainLayer* layer = &self.layers[index]
+        layer.kind = LayerKind.INVERTING
+        layer.stream = NULL
+        if stream is not None:
+            # the equity indicator advances in place, as it does bar by bar
+            self.series.append(stream)
+            layer.stream = &stream.state
+        layer.duration_limit = duration_limit
+        layer.peak_equity = 0.0
+        layer.drawdown_duration = 0
+        layer.invert = invert
+
+    def reset(self):
+        # for another run on as many bars, the kernels start over and the layers
+        # forget their series, run refuses them until they are configured again
+        cdef Py_ssize_t i
+        cdef LayerKernel kernel
+        for i in range(self.n_layers):
+            kernel = self.kernels[i]
+            kernel.reset()
+            self.layers[i].kind = 0
+            self.layers[i].first = NULL
+            self.layers[i].second = NULL
+            self.layers[i].stream = NULL
+            self.layers[i].action = Action.PASS
+        self.series = list()
+
+    def set_record(self, Py_ssize_t index, bint record):
+        # a layer that does not record passes its actions on and keeps the equity,
+        # trades and history of a kernel that never ran
+        self.layers[index].record = record
+
+    def kernel(self, Py_ssize_t index) -> LayerKernel:
+        return self.kernels[index]
+
+    def layer_state(self, Py_ssize_t index) -> dict:
+        cdef ChainLayer* layer = &self.layers[index]
+        return {
+            "action": layer.action,
+            "bounds": (layer.lower_bound, layer.upper_bound),
+            "limiter_threshold": layer.limiter_threshold,
+            "prev_values": (layer.prev_first_value, layer.prev_second_value)
+            if layer.has_prev_values
+            else (None, None),
+            "peak_equity": layer.peak_equity,
+            "drawdown_duration": layer.drawdown_duration,
+            "invert": bool(layer.invert),
+        }
+
+    def run(
+        self,
+        const double[:, :] ohlcv,
+        const int[::1] previous_actions = None,
+        int[::1] actions = None,
+    ):
+        cdef Py_ssize_t i
+        cdef int result
+        cdef const int* previous_actions_ptr = NULL
+        cdef int* actions_ptr = NULL
+        if ohlcv.shape[0] != self.n_bars:
+            raise ValueError(
+                f"OHLCV has {ohlcv.shape[0]} bars, expected {self.n_bars}"
+            )
+        if previous_actions is not None:
+            if previous_actions.shape[0] != self.n_bars:
+                raise ValueError(
+                    f"{previous_actions.shape[0]} previous actions, expected {self.n_bars}"
+                )
+            if self.n_bars != 0:
+                previous_actions_ptr = &previous_actions[0]
+        if actions is not None:
+            if actions.shape[0] != self.n_bars:
+                raise ValueError(
+                    f"actions buffer has {actions.shape[0]} values, expected {self.n_bars}"
+                )
+            if self.n_bars != 0:
+                actions_ptr = &actions[0]
+        for i in range(self.n_layers):
+            if self.layers[i].kind == 0:
+                raise RuntimeError(f"layer {i} was not configured")
+            if not self.layers[i].record and self.layers[i].kind in (
+                LayerKind.LIMITER,
+                LayerKind.INVERTING,
+            ):
+                raise RuntimeError(f"layer {i} reads its own trades and has to record")
+        with nogil:
+            result = _forward_chain(
+                self.layers,
+                self.n_layers,
+                ohlcv,
+                self.fee,
+                previous_actions_ptr,
+                actions_ptr,
+            )
+        if result:
+            raise MemoryError()
+
+
+# Single-pass reductions behind fragments.metrics.
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def equity_stats(const double[::1] equity):
+    cdef Py_ssize_t i, last_peak = 0, n = equity.shape[0]
+    cdef long long duration = 0
+    cdef double peak, drawdown, max_drawdown = 0.0
+    cdef double bar_return, delta, mean = 0.0, m2 = 0.0, downside = 0.0
+    if n == 0:
+        return 0.0, 0, 0, 0.0, 0.0, 0.0
+    with nogil:
+        peak = equity[0]
+        for i in range(1, n):
+            if equity[i] >= peak:
+                peak = equity[i]
+                last_peak = i
+            else:
+                if i - last_peak > duration:
+                    duration = i - last_peak
+                if peak > 0:
+                    drawdown = (peak - equity[i]) / peak
+                    if drawdown > max_drawdown:
+                        max_drawdown = drawdown
+            bar_return = 0.0
+            if equity[i - 1] > 0:
+                bar_return = (equity[i] - equity[i - 1]) / equity[i - 1]
+            # Welford's update, the population deviation matches np.std
+            delta = bar_return - mean
+            mean += delta / i
+            m2 += delta * (bar_return - mean)
+            if bar_return < 0:
+                downside += bar_return * bar_return
+    return (
+        max_drawdown,
+        duration,
+        n - 1,
+        mean,
+        sqrt(m2 / (n - 1)) if n > 1 else 0.0,
+        sqrt(downside / (n - 1)) if n > 1 else 0.0,
+    )
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def profit_stats(const double[:] profits):
+    cdef Py_ssize_t i, n_wins = 0, n_losses = 0
+    cdef double profit, delta, gross_profit = 0.0, gross_loss = 0.0
+    cdef double mean = 0.0, m2 = 0.0
+    with nogil:
+        for i in range(profits.shape[0]):
+            profit = profits[i]
+            if profit > 0:
+                n_wins += 1
+                gross_profit += profit
+            elif profit < 0:
+                n_losses += 1
+                gross_loss -= profit
+            else:
+                continue
+            delta = profit - mean
+            mean += delta / (n_wins + n_losses)
+            m2 += delta * (profit - mean)
+    return (
+        profits.shape[0],
+        n_wins,
+        n_losses,
+        gross_profit,
+        gross_loss,
+        mean,
+        sqrt(m2 / (n_wins + n_losses)) if n_wins + n_losses else 0.0,
+    )
@@ -0,0 +1,244 @@
+from __future__ import annotations
+import os
+import json
+import shutil
+import pickle as pkl
+import numpy as np
+from datetime import date, datetime
+from typing import Any, Iterator, Optional, Union
+from fragments.indicators import OHLCV
+from fragments.resample import Interval, interval_label, resample
+
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+FORMAT_VERSION = 1
+DATA_FILE = "ohlcv.f64"
+TIMESTAMP_FILE = "timestamp.i64"
+METADATA_FILE = "metadata.json"
+RESAMPLED_DIRECTORY = "resampled"
+ITERATION_CHUNK = 65536
+
+Timestamp = Union[int, np.integer, np.datetime64, datetime, date, str]
+
+
+def as_timestamp(value: Timestamp) -> int:
+    # integers are taken as milliseconds since the epoch, like binance kline open times
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return round(value.timestamp() * 1000)
+    return int(np.datetime64(value, "ms").astype(np.int64))
+
+
+class Dataset:
+    ohlcv: np.ndarray
+    path: Optional[str]
+    metadata: dict[str, Any]
+    timestamps: Optional[np.ndarray]
+    offset: int
+
+    def __init__(
+        self,
+        ohlcv: np.ndarray,
+        path: Optional[str] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        timestamps: Optional[np.ndarray] = None,
+        offset: int = 0,
+    ):
+        if ohlcv.ndim != 2 or ohlcv.shape[1] != len(COLUMNS):
+            raise ValueError(f"expected an (n, {len(COLUMNS)}) array, got {ohlcv.shape}")
+        if timestamps is not None and timestamps.shape != (ohlcv.shape[0],):
+            raise ValueError(
+                f"expected {ohlcv.shape[0]} timestamps, got {timestamps.shape}"
+            )
+        # a plain ndarray view, so np.asarray(dataset) keeps returning the same object
+        self.ohlcv = ohlcv.view(np.ndarray)
+        self.path = path
+        self.metadata = metadata if metadata is not None else dict()
+        self.timestamps = timestamps.view(np.ndarray) if timestamps is not None else None
+        # first bar of this dataset within the file at path
+        self.offset = offset
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        ohlcv_list: list[OHLCV] | np.ndarray,
+        metadata: Optional[dict[str, Any]] = None,
+        timestamps: Optional[list[Timestamp] | np.ndarray] = None,
+    ) -> Dataset:
+        ohlcv = np.asarray(ohlcv_list, dtype=np.float64)
+        if ohlcv.ndim != 2 or ohlcv.shape[1] != len(COLUMNS):
+            raise ValueError(f"expected an (n, {len(COLUMNS)}) array, got {ohlcv.shape}")
+        if timestamps is not None:
+            timestamps = np.asarray(
+                timestamps
+                if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind in "iu"
+                else [as_timestamp(i) for i in timestamps],
+                dtype=np.int64,
+            )
+            if timestamps.shape != (ohlcv.shape[0],):
+                raise ValueError(
+                    f"expected {ohlcv.shape[0]} timestamps, got {timestamps.shape}"
+                )
+            if np.any(timestamps[1:] < timestamps[:-1]):
+                raise ValueError("timestamps must be sorted")
+        os.makedirs(path, exist_ok=True)
+        # resampled copies of the previous contents are stale now
+        shutil.rmtree(os.path.join(path, RESAMPLED_DIRECTORY), ignore_errors=True)
+        # column-major, so every field is one contiguous run of float64 on disk
+        ohlcv.T.astype("<f8").tofile(os.path.join(path, DATA_FILE))
+        if timestamps is not None:
+            timestamps.astype("<i8").tofile(os.path.join(path, TIMESTAMP_FILE))
+        with open(os.path.join(path, METADATA_FILE), "w") as f:
+            json.dump(
+                {
+                    "version": FORMAT_VERSION,
+                    "length": ohlcv.shape[0],
+                    "columns": list(COLUMNS),
+                    "dtype": "<f8",
+                    "timestamps": timestamps is not None,
+                    "metadata": metadata if metadata is not None else dict(),
+                },
+                f,
+                indent=2,
+            )
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: str) -> Dataset:
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            header = json.load(f)
+        if header["version"] != FORMAT_VERSION:
+            raise RuntimeError(f"unsupported dataset version {header['version']}")
+        timestamps = None
+        if header["length"] == 0:
+            ohlcv = np.empty((0, len(COLUMNS)), dtype=np.float64, order="F")
+            if header.get("timestamps"):
+                timestamps = np.empty(0, dtype=np.int64)
+        else:
+            ohlcv = np.memmap(
+                os.path.join(path, DATA_FILE),
+                dtype=np.dtype(header["dtype"]),
+                mode="r",
+                shape=(header["length"], len(header["columns"])),
+                order="F",
+            )
+            if header.get("timestamps"):
+                timestamps = np.memmap(
+                    os.path.join(path, TIMESTAMP_FILE),
+                    dtype=np.dtype("<i8"),
+                    mode="r",
+                    shape=(header["length"],),
+                )
+        return cls(ohlcv, path, header["metadata"], timestamps)
+
+    @classmethod
+    def from_pickle(
+        cls,
+        pickle_path: str,
+        path: str,
+        metadata: Optional[dict[str, Any]] = None,
+        timestamps: Optional[list[Timestamp] | np.ndarray] = None,
+    ) -> Dataset:
+        with open(pickle_path, "rb") as f:
+            ohlcv_list = pkl.load(f)
+        return cls.create(path, ohlcv_list, metadata, timestamps)
+
+    def between(
+        self, start: Optional[Timestamp] = None, end: Optional[Timestamp] = None
+    ) -> Dataset:
+        # bars with start <= timestamp < end, as a view
+        if self.timestamps is None:
+            raise ValueError("dataset has no timestamps")
+        first = (
+            0
+            if start is None
+            else int(np.searchsorted(self.timestamps, as_timestamp(start), "left"))
+        )
+        last = (
+            len(self)
+            if end is None
+            else int(np.searchsorted(self.timestamps, as_timestamp(end), "left"))
+        )
+        return self[first:max(first, last)]
+
+    def resample(self, interval: Interval) -> Dataset:
+        label = interval_label(interval)
+        metadata = dict(self.metadata, resampled_from=label)
+        if self.path is None or self.offset != 0 or len(self) != _file_length(self.path):
+            ohlcv, timestamps = resample(self.ohlcv, interval, self.timestamps)
+            return Dataset(ohlcv, None, metadata, timestamps)
+
+        # whole-file resamples are cached next to the source data and reused
+        path = os.path.join(self.path, RESAMPLED_DIRECTORY, label)
+        if os.path.exists(os.path.join(path, METADATA_FILE)):
+            return Dataset.open(path)
+        ohlcv, timestamps = resample(self.ohlcv, interval, self.timestamps)
+        staging = f"{path}.{os.getpid()}.tmp"
+        Dataset.create(staging, ohlcv, metadata, timestamps)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # another process cached the same interval first
+            shutil.rmtree(staging, ignore_errors=True)
+        return Dataset.open(path)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.ohlcv[:, COLUMNS.index(name)]
+
+    def __len__(self) -> int:
+        return self.ohlcv.shape[0]
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("dataset slices must be contiguous")
+            stop = max(start, stop)
+            return Dataset(
+                self.ohlcv[start:stop],
+                self.path,
+                self.metadata,
+                self.timestamps[start:stop] if self.timestamps is not None else None,
+                self.offset + start,
+            )
+        return tuple(self.ohlcv[index].tolist())
+
+    def __iter__(self) -> Iterator[OHLCV]:
+        for start in range(0, len(self), ITERATION_CHUNK):
+            chunk = self.ohlcv[start : start + ITERATION_CHUNK]
+            yield from zip(*(chunk[:, i].tolist() for i in range(len(COLUMNS))))
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        if copy:
+            return np.array(self.ohlcv, dtype=dtype)
+        if dtype is None or np.dtype(dtype) == self.ohlcv.dtype:
+            return self.ohlcv
+        return self.ohlcv.astype(dtype)
+
+    def __reduce__(self):
+        # file-backed datasets travel to worker processes as a path and are mapped again
+        if self.path is not None:
+            return (_open_range, (self.path, self.offset, self.offset + len(self)))
+        return (
+            Dataset,
+            (self.ohlcv, None, self.metadata, self.timestamps, self.offset),
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Dataset(path={self.path!r}, offset={self.offset}, length={len(self)})"
+        )
+
+
+def _file_length(path: str) -> int:
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        return json.load(f)["length"]
+
+
+def _open_range(path: str, start: int, stop: int) -> Dataset:
+    dataset = Dataset.open(path)
+    if start == 0 and stop == len(dataset):
+        return dataset
+    return dataset[start:stop]
@@ -0,0 +1,156 @@
+from __future__ import annotations
+import time
+import warnings
+import numpy as np
+from enum import Enum
+from typing import Callable, Optional, Sequence
+from scipy.optimize import OptimizeResult
+from skopt.space import Space
+from fragments.strategy import Strategy
+from fragments.indicators import Indicator, OHLCV
+from fragments.context import BacktestContext
+from fragments.dataset import Dataset
+from fragments.resample import Interval
+from fragments.optim import Engine, convert_cell_bounds_skopt
+
+Fidelity = np.ndarray | Dataset
+
+
+def prefix_fidelities(
+    data: np.ndarray | Dataset, n_rungs: int, eta: int = 3, min_bars: int = 1000
+) -> list[Fidelity]:
+    # every rung sees eta times more bars than the one before, the last sees all
+    lengths = [
+        min(len(data), max(min_bars, len(data) // eta ** (n_rungs - 1 - rung)))
+        for rung in range(n_rungs)
+    ]
+    fidelities = list()
+    for length in lengths:
+        window = data[:length]
+        if length != len(data):
+            # indicators are causal, so a prefix reuses the series of the full data
+            Indicator.cache.share_window(np.asarray(window), np.asarray(data), 0)
+        fidelities.append(window)
+    return fidelities
+
+
+def resampled_fidelities(
+    dataset: Dataset, intervals: Sequence[Interval]
+) -> list[Fidelity]:
+    # coarsest first; indicator periods count bars, so they span more time there
+    return [dataset.resample(interval) for interval in intervals] + [dataset]
+
+
+def _candidate(values: list) -> list[int | Enum]:
+    return [value if isinstance(value, Enum) else int(value) for value in values]
+
+
+def successive_halving(
+    strategy: Strategy,
+    func: Callable[[Strategy], float],
+    ohlcv_list: list[OHLCV] | Dataset,
+    fidelities: Optional[list[Fidelity]] = None,
+    engine: Optional[Engine] = None,
+    n_candidates: int = 81,
+    eta: int = 3,
+    hyperband: bool = True,
+    min_bars: int = 1000,
+    random_state: Optional[int] = None,
+    x0: Optional[list[list[int | Enum]]] = None,
+) -> OptimizeResult:
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    start_time = time.perf_counter()
+    data: np.ndarray | Dataset = (
+        ohlcv_list
+        if isinstance(ohlcv_list, Dataset)
+        else np.asarray(ohlcv_list, dtype=np.float64)
+    )
+    if fidelities is None:
+        n_rungs = int(np.floor(np.log(n_candidates) / np.log(eta) + 1e-9)) + 1
+        fidelities = prefix_fidelities(data, n_rungs, eta, min_bars)
+    elif len(fidelities) == 0 or len(fidelities[-1]) != len(data):
+        raise ValueError("the last fidelity has to be the full data")
+    precalculation = strategy.context.precalc
+    fee = strategy.context.fee
+
+    def run(fidelity: Fidelity):
+        if engine is None:
+            # every fidelity precalculates in a context of its own
+            with BacktestContext(
+                fee, fidelity if precalculation else None, strategy.param_storage
+            ).bound(strategy):
+                strategy.forward_all(fidelity)  # type: ignore
+        else:
+            engine(strategy, np.asarray(fidelity, dtype=np.float64))
+
+    # conditional bounds are fitted on the full data, like optimize does
+    run(data)
+    space = Space(convert_cell_bounds_skopt(strategy.param_storage.get_cell_bounds()))
+    rng = np.random.RandomState(random_state)
+
+    # hyperband also runs the less aggressive brackets, which start on finer
+    # fidelities with fewer candidates, down to a plain random search on the full
+    # data; every bracket costs about as much as the first
+    n_rungs = len(fidelities)
+    brackets = [
+        (
+            first_rung,
+            int(
+                np.ceil(
+                    n_candidates * n_rungs / (n_rungs - first_rung) / eta**first_rung
+                )
+            ),
+        )
+        for first_rung in (range(n_rungs) if hyperband else [0])
+    ]
+
+    rungs = list()
+    x_iters: list[list[int | Enum]] = list()
+    func_vals = list()
+    for bracket, (first_rung, n_bracket) in enumerate(brackets):
+        # given points start in the first, most aggressive bracket
+        candidates = [_candidate(x) for x in x0 or list()] if bracket == 0 else []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            candidates += [
+                _candidate(x)
+                for x in space.rvs(
+                    max(n_bracket - len(candidates), 0), random_state=rng
+                )
+            ]
+        for rung in range(first_rung, n_rungs):
+            rung_start = time.perf_counter()
+            scores = np.empty(len(candidates), dtype=np.float64)
+            for i, values in enumerate(candidates):
+                strategy.param_storage.apply_cell_values(values)
+                run(fidelities[rung])
+                scores[i] = func(strategy)
+            rungs.append(
+                {
+                    "bracket": bracket,
+                    "n_bars": len(fidelities[rung]),
+                    "n_candidates": len(candidates),
+                    "wall_time": time.perf_counter() - rung_start,
+                }
+            )
+            if rung == n_rungs - 1:
+                break
+            keep = max(1, len(candidates) // eta)
+            order = np.argsort(-scores, kind="stable")
+            candidates = [candidates[i] for i in order[:keep]]
+        x_iters += candidates
+        func_vals += (-scores).tolist()
+    best = int(np.argmin(func_vals))
+    strategy.param_storage.apply_cell_values(x_iters[best])
+    run(data)
+    return OptimizeResult(
+        x=x_iters[best],
+        fun=func_vals[best],
+        x_iters=x_iters,
+        func_vals=np.asarray(func_vals),
+        nfev=sum(rung["n_candidates"] for rung in rungs),
+        space=space,
+        rungs=rungs,
+        wall_time=time.perf_counter() - start_time,
+    )
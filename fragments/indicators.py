@@ -1,52 +1,211 @@
-from typing import Optional
+from __future__ import annotations
+from typing import Optional, Hashable, Iterable
 from abc import ABC, abstractmethod
-import talipp.indicators
-from talipp.ohlcv import OHLCVFactory
-from collections import deque
+from collections import OrderedDict
+from itertools import count
 from math import isnan
+import threading
+import weakref
 import numpy as np
 import talib
+from fragments import cproc
 from fragments.params import ParamCell, ParamStorage
+from fragments.context import BacktestContext, current_context
 
 
 OHLCV = tuple[float, float, float, float, float]
 
 
+class IndicatorCache:
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    _entries: OrderedDict[Hashable, np.ndarray]
+    _tokens: dict[int, tuple[weakref.ref, int]]
+    _windows: dict[int, tuple[np.ndarray, int]]
+
+    def __init__(self, max_bytes: int = 1 << 30):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._tokens = dict()
+        self._windows = dict()
+        self._token_counter = count()
+        self._lock = threading.RLock()
+
+    def dataset_token(self, ohlcv: np.ndarray) -> int:
+        with self._lock:
+            if (entry := self._tokens.get(id(ohlcv))) is not None:
+                ref, token = entry
+                if ref() is ohlcv:
+                    return token
+            token = next(self._token_counter)
+            key = id(ohlcv)
+            self._tokens[key] = (
+                weakref.ref(ohlcv, lambda _: self._release(key, token)),
+                token,
+            )
+            return token
+
+    def _release(self, key: int, token: int):
+        with self._lock:
+            if (entry := self._tokens.get(key)) is not None and entry[1] == token:
+                del self._tokens[key]
+            self._windows.pop(token, None)
+            for cache_key in [k for k in self._entries if k[-1] == token]:  # type: ignore
+                self.size -= self._entries.pop(cache_key).nbytes
+
+    def share_window(self, window: np.ndarray, base: np.ndarray, start: int):
+        # series for window are sliced out of the series for base, so overlapping
+        # windows calculate each indicator once and start with warmed up values
+        if window.shape[0] + start > base.shape[0]:
+            raise ValueError("window does not fit into base")
+        token = self.dataset_token(window)
+        with self._lock:
+            self._windows[token] = (base, start)
+
+    def base(self, ohlcv: np.ndarray) -> tuple[np.ndarray, int]:
+        # the dataset whose series a window is sliced out of, and where it starts
+        start = 0
+        while (window := self._windows.get(self.dataset_token(ohlcv))) is not None:
+            ohlcv, offset = window
+            start += offset
+        return ohlcv, start
+
+    def key(self, indicator: Indicator, ohlcv: np.ndarray) -> Hashable:
+        token = self.dataset_token(ohlcv)
+        return (type(indicator), indicator.cache_parameters(), token)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, indicator: Indicator, ohlcv: np.ndarray) -> np.ndarray:
+        token = self.dataset_token(ohlcv)
+        if (window := self._windows.get(token)) is not None:
+            base, start = window
+            return self.get(indicator, base)[start : start + ohlcv.shape[0]]
+        key = (type(indicator), indicator.cache_parameters(), token)
+        with self._lock:
+            if (result := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+        return self.put(indicator, ohlcv, indicator.calculate(ohlcv))
+
+    def put(
+        self, indicator: Indicator, ohlcv: np.ndarray, result: np.ndarray
+    ) -> np.ndarray:
+        # stores a series calculated outside of get, e.g. by an IndicatorPlan
+        key = self.key(indicator, ohlcv)
+        result.setflags(write=False)
+        with self._lock:
+            self.misses += 1
+            if result.nbytes > self.max_bytes or key in self._entries:
+                return result
+            self._entries[key] = result
+            self.size += result.nbytes
+            self._evict()
+        return result
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            _, result = self._entries.popitem(last=False)
+            self.size -= result.nbytes
+            self.evictions += 1
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._windows.clear()
+            self.size = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
 class Indicator(ABC):
+    cache: IndicatorCache = IndicatorCache()
     param_storage: ParamStorage
+    _context: Optional[BacktestContext]
     _active: bool
-    _precalc: bool = False
+    _precalc: bool
+    _precalc_allowed: bool = True
     _precalc_iteraion: int
-    _precalc_ohlcv: np.ndarray
+    _precalc_ohlcv: Optional[np.ndarray]
     _precalc_result: np.ndarray
 
-    def __init__(self, param_storage: Optional[ParamStorage] = None):
+    def __init__(
+        self,
+        param_storage: Optional[ParamStorage] = None,
+        context: Optional[BacktestContext] = None,
+    ):
+        self._context = context
         if param_storage is None:
-            if not ParamStorage.global_storage_active:
-                ParamStorage.new_global()
-            self.param_storage = ParamStorage.global_storage
+            self.param_storage = self.context.param_storage
         else:
             self.param_storage = param_storage
-        if self._precalc:
-            self._precalc_iteraion = 0
+        self._precalc = False
+        self._precalc_iteraion = 0
         self._active = False
 
+    @property
+    def context(self) -> BacktestContext:
+        return self._context if self._context is not None else current_context()
+
     @classmethod
-    def enable_precalculation(cls, ohlcv_list: list[OHLCV]):
-        cls._precalc = True
-        cls._precalc_ohlcv = np.asarray(ohlcv_list, dtype=np.float64)
+    def enable_precalculation(cls, ohlcv_list: list[OHLCV] | np.ndarray):
+        # precalculates for the active context, the process default outside of one
+        current_context().enable_precalculation(ohlcv_list)
 
     @classmethod
     def disable_precalculation(cls):
-        cls._precalc = False
-        cls._precalc_ohlcv = None  # type: ignore
+        current_context().disable_precalculation()
 
     def disable_precalculation_for_self(self):
+        self._precalc_allowed = False
         self._precalc = False
-        # cls._precalc_ohlcv = None  # type: ignore
+
+    def __getstate__(self) -> dict:
+        # copies and pickles leave the data of the last run behind, the next reset
+        # picks up the precalculated series again
+        state = vars(self).copy()
+        state.pop("_precalc_ohlcv", None)
+        state.pop("_precalc_result", None)
+        state["_precalc"] = False
+        return state
+
+    def __setstate__(self, state: dict):
+        vars(self).update(state)
+        self._precalc_ohlcv = None
 
     @abstractmethod
     def reset(self):
+        # whether the run reads precalculated series is decided once per reset
+        self._precalc_ohlcv = self.context.precalc_ohlcv
+        self._precalc = self._precalc_allowed and self._precalc_ohlcv is not None
         if self._precalc:
             self._precalc_iteraion = 0
         self._active = False
@@ -55,25 +214,88 @@ class Indicator(ABC):
     def forward(self, ohlcv: OHLCV) -> Optional[float]:
         pass
 
+    @abstractmethod
+    def calculate(self, ohlcv: np.ndarray) -> np.ndarray:
+        pass
+
+    def cache_parameters(self) -> tuple:
+        return tuple(
+            (name, attribute.value)
+            for name, attribute in vars(self).items()
+            if isinstance(attribute, ParamCell)
+        )
+
+    def fused(self) -> Optional[tuple[int, int]]:
+        # (StreamKind, period) for indicators cproc.fused_series can calculate along
+        # with others, None for those an IndicatorPlan calculates on their own
+        return None
+
+    def series(self, ohlcv: np.ndarray) -> np.ndarray:
+        return Indicator.cache.get(self, ohlcv)
+
+
+class IndicatorPlan:
+    indicators: list[Indicator]
+
+    def __init__(self, indicators: Iterable[Indicator]):
+        self.indicators = list(indicators)
+
+    def run(self, ohlcv: np.ndarray, cache: Optional[IndicatorCache] = None) -> int:
+        # fills the cache with every series the indicators will read from ohlcv, the
+        # fused ones in a single pass over the bars, and returns how many were missing
+        cache = cache if cache is not None else Indicator.cache
+        base, _ = cache.base(ohlcv)
+        missing: dict[Hashable, Indicator] = dict()
+        for indicator in self.indicators:
+            key = cache.key(indicator, base)
+            if key not in missing and key not in cache:
+                missing[key] = indicator
+        fused = [
+            (indicator, request)
+            for indicator in missing.values()
+            if (request := indicator.fused()) is not None
+        ]
+        if fused:
+            results = cproc.fused_series(
+                base,
+                [kind for _, (kind, _) in fused],
+                [period for _, (_, period) in fused],
+            )
+            for (indicator, _), result in zip(fused, results):
+                cache.put(indicator, base, result)
+        for indicator in missing.values():
+            if indicator.fused() is None:
+                cache.put(indicator, base, indicator.calculate(base))
+        return len(missing)
+
 
 class RSI(Indicator):
     period: ParamCell[int]
-    wrapped_indicator: talipp.indicators.RSI
-    ohlcv_deque: deque[OHLCV]
+    stream: cproc.StreamingIndicator
 
-    def __init__(self, param_storage: Optional[ParamStorage] = None):
-        super().__init__(param_storage)
+    def __init__(
+        self,
+        param_storage: Optional[ParamStorage] = None,
+        context: Optional[BacktestContext] = None,
+    ):
+        super().__init__(param_storage, context)
         self.period = self.param_storage.create_cell((2, 20))
         self.reset()
 
     def reset(self):
         super().reset()
         if self._precalc:
-            self._precalc_result = talib.RSI(  # type: ignore
-                self._precalc_ohlcv[:, 3], self.period.value
-            )
+            self._precalc_result = self.series(self._precalc_ohlcv)
         else:
-            self.wrapped_indicator = talipp.indicators.RSI(self.period.value)
+            self.stream = cproc.StreamingIndicator(
+                cproc.StreamKind.RSI, self.period.value
+            )
+
+    def fused(self) -> Optional[tuple[int, int]]:
+        return cproc.StreamKind.RSI, self.period.value
+
+    def calculate(self, ohlcv: np.ndarray) -> np.ndarray:
+        return talib.RSI(ohlcv[:, 3], self.period.value)  # type: ignore
 
     def forward(self, ohlcv: OHLCV) -> Optional[float]:
         if self._precalc:
@@ -90,35 +312,43 @@ class RSI(Indicator):
             self._precalc_iteraion += 1
             return self._precalc_result[self._precalc_iteraion - 1]
 
-        self.wrapped_indicator.add_input_value(ohlcv[3])
+        value = self.stream.update(ohlcv[1], ohlcv[2], ohlcv[3])
         if not self._active:
-            if len(self.wrapped_indicator) == 0:
+            if isnan(value):
                 return None
-            else:
-                self._active = True
-        return self.wrapped_indicator[-1]
+            self._active = True
+        return value
 
 
 class ATR(Indicator):
     period: ParamCell[int]
-    wrapped_indicator: talipp.indicators.ATR
+    stream: cproc.StreamingIndicator
 
-    def __init__(self, param_storage: Optional[ParamStorage] = None):
-        super().__init__(param_storage)
+    def __init__(
+        self,
+        param_storage: Optional[ParamStorage] = None,
+        context: Optional[BacktestContext] = None,
+    ):
+        super().__init__(param_storage, context)
         self.period = self.param_storage.create_cell((5, 50))
         self.reset()
 
     def reset(self):
         super().reset()
         if self._precalc:
-            self._precalc_result = talib.ATR(  # type: ignore
-                self._precalc_ohlcv[:, 1],
-                self._precalc_ohlcv[:, 2],
-                self._precalc_ohlcv[:, 3],
-                self.period.value,
-            )
+            self._precalc_result = self.series(self._precalc_ohlcv)
         else:
-            self.wrapped_indicator = talipp.indicators.ATR(self.period.value)
+            self.stream = cproc.StreamingIndicator(
+                cproc.StreamKind.ATR, self.period.value
+            )
+
+    def fused(self) -> Optional[tuple[int, int]]:
+        return cproc.StreamKind.ATR, self.period.value
+
+    def calculate(self, ohlcv: np.ndarray) -> np.ndarray:
+        return talib.ATR(  # type: ignore
+            ohlcv[:, 1], ohlcv[:, 2], ohlcv[:, 3], self.period.value
+        )
 
     def forward(self, ohlcv: OHLCV) -> Optional[float]:
         if self._precalc:
@@ -135,32 +365,41 @@ class ATR(Indicator):
             self._precalc_iteraion += 1
             return self._precalc_result[self._precalc_iteraion - 1]
 
-        self.wrapped_indicator.add_input_value(OHLCVFactory.from_matrix([list(ohlcv)]))
+        value = self.stream.update(ohlcv[1], ohlcv[2], ohlcv[3])
         if not self._active:
-            if len(self.wrapped_indicator) == 0:
+            if isnan(value):
                 return None
-            else:
-                self._active = True
-        return self.wrapped_indicator[-1]
+            self._active = True
+        return value
 
 
 class SMA(Indicator):
     period: ParamCell[int]
-    wrapped_indicator: talipp.indicators.SMA
+    stream: cproc.StreamingIndicator
 
-    def __init__(self, param_storage: Optional[ParamStorage] = None):
-        super().__init__(param_storage)
+    def __init__(
+        self,
+        param_storage: Optional[ParamStorage] = None,
+        context: Optional[BacktestContext] = None,
+    ):
+        super().__init__(param_storage, context)
         self.period = self.param_storage.create_cell((2, 120))
         self.reset()
 
     def reset(self):
         super().reset()
         if self._precalc:
-            self._precalc_result = talib.SMA(  # type: ignore
-                self._precalc_ohlcv[:, 3], self.period.value
-            )
+            self._precalc_result = self.series(self._precalc_ohlcv)
         else:
-            self.wrapped_indicator = talipp.indicators.SMA(self.period.value)
+            self.stream = cproc.StreamingIndicator(
+                cproc.StreamKind.SMA, self.period.value
+            )
+
+    def fused(self) -> Optional[tuple[int, int]]:
+        return cproc.StreamKind.SMA, self.period.value
+
+    def calculate(self, ohlcv: np.ndarray) -> np.ndarray:
+        return talib.SMA(ohlcv[:, 3], self.period.value)  # type: ignore
 
     def forward(self, ohlcv: OHLCV) -> Optional[float]:
         if self._precalc:
@@ -177,10 +416,9 @@ class SMA(Indicator):
             self._precalc_iteraion += 1
             return self._precalc_result[self._precalc_iteraion - 1]
 
-        self.wrapped_indicator.add_input_value(ohlcv[3])
+        value = self.stream.update(ohlcv[1], ohlcv[2], ohlcv[3])
         if not self._active:
-            if len(self.wrapped_indicator) == 0:
+            if isnan(value):
                 return None
-            else:
-                self._active = True
-        return self.wrapped_indicator[-1]
+            self._active = True
+        return value
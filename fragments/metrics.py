@@ -0,0 +1,178 @@
+from __future__ import annotations
+import numpy as np
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
+from fragments import cproc
+from fragments.strategy import Strategy
+
+
+INITIAL_EQUITY = 100.0
+
+
+def equity_curve(strategy: Strategy) -> np.ndarray:
+    # the starting capital is included so a loss on the first bar counts as drawdown
+    hist_equity = np.asarray(strategy.hist_equity, dtype=np.float64)
+    curve = np.empty(hist_equity.shape[0] + 1, dtype=np.float64)
+    curve[0] = INITIAL_EQUITY
+    curve[1:] = hist_equity
+    return curve
+
+
+def _equity_stats(equity: np.ndarray) -> tuple[float, int, int, float, float, float]:
+    return cproc.equity_stats(np.ascontiguousarray(equity, dtype=np.float64))
+
+
+def _profit_stats(
+    profits: np.ndarray,
+) -> tuple[int, int, int, float, float, float, float]:
+    return cproc.profit_stats(np.asarray(profits, dtype=np.float64))
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    return _equity_stats(equity)[0]
+
+
+def drawdown_duration(equity: np.ndarray) -> int:
+    # longest run of bars spent below the previous peak
+    return _equity_stats(equity)[1]
+
+
+def _sharpe(stats: tuple, periods_per_year: float) -> float:
+    _, _, n_returns, mean, deviation, _ = stats
+    if n_returns < 2 or deviation == 0:
+        return 0.0
+    return mean / deviation * np.sqrt(periods_per_year)
+
+
+def _sortino(stats: tuple, periods_per_year: float) -> float:
+    _, _, n_returns, mean, _, downside = stats
+    if n_returns < 2 or downside == 0:
+        return 0.0
+    return mean / downside * np.sqrt(periods_per_year)
+
+
+def _calmar(equity: np.ndarray, stats: tuple, periods_per_year: float) -> float:
+    drawdown, _, n_returns, _, _, _ = stats
+    if n_returns < 1 or equity[0] <= 0 or drawdown == 0:
+        # without a drawdown to scale by this is treated like sqn without losses
+        return 0.0
+    growth = max(equity[-1], 0.0) / equity[0]
+    return (growth ** (periods_per_year / n_returns) - 1) / drawdown
+
+
+def sharpe_ratio(equity: np.ndarray, periods_per_year: float = 252) -> float:
+    return _sharpe(_equity_stats(equity), periods_per_year)
+
+
+def sortino_ratio(equity: np.ndarray, periods_per_year: float = 252) -> float:
+    return _sortino(_equity_stats(equity), periods_per_year)
+
+
+def calmar_ratio(equity: np.ndarray, periods_per_year: float = 252) -> float:
+    return _calmar(equity, _equity_stats(equity), periods_per_year)
+
+
+def _win_rate(stats: tuple) -> float:
+    n_trades, n_wins = stats[:2]
+    return n_wins / n_trades if n_trades else 0.0
+
+
+def _profit_factor(stats: tuple) -> float:
+    gross_profit, gross_loss = stats[3:5]
+    if gross_loss == 0:
+        return float(np.inf) if gross_profit > 0 else 0.0
+    return gross_profit / gross_loss
+
+
+def _sqn(stats: tuple) -> float:
+    # r-multiples are profits divided by the average loss, which cancels out of
+    # their mean over deviation
+    _, n_wins, n_losses, _, _, mean, deviation = stats
+    if n_wins == 0:
+        return 0.0
+    if n_losses == 0:
+        return 1.0
+    return mean / deviation * np.sqrt(n_wins + n_losses)
+
+
+def win_rate(profits: np.ndarray) -> float:
+    return _win_rate(_profit_stats(profits))
+
+
+def profit_factor(profits: np.ndarray) -> float:
+    return _profit_factor(_profit_stats(profits))
+
+
+def sqn(profits: np.ndarray) -> float:
+    return _sqn(_profit_stats(profits))
+
+
+@dataclass(frozen=True)
+class Metrics:
+    equity: float
+    total_profit: float
+    n_trades: int
+    max_drawdown: float
+    drawdown_duration: int
+    sharpe: float
+    sortino: float
+    calmar: float
+    win_rate: float
+    profit_factor: float
+    sqn: float
+
+
+def compute_metrics(strategy: Strategy, periods_per_year: float = 252) -> Metrics:
+    curve = equity_curve(strategy)
+    equity_stats = _equity_stats(curve)
+    profit_stats = _profit_stats(strategy.trades.profit)
+    return Metrics(
+        equity=strategy.equity,
+        total_profit=profit_stats[3] - profit_stats[4],
+        n_trades=profit_stats[0],
+        max_drawdown=equity_stats[0],
+        drawdown_duration=equity_stats[1],
+        sharpe=_sharpe(equity_stats, periods_per_year),
+        sortino=_sortino(equity_stats, periods_per_year),
+        calmar=_calmar(curve, equity_stats, periods_per_year),
+        win_rate=_win_rate(profit_stats),
+        profit_factor=_profit_factor(profit_stats),
+        sqn=0.0 if strategy.equity < 0.01 else _sqn(profit_stats),
+    )
+
+
+_EQUITY_METRICS = {
+    "max_drawdown": lambda curve, _: -max_drawdown(curve),
+    "drawdown_duration": lambda curve, _: -drawdown_duration(curve),
+    "sharpe": sharpe_ratio,
+    "sortino": sortino_ratio,
+    "calmar": calmar_ratio,
+}
+_TRADE_METRICS = {
+    "win_rate": win_rate,
+    "profit_factor": profit_factor,
+    "sqn": sqn,
+}
+
+
+def _evaluate_objective(
+    name: str, periods_per_year: float, strategy: Strategy
+) -> float:
+    if name in _EQUITY_METRICS:
+        return _EQUITY_METRICS[name](equity_curve(strategy), periods_per_year)
+    if name == "sqn" and strategy.equity < 0.01:
+        return 0.0
+    return _TRADE_METRICS[name](strategy.trades.profit)
+
+
+def objective(
+    name: str, periods_per_year: float = 252
+) -> Callable[[Strategy], float]:
+    # a picklable func for optimize; drawdowns are negated so that higher is better
+    if name not in _EQUITY_METRICS and name not in _TRADE_METRICS:
+        raise ValueError(
+            f"unknown metric {name!r}, expected one of "
+            f"{[*_EQUITY_METRICS, *_TRADE_METRICS]}"
+        )
+    return partial(_evaluate_objective, name, periods_per_year)
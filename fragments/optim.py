@@ -1,11 +1,29 @@
+import os
 import skopt
+import pickle
+import hashlib
 import warnings
-from skopt.space.space import Categorical
+from skopt.space.space import Categorical, Space
+from skopt.callbacks import check_callback
+from skopt.utils import create_result
 from scipy.optimize import OptimizeResult
+import numpy as np
 from enum import Enum
-from typing import Callable
-from fragments.strategy import Strategy
-from fragments.indicators import OHLCV
+from functools import partial
+from types import BuiltinFunctionType, CodeType, MethodType, ModuleType
+from typing import Callable, Optional, Any
+from fragments.strategy import Strategy, FrozenStrategy
+from fragments.params import ParamCell, ParamStorage
+from fragments.indicators import Indicator, OHLCV
+from fragments.parallel import ProcessPoolEvaluator, ThreadPoolEvaluator
+from fragments.dataset import Dataset
+from fragments.universe import Universe
+from fragments import profiling, compiled
+
+
+Engine = Callable[[Strategy, np.ndarray], Optional[np.ndarray]]
+# the prefix of evaluation contexts that are only valid within one process
+UNPERSISTED = "unpersisted:"
 
 
 def convert_cell_bounds_skopt(
@@ -20,24 +38,696 @@ def convert_cell_bounds_skopt(
     return converted_bounds
 
 
+def uses_param_storage(strategy: Strategy, param_storage: ParamStorage) -> bool:
+    layer: Optional[Strategy] = strategy
+    while layer is not None:
+        if layer.param_storage is param_storage:
+            return True
+        for attribute in vars(layer).values():
+            if (
+                isinstance(attribute, Indicator)
+                and attribute.param_storage is param_storage
+            ):
+                return True
+        layer = layer.previous
+    return False
+
+
+def find_frozen_layer(strategy: Strategy) -> Optional[Strategy]:
+    # the highest layer whose chain has no parameters in the optimized storage
+    layer = strategy
+    while layer.previous is not None:
+        if not uses_param_storage(layer.previous, strategy.param_storage):
+            return layer
+        layer = layer.previous
+    return None
+
+
+class Pruner:
+    interval: int
+    tolerance: float
+    penalty: Optional[float]
+    evaluations: int
+    pruned: int
+    bust: int
+    bars_run: int
+    bars_skipped: int
+    _best: float
+    _worst: float
+    _best_partials: list[float]
+
+    def __init__(
+        self,
+        interval: int = 10000,
+        tolerance: float = 0.5,
+        penalty: Optional[float] = None,
+    ):
+        if interval < 1:
+            raise ValueError("checkpoints need an interval of at least one bar")
+        self.interval = interval
+        self.tolerance = tolerance
+        self.penalty = penalty
+        self.evaluations = 0
+        self.pruned = 0
+        self.bust = 0
+        self.bars_run = 0
+        self.bars_skipped = 0
+        self._best = -np.inf
+        self._worst = np.inf
+        self._best_partials = list()
+
+    def _bound(self, checkpoint: int) -> float:
+        # the best full run so far, at the same checkpoint and with some slack
+        if checkpoint >= len(self._best_partials):
+            return -np.inf
+        best = self._best_partials[checkpoint]
+        return best - self.tolerance * abs(best)
+
+    def evaluate(
+        self,
+        strategy: Strategy,
+        func: Callable[[Strategy], float],
+        ohlcv_list: list[OHLCV] | Dataset,
+    ) -> float:
+        self.evaluations += 1
+        n_bars = len(ohlcv_list)
+        partials = list()
+        # the same indicator plan as a full forward_all
+        strategy.prepare()
+        strategy.reset()
+        for i, ohlcv in enumerate(ohlcv_list):
+            strategy.forward(ohlcv)
+            if strategy.equity < 0.01:
+                # nothing is traded once a strategy is bust, so its score is final
+                self.bust += 1
+                self.bars_run += i + 1
+                self.bars_skipped += n_bars - i - 1
+                return func(strategy)
+            if (i + 1) % self.interval == 0 and i + 1 != n_bars:
+                partial = func(strategy)
+                if partial < self._bound(len(partials)):
+                    self.pruned += 1
+                    self.bars_run += i + 1
+                    self.bars_skipped += n_bars - i - 1
+                    if self.penalty is not None:
+                        return self.penalty
+                    return min(partial, self._worst)
+                partials.append(partial)
+        self.bars_run += n_bars
+        score = func(strategy)
+        if score > self._best:
+            self._best = score
+            self._best_partials = partials
+        self._worst = min(self._worst, score)
+        return score
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "evaluations": self.evaluations,
+            "pruned": self.pruned,
+            "bust": self.bust,
+            "bars_run": self.bars_run,
+            "bars_skipped": self.bars_skipped,
+        }
+
+
+class _Unfingerprintable(Exception):
+    pass
+
+
+def _fingerprint_value(value: Any, seen: frozenset[int] = frozenset()) -> Any:
+    # what a callable captured, described so that equal values compare equal
+    # across processes; anything else can't be told apart and is refused
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return repr(value)
+    if isinstance(value, Enum):
+        return (type(value).__qualname__, repr(value.value))
+    if isinstance(value, np.generic):
+        return repr(value.item())
+    if isinstance(value, (tuple, list)):
+        return (
+            type(value).__name__,
+            tuple(_fingerprint_value(item, seen) for item in value),
+        )
+    if isinstance(value, (set, frozenset)):
+        return ("set", tuple(sorted(repr(_fingerprint_value(v, seen)) for v in value)))
+    if isinstance(value, dict):
+        return (
+            "dict",
+            tuple(
+                sorted(
+                    (repr(_fingerprint_value(key, seen)), _fingerprint_value(v, seen))
+                    for key, v in value.items()
+                )
+            ),
+        )
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        data = np.ascontiguousarray(value)
+        return (
+            data.shape,
+            str(data.dtype),
+            hashlib.blake2b(data.data, digest_size=16).hexdigest(),
+        )
+    if isinstance(value, ModuleType):
+        return ("module", value.__name__)
+    if isinstance(value, type):
+        return (value.__module__, value.__qualname__)
+    if callable(value):
+        return _fingerprint_callable(value, seen=seen)
+    raise _Unfingerprintable(type(value).__qualname__)
+
+
+def _code_names(code: CodeType) -> set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _fingerprint_globals(func: Callable, code: CodeType, seen: frozenset[int]) -> tuple:
+    # functions and callables the code names count by their own code only
+    namespace = getattr(func, "__globals__", dict())
+    result = list()
+    for name in sorted(_code_names(code)):
+        if name not in namespace:
+            continue
+        value = namespace[name]
+        if callable(value) and not isinstance(value, type):
+            result.append((name, _fingerprint_callable(value, False, seen)))
+        else:
+            result.append((name, _fingerprint_value(value, seen)))
+    return tuple(result)
+
+
+def _fingerprint_callable(
+    func: Optional[Callable],
+    resolve: bool = True,
+    seen: frozenset[int] = frozenset(),
+) -> tuple:
+    # functions are told apart by their code and, if resolve is set, by what it
+    # reads: the closure, the defaults and the globals it names
+    if func is None:
+        return (None,)
+    if id(func) in seen:
+        # a function that refers to itself
+        return ("recursive",)
+    seen = seen | {id(func)}
+    if isinstance(func, partial):
+        return (
+            _fingerprint_callable(func.func, resolve, seen),
+            _fingerprint_value(func.args, seen),
+            _fingerprint_value(func.keywords, seen),
+        )
+    if isinstance(func, MethodType):
+        return (
+            _fingerprint_callable(func.__func__, resolve, seen),
+            _fingerprint_value(func.__self__, seen),
+        )
+    name = (
+        getattr(func, "__module__", None),
+        getattr(func, "__qualname__", type(func).__qualname__),
+    )
+    code = getattr(func, "__code__", None)
+    if code is None:
+        # builtins are their name, other callable objects also their attributes
+        if isinstance(func, BuiltinFunctionType) or not hasattr(func, "__dict__"):
+            return name
+        return (*name, _fingerprint_value(vars(func), seen))
+    if not resolve:
+        return (*name, code.co_code, repr(code.co_consts))
+    return (
+        *name,
+        code.co_code,
+        repr(code.co_consts),
+        tuple(
+            _fingerprint_value(cell.cell_contents, seen)
+            for cell in func.__closure__ or ()  # type: ignore
+        ),
+        _fingerprint_value(getattr(func, "__defaults__", None), seen),
+        _fingerprint_value(getattr(func, "__kwdefaults__", None), seen),
+        _fingerprint_globals(func, code, seen),
+    )
+
+
+def _fingerprint_chain(strategy: Strategy) -> tuple:
+    # cells outside the optimized storage stay fixed, so their values are part of
+    # what an evaluation means; the optimized ones are the cache key itself
+    optimized = {id(cell) for cell in strategy.param_storage.cells}
+
+    def cells(owner: object) -> tuple:
+        result = list()
+        for name, attribute in sorted(vars(owner).items()):
+            if isinstance(attribute, ParamCell):
+                value = None if id(attribute) in optimized else attribute.value
+                result.append((name, repr(value)))
+            elif isinstance(attribute, Indicator):
+                result.append((name, type(attribute).__name__, cells(attribute)))
+        return tuple(result)
+
+    chain = list()
+    layer: Optional[Strategy] = strategy
+    while layer is not None:
+        if isinstance(layer, FrozenStrategy):
+            layer = layer.strategy
+        chain.append((type(layer).__name__, cells(layer)))
+        layer = layer.previous
+    return tuple(chain)
+
+
+def _fingerprint_data(ohlcv_list: list[OHLCV] | Dataset | Universe) -> tuple:
+    if isinstance(ohlcv_list, Universe):
+        return tuple(
+            (symbol, fee, _fingerprint_data(data))  # type: ignore
+            for symbol, fee, data in zip(
+                ohlcv_list.symbols, ohlcv_list.fees, ohlcv_list.data
+            )
+        )
+    ohlcv = np.ascontiguousarray(ohlcv_list, dtype=np.float64)
+    return (ohlcv.shape, hashlib.blake2b(ohlcv.data, digest_size=16).hexdigest())
+
+
+class EvaluationCache:
+    path: Optional[str]
+    hits: int
+    misses: int
+    _entries: dict[tuple[str, tuple], float]
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = dict()
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                self._entries = pickle.load(f)
+
+    @staticmethod
+    def context(
+        strategy: Strategy,
+        func: Callable[[Strategy], float],
+        ohlcv_list: list[OHLCV] | Dataset | Universe,
+        engine: Optional[Engine] = None,
+        aggregate: Any = None,
+    ) -> str:
+        # everything an evaluation depends on besides the optimized values
+        try:
+            description = (
+                _fingerprint_chain(strategy),
+                _fingerprint_callable(func),
+                _fingerprint_callable(engine),
+                _fingerprint_data(ohlcv_list),
+                repr(aggregate) if isinstance(aggregate, str) else None,
+                _fingerprint_callable(aggregate) if callable(aggregate) else None,
+                strategy.context.fee,
+            )
+        except _Unfingerprintable as e:
+            # a context no other optimization can match, its scores are not saved
+            warnings.warn(
+                f"the objective captures a {e} that can't be fingerprinted, "
+                "its evaluations are not persisted"
+            )
+            return f"{UNPERSISTED}{os.urandom(16).hex()}"
+        return hashlib.blake2b(
+            repr(description).encode(), digest_size=16
+        ).hexdigest()
+
+    @staticmethod
+    def key(context: str, values: list[int | Enum]) -> tuple[str, tuple]:
+        return context, tuple(
+            (type(value).__qualname__, value.value)
+            if isinstance(value, Enum)
+            else int(value)
+            for value in values
+        )
+
+    def get(self, context: str, values: list[int | Enum]) -> Optional[float]:
+        result = self._entries.get(self.key(context, values))
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, context: str, values: list[int | Enum], result: float):
+        self._entries[self.key(context, values)] = result
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self):
+        if self.path is None:
+            return
+        staging = f"{self.path}.tmp"
+        entries = {
+            key: value
+            for key, value in self._entries.items()
+            if not key[0].startswith(UNPERSISTED)
+        }
+        with open(staging, "wb") as f:
+            pickle.dump(entries, f)
+        os.replace(staging, self.path)
+
+
+class Checkpoint:
+    path: str
+    interval: int
+    context: Optional[str]
+    x_iters: list[list[int | Enum]]
+    func_vals: list[float]
+    bounds: list[tuple[int, int] | list[Enum]]
+    warm_started: int
+    _saved: int
+
+    def __init__(self, path: str, interval: int = 10):
+        if interval < 1:
+            raise ValueError("checkpoints need an interval of at least one evaluation")
+        self.path = path
+        self.interval = interval
+        self.context = None
+        self.x_iters = list()
+        self.func_vals = list()
+        self.bounds = list()
+        self.warm_started = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                vars(self).update(pickle.load(f))
+        self._saved = len(self.func_vals)
+
+    def __len__(self) -> int:
+        return len(self.func_vals)
+
+    @property
+    def evaluations(self) -> int:
+        # the points of a warm start were evaluated by another run
+        return len(self.func_vals) - self.warm_started
+
+    def attach(self, context: str, bounds: list[tuple[int, int] | list[Enum]]):
+        if self.func_vals and self.context != context:
+            raise ValueError(
+                f"{self.path} was written by a different optimization, "
+                "warm start from it instead"
+            )
+        self.context = context
+        self.bounds = bounds
+
+    def points(
+        self, bounds: list[tuple[int, int] | list[Enum]], start: int = 0
+    ) -> tuple[list[list[int | Enum]], list[float]]:
+        # the evaluations from start on whose point lies within the given bounds;
+        # the objective of any other point belongs to a point skopt can't ask for
+        if self.bounds and len(self.bounds) != len(bounds):
+            raise ValueError(
+                f"{self.path} has {len(self.bounds)} parameters, not {len(bounds)}"
+            )
+        x0, y0 = list(), list()
+        for values, result in zip(self.x_iters[start:], self.func_vals[start:]):
+            if all(
+                value in cell_bounds
+                if isinstance(cell_bounds, list)
+                else cell_bounds[0] <= value <= cell_bounds[1]  # type: ignore
+                for value, cell_bounds in zip(values, bounds)
+            ):
+                x0.append(list(values))
+                y0.append(result)
+        return x0, y0
+
+    def __call__(self, results: OptimizeResult) -> bool:
+        # a skopt callback, which never stops the optimization
+        self.x_iters = [
+            [value if isinstance(value, Enum) else int(value) for value in point]
+            for point in results.x_iters
+        ]
+        self.func_vals = [float(value) for value in results.func_vals]
+        if len(self.func_vals) - self._saved >= self.interval:
+            self.save()
+        return False
+
+    def save(self):
+        state = {
+            "context": self.context,
+            "x_iters": self.x_iters,
+            "func_vals": self.func_vals,
+            "bounds": self.bounds,
+            "warm_started": self.warm_started,
+        }
+        staging = f"{self.path}.tmp"
+        with open(staging, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(staging, self.path)
+        self._saved = len(self.func_vals)
+
+
+def minimize_batched(
+    evaluate_batch: Callable[[list[list[int | Enum]]], list[float]],
+    dimensions: list[tuple[int, int] | Categorical],
+    batch_size: int,
+    n_calls: int = 100,
+    n_initial_points: int = 10,
+    initial_point_generator: str = "random",
+    base_estimator: str = "ET",
+    acq_func: str = "EI",
+    random_state: Optional[int] = None,
+    x0: Optional[list[list[int | Enum]]] = None,
+    y0: Optional[list[float]] = None,
+    xi: float = 0.01,
+    kappa: float = 1.96,
+    n_points: int = 10000,
+    callback: Optional[Callable | list[Callable]] = None,
+    verbose: bool = False,
+) -> OptimizeResult:
+    optimizer = skopt.Optimizer(
+        dimensions,
+        base_estimator,
+        # evaluated points are told on top of the initial points, as in skopt
+        n_initial_points=n_initial_points + (len(x0) if x0 else 0),
+        initial_point_generator=initial_point_generator,
+        acq_func=acq_func,
+        acq_optimizer="sampling",
+        random_state=random_state,
+        acq_func_kwargs={"xi": xi, "kappa": kappa},
+        acq_optimizer_kwargs={"n_points": n_points},
+    )
+    callbacks = check_callback(callback)
+    results = None
+    if x0:
+        if y0 is None:
+            y0 = evaluate_batch(x0)
+            n_calls -= len(y0)
+        results = optimizer.tell(x0, y0)
+    while n_calls > 0:
+        points = optimizer.ask(n_points=min(batch_size, n_calls))
+        values = evaluate_batch(points)
+        n_calls -= len(points)
+        results = optimizer.tell(points, values)
+        if verbose:
+            print(
+                f"Evaluated {len(results.func_vals)} points, "
+                f"current minimum: {results.fun:.4f}"
+            )
+        if any(callback(results) for callback in callbacks):
+            break
+    return results
+
+
+def _resume(
+    kwargs: dict[str, Any],
+    bounds: list[tuple[int, int] | list[Enum]],
+    checkpoint: Checkpoint,
+    warm_start: Optional[Checkpoint],
+) -> dict[str, Any]:
+    # skopt is told the evaluations of the checkpoint and only runs the rest of the
+    # calls; a new checkpoint starts with the points of the warm start
+    kwargs = dict(kwargs)
+    kwargs["callback"] = [*check_callback(kwargs.get("callback")), checkpoint]
+    if len(checkpoint) == 0 and warm_start is not None:
+        x0, y0 = warm_start.points(bounds)
+        checkpoint.warm_started = len(y0)
+    else:
+        x0, y0 = checkpoint.points(bounds)
+        # only the evaluations skopt is told count as done
+        done = len(checkpoint.points(bounds, checkpoint.warm_started)[1])
+        kwargs["n_calls"] = kwargs.get("n_calls", 100) - done
+        kwargs["n_initial_points"] = max(kwargs.get("n_initial_points", 10) - done, 0)
+    if x0:
+        kwargs["x0"], kwargs["y0"] = x0, y0
+    return kwargs
+
+
 def optimize(
     strategy: Strategy,
     func: Callable[[Strategy], float],
-    ohlcv_list: list[OHLCV],
+    ohlcv_list: list[OHLCV] | Dataset | Universe,
+    engine: Optional[Engine] = None,
+    freeze_previous: bool = True,
+    n_jobs: int = 1,
+    batch_size: Optional[int] = None,
+    aggregate: str | Callable[[np.ndarray], float] = "mean",
+    pruner: Optional[Pruner] = None,
+    cache: Optional[EvaluationCache] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    warm_start: Optional[Checkpoint] = None,
+    backend: str = "process",
     **kwargs
 ) -> OptimizeResult:
-    strategy.forward_all(ohlcv_list)
-    optim_func: Callable[[list[int | Enum]], float] = lambda values: -(
-        func(strategy.update_and_forward_all(values, ohlcv_list))
-    )
-    with warnings.catch_warnings():  # FIXME: should be removed as soon as skopt is updated to no longer use np.int
-        warnings.simplefilter("ignore")
-        results = skopt.forest_minimize(
-            optim_func,
-            convert_cell_bounds_skopt(strategy.param_storage.get_cell_bounds()),
-            **kwargs
-        )
+    objective = func
+    if backend not in ("process", "thread"):
+        raise ValueError(f"unknown backend {backend!r}")
+    if backend == "thread" and engine not in (
+        None,
+        compiled.forward_all,
+        compiled.forward_top,
+    ):
+        # the threads run the compiled kernels, which release the GIL
+        raise ValueError("the thread backend evaluates with the compiled engine")
+    if (checkpoint is not None or warm_start is not None) and "x0" in kwargs:
+        raise ValueError("x0 can't be combined with a checkpoint or a warm start")
+    if pruner is not None and (
+        engine is not None or n_jobs != 1 or isinstance(ohlcv_list, Universe)
+    ):
+        raise ValueError("pruning needs the per-bar engine in a single process")
+    if isinstance(ohlcv_list, Universe):
+        # every evaluation runs the whole universe, which parallelizes over symbols
+        if n_jobs != 1:
+            raise ValueError(
+                "set n_jobs on the Universe to evaluate symbols in parallel"
+            )
+        universe = ohlcv_list
+        objective = universe.objective(func, engine, aggregate)
+        forward_all = lambda layer: universe.fit_bounds(layer, engine)
+        freeze_previous = False
+    elif engine is None:
+        forward_all = lambda layer: layer.forward_all(ohlcv_list)
+    else:
+        ohlcv = np.asarray(ohlcv_list, dtype=np.float64)
+        forward_all = lambda layer: engine(layer, ohlcv)
+
+    def evaluate(values: list[int | Enum]) -> float:
+        with profiling.span("evaluation"):
+            strategy.param_storage.apply_cell_values(values)
+            if pruner is not None:
+                return -pruner.evaluate(strategy, func, ohlcv_list)  # type: ignore
+            if objective is func:
+                forward_all(strategy)
+            with profiling.span("objective"):
+                return -objective(strategy)
+
+    if cache is None:
+        optim_func = evaluate
+    else:
+        context = cache.context(strategy, func, ohlcv_list, engine, aggregate)
+        hits, misses = cache.hits, cache.misses
+
+        def cached_batch(
+            evaluate_batch: Callable[[list[list[int | Enum]]], list[float]]
+        ) -> Callable[[list[list[int | Enum]]], list[float]]:
+            def evaluate_cached(points: list[list[int | Enum]]) -> list[float]:
+                values = [cache.get(context, point) for point in points]
+                missing = [i for i, value in enumerate(values) if value is None]
+                if missing:
+                    for i, value in zip(
+                        missing, evaluate_batch([points[i] for i in missing])
+                    ):
+                        cache.put(context, points[i], value)
+                        values[i] = value
+                return values  # type: ignore
+
+            return evaluate_cached
+
+        def optim_func(values: list[int | Enum]) -> float:
+            if (result := cache.get(context, values)) is not None:
+                return result
+            pruned = pruner.pruned if pruner is not None else 0
+            result = evaluate(values)
+            # a penalty depends on the runs before it, only real scores are kept
+            if pruner is None or pruner.pruned == pruned:
+                cache.put(context, values, result)
+            return result
+
+    above_frozen = find_frozen_layer(strategy) if freeze_previous else None
+    if above_frozen is not None:
+        frozen = above_frozen.previous
+        actions = forward_all(frozen) if engine is not None else None
+        if actions is None:
+            actions = frozen.record_actions(ohlcv_list)
+        above_frozen.previous = FrozenStrategy(frozen, actions)  # type: ignore
+
+    try:
+        forward_all(strategy)
+        bounds = strategy.param_storage.get_cell_bounds()
+        dimensions = convert_cell_bounds_skopt(bounds)
+        if checkpoint is not None:
+            checkpoint.attach(
+                EvaluationCache.context(strategy, func, ohlcv_list, engine, aggregate),
+                bounds,
+            )
+            kwargs = _resume(kwargs, bounds, checkpoint, warm_start)
+        elif warm_start is not None and (points := warm_start.points(bounds))[0]:
+            kwargs["x0"], kwargs["y0"] = points
+        with warnings.catch_warnings():  # FIXME: should be removed as soon as skopt is updated to no longer use np.int
+            warnings.simplefilter("ignore")
+            if kwargs.get("n_calls", 100) <= 0 and "x0" in kwargs:
+                # a resumed run that had already finished
+                results = create_result(kwargs["x0"], kwargs["y0"], Space(dimensions))
+            elif n_jobs == 1 and batch_size is None:
+                results = skopt.forest_minimize(optim_func, dimensions, **kwargs)
+            elif n_jobs == 1:
+                results = minimize_batched(
+                    lambda points: [optim_func(values) for values in points],
+                    dimensions,
+                    batch_size,
+                    **kwargs
+                )
+            else:
+                source = (
+                    ohlcv_list
+                    if isinstance(ohlcv_list, Dataset)
+                    else np.asarray(ohlcv_list, dtype=np.float64)
+                )
+                n_workers = n_jobs if n_jobs > 0 else None
+                with (
+                    ThreadPoolEvaluator(strategy, func, source, n_workers)
+                    if backend == "thread"
+                    else ProcessPoolEvaluator(
+                        strategy, func, source, engine, n_workers
+                    )
+                ) as evaluator:
+                    results = minimize_batched(
+                        evaluator if cache is None else cached_batch(evaluator),
+                        dimensions,
+                        batch_size if batch_size is not None else evaluator.n_workers,
+                        **kwargs
+                    )
+    except BaseException:
+        if isinstance(ohlcv_list, Universe):
+            ohlcv_list.close()
+        raise
+    finally:
+        if above_frozen is not None:
+            above_frozen.previous = frozen  # type: ignore
+        if cache is not None:
+            cache.save()
+        if checkpoint is not None:
+            checkpoint.save()
     if results is None:
         raise RuntimeError("skopt.gp_minimize didn't return a result")
-    strategy.update_and_forward_all(results.x, ohlcv_list)
+    if pruner is not None:
+        results.pruning = pruner.stats()
+    if cache is not None:
+        hits, misses = cache.hits - hits, cache.misses - misses
+        results.cache = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": len(cache),
+        }
+    strategy.param_storage.apply_cell_values(results.x)
+    if objective is func:
+        forward_all(strategy)
+    else:
+        # the workers of the universe are kept for one optimization, up to this run
+        try:
+            objective(strategy)
+        finally:
+            ohlcv_list.close()  # type: ignore
     return results
@@ -0,0 +1,225 @@
+from __future__ import annotations
+import os
+import copy
+import queue
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from enum import Enum
+from typing import Callable, Optional, Any
+from fragments.strategy import Strategy, FrozenStrategy
+from fragments.context import BacktestContext, unbind
+from fragments.dataset import Dataset
+from fragments.compiled import CompiledChain
+from fragments.vectorized import get_chain
+
+
+class SharedOHLCV:
+    array: np.ndarray
+    _shm: shared_memory.SharedMemory
+
+    def __init__(self, ohlcv: np.ndarray):
+        self._shm = shared_memory.SharedMemory(create=True, size=max(ohlcv.nbytes, 1))
+        self.array = np.ndarray(ohlcv.shape, dtype=np.float64, buffer=self._shm.buf)
+        self.array[:] = ohlcv
+
+    def descriptor(self) -> tuple[str, tuple[int, ...]]:
+        return self._shm.name, self.array.shape
+
+    @staticmethod
+    def attach(
+        descriptor: tuple[str, tuple[int, ...]]
+    ) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+        name, shape = descriptor
+        shm = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        array.setflags(write=False)
+        return shm, array
+
+    def close(self):
+        del self.array
+        self._shm.close()
+        self._shm.unlink()
+
+
+def detach(strategy: Strategy) -> Strategy:
+    # what is sent to worker processes: a copy without the data of the last run
+    # and without the context it is bound to, which may hold precalculated OHLCV;
+    # workers bind contexts of their own
+    detached = copy.deepcopy(strategy)
+    unbind(detached)
+    return detached
+
+
+_worker: dict[str, Any] = dict()
+
+
+def _init_worker(
+    strategy: Strategy,
+    func: Callable[[Strategy], float],
+    engine: Optional[Callable],
+    source: Dataset | tuple[str, tuple[int, ...]],
+    precalculation: bool,
+    fee: float,
+):
+    if isinstance(source, Dataset):
+        shm, ohlcv, ohlcv_list = None, np.asarray(source), source
+    else:
+        shm, ohlcv = SharedOHLCV.attach(source)
+        ohlcv_list = ohlcv
+    # the worker's copy of the chain runs in a context of its own
+    BacktestContext(
+        fee, ohlcv if precalculation else None, strategy.param_storage
+    ).bind(strategy)
+    _worker.update(
+        shm=shm,
+        ohlcv=ohlcv,
+        ohlcv_list=ohlcv_list,
+        strategy=strategy,
+        func=func,
+        engine=engine,
+    )
+
+
+def _evaluate(values: list[int | Enum]) -> float:
+    strategy: Strategy = _worker["strategy"]
+    strategy.param_storage.apply_cell_values(values)
+    if _worker["engine"] is None:
+        strategy.forward_all(_worker["ohlcv_list"])
+    else:
+        _worker["engine"](strategy, _worker["ohlcv"])
+    return -_worker["func"](strategy)
+
+
+class ProcessPoolEvaluator:
+    shared_ohlcv: Optional[SharedOHLCV]
+    executor: ProcessPoolExecutor
+    n_workers: int
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        func: Callable[[Strategy], float],
+        ohlcv: np.ndarray | Dataset,
+        engine: Optional[Callable] = None,
+        n_jobs: Optional[int] = None,
+    ):
+        source: Dataset | tuple[str, tuple[int, ...]]
+        if isinstance(ohlcv, Dataset) and ohlcv.path is not None:
+            # workers map the same file, nothing is copied
+            self.shared_ohlcv = None
+            source = ohlcv
+        else:
+            self.shared_ohlcv = SharedOHLCV(np.asarray(ohlcv, dtype=np.float64))
+            source = self.shared_ohlcv.descriptor()
+        self.n_workers = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+        try:
+            self.executor = ProcessPoolExecutor(
+                self.n_workers,
+                initializer=_init_worker,
+                initargs=(
+                    detach(strategy),
+                    func,
+                    engine,
+                    source,
+                    strategy.context.precalc,
+                    strategy.context.fee,
+                ),
+            )
+        except BaseException:
+            if self.shared_ohlcv is not None:
+                self.shared_ohlcv.close()
+            raise
+
+    def __call__(self, points: list[list[int | Enum]]) -> list[float]:
+        return list(self.executor.map(_evaluate, points))
+
+    def close(self):
+        self.executor.shutdown()
+        if self.shared_ohlcv is not None:
+            self.shared_ohlcv.close()
+
+    def __enter__(self) -> ProcessPoolEvaluator:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def _read_only(strategy: Strategy) -> dict[int, Any]:
+    # a deepcopy memo for what the runs of a copy only read: the layers below a
+    # frozen one are shared with strategy, copies leave the data of runs behind
+    shared: list[Any] = list()
+    for layer in get_chain(strategy):
+        if isinstance(layer, FrozenStrategy):
+            shared.extend((layer.strategy, layer.actions, layer._action_list))
+    return {id(value): value for value in shared if value is not None}
+
+
+class ThreadPoolEvaluator:
+    ohlcv: np.ndarray
+    func: Callable[[Strategy], float]
+    executor: ThreadPoolExecutor
+    n_workers: int
+    _chains: queue.SimpleQueue[CompiledChain]
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        func: Callable[[Strategy], float],
+        ohlcv: np.ndarray | Dataset,
+        n_jobs: Optional[int] = None,
+        keep_intermediate: bool = False,
+    ):
+        # the compiled kernels release the GIL, so threads run backtests in
+        # parallel on one copy of the data and of the cached indicator series
+        self.ohlcv = np.asarray(ohlcv, dtype=np.float64)
+        self.func = func
+        self.n_workers = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+        self._chains = queue.SimpleQueue()
+        read_only = _read_only(strategy)
+        for _ in range(self.n_workers):
+            # a copy of the chain per worker, bound to a context of its own because
+            # the threads do not see the context that is active in this one
+            worker = copy.deepcopy(strategy, dict(read_only))
+            BacktestContext(strategy.context.fee, None, worker.param_storage).bind(
+                worker
+            )
+            self._chains.put(CompiledChain(worker, keep_intermediate))
+        self.executor = ThreadPoolExecutor(self.n_workers)
+
+    def _evaluate(self, values: list[int | Enum]) -> float:
+        chain = self._chains.get()
+        try:
+            chain.strategy.param_storage.apply_cell_values(values)
+            chain.run(self.ohlcv)
+            return -self.func(chain.strategy)
+        finally:
+            self._chains.put(chain)
+
+    def __call__(self, points: list[list[int | Enum]]) -> list[float]:
+        return list(self.executor.map(self._evaluate, points))
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self) -> ThreadPoolEvaluator:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def evaluate_batch(
+    strategy: Strategy,
+    func: Callable[[Strategy], float],
+    ohlcv: np.ndarray | Dataset,
+    points: list[list[int | Enum]],
+    n_jobs: Optional[int] = None,
+) -> np.ndarray:
+    # the objective for every point, which leaves strategy itself untouched. The
+    # pool and the copies of the chain are made for this one batch; callers that
+    # evaluate batch after batch keep a ThreadPoolEvaluator open instead, which
+    # copies the chain once and runs later batches on the same threads
+    with ThreadPoolEvaluator(strategy, func, ohlcv, n_jobs) as evaluator:
+        return -np.asarray(evaluator(points), dtype=np.float64)
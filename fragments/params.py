@@ -34,6 +34,9 @@ class ParamStorage:
     def get_cell_bounds(self) -> list[tuple[int, int] | list[Enum]]:
         return [cell.bounds for cell in self.cells]
 
+    def get_cell_values(self) -> list[int | Enum]:
+        return [cell.value for cell in self.cells]
+
     def apply_cell_values(self, values: list[int | Enum]):
         if len(values) != len(self.cells):
             raise RuntimeError(
@@ -0,0 +1,242 @@
+from __future__ import annotations
+import os
+import gc
+import sys
+import json
+import time
+import threading
+import functools
+import tracemalloc
+import skopt
+from contextlib import nullcontext
+from typing import Callable, Optional, Any
+from fragments.strategy import Strategy
+from fragments.indicators import Indicator, IndicatorPlan
+from fragments import vectorized, compiled
+
+_profiler: Optional[Profiler] = None
+_disabled = nullcontext()
+
+
+def span(name: str):
+    # what optimize wraps its evaluations in; a shared no-op unless profiling
+    if _profiler is None:
+        return _disabled
+    return _Span(_profiler, name)
+
+
+def _subclasses(cls: type) -> list[type]:
+    result = list()
+    for subclass in cls.__subclasses__():
+        result.append(subclass)
+        result += _subclasses(subclass)
+    return result
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start", "blocks")
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.blocks = self.profiler._enter()
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *_):
+        self.profiler._record(self.name, self.start, self.blocks)
+
+
+class Profiler:
+    trace_path: Optional[str]
+    allocations: bool
+    wall_time: float
+    _stats: dict[str, list[int]]
+    _blocks: dict[str, int]
+    _events: list[tuple[str, int, int, int]]
+    _local: threading.local
+    _lock: threading.Lock
+    _patches: list[tuple[Any, str, Any]]
+    _allocation_sites: list[dict[str, Any]]
+    _collections: list[int]
+
+    def __init__(self, trace_path: Optional[str] = None, allocations: bool = False):
+        self.trace_path = trace_path
+        self.allocations = allocations
+        self.wall_time = 0.0
+        self._stats = dict()
+        self._blocks = dict()
+        self._events = list()
+        # spans nest per thread, the totals are shared
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patches = list()
+        self._allocation_sites = list()
+        self._collections = list()
+        self._start = 0
+
+    def _children(self) -> list[int]:
+        if (children := getattr(self._local, "children", None)) is None:
+            children = self._local.children = list()
+        return children
+
+    def _enter(self, trace: bool = True) -> Optional[int]:
+        self._children().append(0)
+        # counting live blocks is too slow for bar by bar calls
+        if trace and self.allocations:
+            return sys.getallocatedblocks()
+        return None
+
+    def _record(
+        self, name: str, start: int, blocks: Optional[int], trace: bool = True
+    ):
+        # self time leaves out the spans that ran inside this one
+        elapsed = time.perf_counter_ns() - start
+        stack = self._children()
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            if (stat := self._stats.get(name)) is None:
+                stat = self._stats[name] = [0, 0, 0]
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] += elapsed - children
+            if blocks is not None:
+                self._blocks[name] = (
+                    self._blocks.get(name, 0) + sys.getallocatedblocks() - blocks
+                )
+            if trace:
+                self._events.append((name, start, elapsed, threading.get_ident()))
+
+    def _wrap(
+        self, owner: Any, attribute: str, name: str | Callable, trace: bool = True
+    ):
+        original = vars(owner)[attribute]
+        profiler = self
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            blocks = profiler._enter(trace)
+            start = time.perf_counter_ns()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profiler._record(
+                    name if isinstance(name, str) else name(*args),
+                    start,
+                    blocks,
+                    trace,
+                )
+
+        self._patches.append((owner, attribute, original))
+        setattr(owner, attribute, wrapper)
+
+    def _install(self):
+        # bar by bar calls are only counted, a trace of them would be enormous
+        for cls in _subclasses(Strategy):
+            if "forward" in vars(cls):
+                self._wrap(cls, "forward", f"forward:{cls.__name__}", trace=False)
+        for cls in [Strategy, *_subclasses(Strategy)]:
+            if "forward_all" in vars(cls):
+                self._wrap(cls, "forward_all", "forward_all")
+        for cls in _subclasses(Indicator):
+            if "forward" in vars(cls):
+                self._wrap(cls, "forward", f"indicator:{cls.__name__}", trace=False)
+            if "reset" in vars(cls):
+                self._wrap(cls, "reset", f"reset:{cls.__name__}")
+            if "calculate" in vars(cls):
+                self._wrap(cls, "calculate", f"calculate:{cls.__name__}")
+        self._wrap(IndicatorPlan, "run", "indicator_plan")
+        self._wrap(
+            vectorized,
+            "forward_layer",
+            lambda strategy, *_: f"vectorized:{type(strategy).__name__}",
+        )
+        self._wrap(compiled, "configure_kernel", "compiled:configure_kernel")
+        self._wrap(compiled, "store_results", "compiled:store_results")
+        # the surrogate is fitted when skopt is told new results
+        self._wrap(skopt.Optimizer, "tell", "surrogate:tell")
+        self._wrap(skopt.Optimizer, "ask", "surrogate:ask")
+
+    def _uninstall(self):
+        for owner, attribute, original in reversed(self._patches):
+            setattr(owner, attribute, original)
+        self._patches = list()
+
+    def __enter__(self) -> Profiler:
+        global _profiler
+        if _profiler is not None:
+            raise RuntimeError("another profiler is already active")
+        self._install()
+        if self.allocations:
+            self._collections = [stat["collections"] for stat in gc.get_stats()]
+            tracemalloc.start()
+        _profiler = self
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        global _profiler
+        self.wall_time = (time.perf_counter_ns() - self._start) / 1e9
+        _profiler = None
+        self._uninstall()
+        if self.allocations:
+            # the sites holding the most blocks that are still alive at the end
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self._allocation_sites = [
+                {
+                    "site": f"{frame.filename}:{frame.lineno}",
+                    "count": stat.count,
+                    "size": stat.size,
+                }
+                for stat in sorted(
+                    snapshot.statistics("lineno"), key=lambda stat: -stat.count
+                )[:20]
+                for frame in [stat.traceback[0]]
+            ]
+            self._collections = [
+                stat["collections"] - before
+                for stat, before in zip(gc.get_stats(), self._collections)
+            ]
+        if self.trace_path is not None:
+            self.save_trace(self.trace_path)
+
+    def report(self) -> dict[str, Any]:
+        spans = {
+            name: {
+                "count": count,
+                "total": total / 1e9,
+                "self": own / 1e9,
+                "mean": total / count / 1e9,
+                "net_blocks": self._blocks.get(name),
+            }
+            for name, (count, total, own) in sorted(
+                self._stats.items(), key=lambda item: -item[1][2]
+            )
+        }
+        return {
+            "wall_time": self.wall_time,
+            "spans": spans,
+            "allocations": self._allocation_sites,
+            "gc_collections": self._collections,
+        }
+
+    def save_trace(self, path: str):
+        # chrome trace event format, opens in perfetto, chrome://tracing, speedscope
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._start) / 1e3,
+                "dur": elapsed / 1e3,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, elapsed, tid in self._events
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import re
+import numpy as np
+from typing import Optional, Union
+
+
+INTERVAL_UNITS = {
+    "s": 1000,
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+    "w": 7 * 24 * 60 * 60 * 1000,
+}
+
+# a bare int groups every n bars, a string like "15m" groups by timestamp
+Interval = Union[int, str]
+
+
+def parse_interval(interval: str) -> int:
+    match = re.fullmatch(r"(\d+)([smhdw])", interval)
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(f"invalid interval {interval!r}")
+    return int(match.group(1)) * INTERVAL_UNITS[match.group(2)]
+
+
+def interval_label(interval: Interval) -> str:
+    if isinstance(interval, str):
+        milliseconds = parse_interval(interval)
+        for unit, size in sorted(INTERVAL_UNITS.items(), key=lambda i: -i[1]):
+            if milliseconds % size == 0:
+                return f"{milliseconds // size}{unit}"
+    if interval < 1:
+        raise ValueError(f"invalid interval {interval!r}")
+    return f"{interval}bars"
+
+
+def bucket_starts(
+    n_bars: int, interval: Interval, timestamps: Optional[np.ndarray] = None
+) -> np.ndarray:
+    if isinstance(interval, str):
+        if timestamps is None:
+            raise ValueError("resampling by time needs timestamps")
+        buckets = timestamps // parse_interval(interval)
+        return np.flatnonzero(np.diff(buckets, prepend=buckets[:1] - 1))
+    if interval < 1:
+        raise ValueError(f"invalid interval {interval!r}")
+    return np.arange(0, n_bars, interval)
+
+
+def resample(
+    ohlcv: np.ndarray,
+    interval: Interval,
+    timestamps: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    if ohlcv.shape[0] == 0:
+        return np.empty((0, 5), dtype=np.float64, order="F"), (
+            None if timestamps is None else np.empty(0, dtype=np.int64)
+        )
+    starts = bucket_starts(ohlcv.shape[0], interval, timestamps)
+    ends = np.append(starts[1:], ohlcv.shape[0]) - 1
+    result = np.empty((starts.shape[0], 5), dtype=np.float64, order="F")
+    result[:, 0] = ohlcv[starts, 0]
+    result[:, 1] = np.maximum.reduceat(ohlcv[:, 1], starts)
+    result[:, 2] = np.minimum.reduceat(ohlcv[:, 2], starts)
+    result[:, 3] = ohlcv[ends, 3]
+    result[:, 4] = np.add.reduceat(ohlcv[:, 4], starts)
+    if timestamps is None:
+        return result, None
+    if isinstance(interval, str):
+        # bars are stamped with the start of their bucket, even if the first bar is missing
+        size = parse_interval(interval)
+        return result, timestamps[starts] // size * size
+    return result, timestamps[starts].astype(np.int64)
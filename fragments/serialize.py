@@ -0,0 +1,296 @@
+from __future__ import annotations
+import os
+import json
+import importlib
+import numpy as np
+from enum import Enum
+from typing import Any, Callable, Optional
+from fragments.strategy import Strategy, FrozenStrategy
+from fragments.indicators import Indicator, OHLCV
+from fragments.params import ParamCell, ParamStorage
+from fragments.dataset import Dataset, _open_range
+
+FORMAT_VERSION = 1
+SPEC_KEY = "chain"
+# state that configures runs and that reset leaves alone, everything else is the
+# result of a run and only saved along with the histories it belongs to
+CONFIG_STATE = (
+    "_freeze_bounds",
+    "_invert",
+    "_limiter_threshold",
+    "_precalc_allowed",
+)
+# precalculation bookkeeping that reset rebuilds and that is never saved
+PRECALC_STATE = ("_precalc", "_precalc_iteraion")
+
+Engine = Callable[[Strategy, np.ndarray], Optional[np.ndarray]]
+
+
+# A chain is saved as an .npz file: a JSON description of the layers, their
+# indicators and parameter cells under SPEC_KEY, the actions of frozen layers and,
+# optionally, the equity, trades and final state of every layer. Layers and
+# indicators are rebuilt through their constructors, which take indicators by the
+# name of the attribute they are kept in.
+
+
+def _name(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _resolve(name: str) -> Any:
+    module, qualname = name.split(":")
+    result: Any = importlib.import_module(module)
+    for attribute in qualname.split("."):
+        result = getattr(result, attribute)
+    return result
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return {"enum": _name(type(value)), "value": value.value}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(item) for item in value]}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict) and "enum" in value:
+        return _resolve(value["enum"])(value["value"])
+    if isinstance(value, dict) and "tuple" in value:
+        return tuple(_decode(item) for item in value["tuple"])
+    return value
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (bool, int, float, str, np.generic))
+
+
+class _Writer:
+    owners: list[dict[str, Any]]
+    objects: list[Strategy | Indicator]
+    arrays: dict[str, np.ndarray]
+    storages: list[ParamStorage]
+    histories: bool
+    _indices: dict[int, int]
+
+    def __init__(self, histories: bool):
+        self.owners = list()
+        self.objects = list()
+        self.arrays = dict()
+        self.storages = list()
+        self.histories = histories
+        self._indices = dict()
+
+    def storage(self, param_storage: ParamStorage) -> int:
+        for index, storage in enumerate(self.storages):
+            if storage is param_storage:
+                return index
+        self.storages.append(param_storage)
+        return len(self.storages) - 1
+
+    def owner(self, owner: Strategy | Indicator) -> int:
+        # what an owner is built from gets its index first, so owners can be rebuilt
+        # in the order they are stored
+        if (index := self._indices.get(id(owner))) is not None:
+            return index
+        spec: dict[str, Any] = {
+            "type": _name(type(owner)),
+            "storage": self.storage(owner.param_storage),
+            "cells": dict(),
+            "indicators": dict(),
+            "state": dict(),
+            "results": dict(),
+        }
+        for name, attribute in vars(owner).items():
+            if isinstance(attribute, ParamCell):
+                spec["cells"][name] = [
+                    _encode(attribute.bounds),
+                    _encode(attribute.value),
+                ]
+            elif isinstance(attribute, Indicator):
+                spec["indicators"][name] = self.owner(attribute)
+            elif name in CONFIG_STATE:
+                spec["state"][name] = _encode(attribute)
+            elif (
+                self.histories
+                and _is_scalar(attribute)
+                and name not in PRECALC_STATE
+            ):
+                spec["results"][name] = _encode(attribute)
+        if isinstance(owner, FrozenStrategy):
+            spec["strategy"] = self.owner(owner.strategy)
+        elif isinstance(owner, Strategy):
+            spec["previous"] = (
+                self.owner(owner.previous) if owner.previous is not None else None
+            )
+        index = len(self.owners)
+        self.owners.append(spec)
+        self.objects.append(owner)
+        self._indices[id(owner)] = index
+        if isinstance(owner, FrozenStrategy):
+            self.arrays[f"actions_{index}"] = np.asarray(owner.actions, np.int32)
+        if isinstance(owner, Strategy) and self.histories:
+            self.arrays[f"hist_equity_{index}"] = np.asarray(
+                owner.hist_equity, dtype=np.float64
+            )
+            self.arrays[f"trades_{index}"] = np.array(owner.trades)
+        return index
+
+    def cell_order(self) -> list[list[Any]]:
+        # the order skopt applies values in; cells no saved owner keeps are stored
+        # on their own so the values stay aligned
+        owned = {
+            id(cell): [index, name]
+            for index, owner in enumerate(self.objects)
+            for name, cell in vars(owner).items()
+            if isinstance(cell, ParamCell)
+        }
+        return [
+            [
+                owned.get(
+                    id(cell), {"cell": [_encode(cell.bounds), _encode(cell.value)]}
+                )
+                for cell in storage.cells
+            ]
+            for storage in self.storages
+        ]
+
+
+def save_chain(
+    strategy: Strategy,
+    path: str,
+    dataset: Optional[Dataset] = None,
+    histories: bool = False,
+):
+    # dataset is referenced by its path, histories that are not stored are rebuilt
+    # from it when the chain is loaded
+    writer = _Writer(histories)
+    top = writer.owner(strategy)
+    reference = None
+    if dataset is not None:
+        if dataset.path is None:
+            raise ValueError("only datasets on disk can be referenced")
+        reference = {
+            "path": os.path.abspath(dataset.path),
+            "start": dataset.offset,
+            "stop": dataset.offset + len(dataset),
+        }
+    spec = {
+        "version": FORMAT_VERSION,
+        "top": top,
+        "owners": writer.owners,
+        "storages": writer.cell_order(),
+        "dataset": reference,
+        "histories": histories,
+    }
+    staging = f"{path}.tmp.npz"
+    with open(staging, "wb") as f:
+        np.savez_compressed(
+            f, **{SPEC_KEY: np.array(json.dumps(spec))}, **writer.arrays
+        )
+    os.replace(staging, path)
+
+
+def _build(
+    spec: dict[str, Any],
+    index: int,
+    owners: list[Any],
+    storages: list[ParamStorage],
+    arrays: dict[str, np.ndarray],
+) -> Strategy | Indicator:
+    cls = _resolve(spec["type"])
+    storage = storages[spec["storage"]]
+    if issubclass(cls, FrozenStrategy):
+        owner = cls(owners[spec["strategy"]], arrays[f"actions_{index}"])
+    elif issubclass(cls, Strategy):
+        previous = spec["previous"]
+        owner = cls(
+            **{name: owners[i] for name, i in spec["indicators"].items()},
+            param_storage=storage,
+            previous=owners[previous] if previous is not None else None,
+        )
+    else:
+        owner = cls(param_storage=storage)
+    for name, (bounds, value) in spec["cells"].items():
+        cell = getattr(owner, name)
+        cell.bounds = _decode(bounds)
+        cell.value = _decode(value)
+    for name, value in spec["state"].items():
+        setattr(owner, name, _decode(value))
+    return owner
+
+
+def load_chain(
+    path: str,
+    histories: bool = False,
+    dataset: Optional[Dataset | list[OHLCV] | np.ndarray] = None,
+    engine: Optional[Engine] = None,
+) -> Strategy:
+    # with histories, stored arrays are used if there are any, otherwise the chain is
+    # run again on dataset or on the one referenced when it was saved
+    with np.load(path, allow_pickle=False) as data:
+        spec = json.loads(str(data[SPEC_KEY]))
+        arrays = {key: data[key] for key in data.files if key != SPEC_KEY}
+    if spec["version"] != FORMAT_VERSION:
+        raise RuntimeError(f"unsupported chain version {spec['version']}")
+
+    storages = [ParamStorage() for _ in spec["storages"]]
+    owners: list[Any] = list()
+    for index, owner_spec in enumerate(spec["owners"]):
+        owners.append(_build(owner_spec, index, owners, storages, arrays))
+    for storage, order in zip(storages, spec["storages"]):
+        storage.cells = [
+            getattr(owners[entry[0]], entry[1])
+            if isinstance(entry, list)
+            else ParamCell(_decode(entry["cell"][0]), _decode(entry["cell"][1]))
+            for entry in order
+        ]
+    strategy = owners[spec["top"]]
+    if not histories:
+        return strategy
+
+    layers = [
+        (index, owner)
+        for index, owner in enumerate(owners)
+        if isinstance(owner, Strategy)
+    ]
+    if spec["histories"]:
+        for index, owner in enumerate(owners):
+            for name, value in spec["owners"][index]["results"].items():
+                setattr(owner, name, _decode(value))
+        for index, layer in layers:
+            layer.hist_equity = arrays[f"hist_equity_{index}"]
+            layer.trades = arrays[f"trades_{index}"]
+        return strategy
+    if dataset is None:
+        if spec["dataset"] is None:
+            raise ValueError(f"{path} has no histories and references no dataset")
+        reference = spec["dataset"]
+        dataset = _open_range(reference["path"], reference["start"], reference["stop"])
+    # the chains inside frozen layers are run on their own and mirrored, like
+    # FrozenStrategy does when it is created
+    for _, layer in layers:
+        if isinstance(layer, FrozenStrategy):
+            _run(layer.strategy, dataset, engine)
+            layer.equity = layer.strategy.equity
+            layer.hist_equity = layer.strategy.hist_equity
+            layer.trade_log = layer.strategy.trade_log
+    _run(strategy, dataset, engine)
+    return strategy
+
+
+def _run(
+    strategy: Strategy,
+    dataset: Dataset | list[OHLCV] | np.ndarray,
+    engine: Optional[Engine],
+):
+    if engine is None:
+        strategy.forward_all(dataset)  # type: ignore
+    else:
+        engine(strategy, np.asarray(dataset, dtype=np.float64))
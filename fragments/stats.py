@@ -1,11 +1,13 @@
 from fragments.strategy import Strategy, TradeDirection
 from fragments.indicators import OHLCV
+from fragments.dataset import Dataset
+from fragments import metrics
 import matplotlib.pyplot as plt
 import numpy as np
 
 
 def total_profit(strategy: Strategy) -> float:
-    return sum([trade.profit for trade in strategy.trades])
+    return float(np.sum(strategy.trades.profit))
 
 
 def equity(strategy: Strategy) -> float:
@@ -13,30 +15,17 @@ def equity(strategy: Strategy) -> float:
 
 
 def sqn(strategy: Strategy) -> float:
-    profits = np.array([trade.profit for trade in strategy.trades])
-    profits = profits[profits != 0]
-    if strategy.equity < 0.01 or profits.size == 0 or profits[profits > 0].size == 0:
+    if strategy.equity < 0.01:
         return 0
-    if profits[profits < 0].size == 0:
-        return 1.0
-    avg_loss = np.abs(np.average(profits[profits < 0]))
-    r_multiples = profits / avg_loss
-    r_expectancy = np.average(r_multiples)
-    r_multiples_std = np.std(r_multiples)
-    n_trades = profits.size
-    # if n_trades < 100:
-    sqn = (r_expectancy / r_multiples_std) * np.sqrt(n_trades)
-    # else:
-    #     sqn = (r_expectancy / (r_multiples_std * (n_trades / 100))) * np.sqrt(n_trades)
-    return sqn
+    return metrics.sqn(strategy.trades.profit)
 
 
-def plot(strategy: Strategy, ohlcv_list: list[OHLCV]):
+def plot(strategy: Strategy, ohlcv_list: list[OHLCV] | Dataset):
     plt.style.use("fast")
     fig, (ax1, ax2) = plt.subplots(
         2, 1, sharex=True, figsize=(15, 7), gridspec_kw={"height_ratios": [1, 2]}
     )
-    ohlcv = np.array(ohlcv_list)
+    ohlcv = np.asarray(ohlcv_list)
     if strategy.iteration != len(ohlcv_list):
         raise RuntimeError(
             f"amount of iterations in strategy must match length of OHLCV list: {strategy.iteration} != {len(ohlcv_list)}"
@@ -58,14 +47,10 @@ def plot(strategy: Strategy, ohlcv_list: list[OHLCV]):
     ax2.set_xlabel("Iteration")
     ax2.plot(ohlcv[:, 3], c="0.2", lw=1)
 
-    if len(strategy.trades) < 100:
-        trades_won = []
-        trades_lost = []
-        for trade in strategy.trades:
-            if trade.profit >= 0:
-                trades_won.append(trade.iteration - 1)
-            else:
-                trades_lost.append(trade.iteration - 1)
+    trades = strategy.trades
+    if len(trades) < 100:
+        trades_won = (trades.iteration[trades.profit >= 0] - 1).tolist()
+        trades_lost = (trades.iteration[trades.profit < 0] - 1).tolist()
         if len(trades_lost) != 0:
             ax2.scatter(
                 np.array(trades_lost),
@@ -3,9 +3,12 @@ from typing import Optional
 from dataclasses import dataclass, field
 from enum import Enum, IntEnum
 from abc import ABC
+import numpy as np
 from fragments import cproc
+from fragments.cproc import TradeLog, TRADE_DTYPE
 from fragments.params import ParamCell, ParamStorage
-from fragments.indicators import Indicator, OHLCV
+from fragments.indicators import Indicator, IndicatorPlan, OHLCV
+from fragments.context import BacktestContext, current_context
 
 
 class Action(IntEnum):
@@ -29,7 +32,7 @@ class Trade:
     profit: float = field(init=False, default=0)
     liquidation: bool = field(init=False, default=False)
     duration: int = field(init=False, default=0)
-    _prev_ohlcv: OHLCV | None = field(init=False, default=None)
+    _entry_close: float | None = field(init=False, default=None)
 
     def __post_init__(self):
         if self.fee != 0:
@@ -39,20 +42,19 @@ class Trade:
         self.duration += 1
         if self.liquidation:
             return
-        if self._prev_ohlcv is None:
-            self._prev_ohlcv = ohlcv
+        if self._entry_close is None:
+            self._entry_close = ohlcv[3]
             return
+        opening_profit = -(self.value / 100 * self.fee) if self.fee != 0 else 0.0
         match self.direction:
             case TradeDirection.LONG:
-                self.profit = (self.value + self.profit) * (
-                    ohlcv[3] / self._prev_ohlcv[3]
+                self.profit = (self.value + opening_profit) * (
+                    ohlcv[3] / self._entry_close
                 ) - self.value
             case TradeDirection.SHORT:
-                self.profit = -(
-                    (self.value - self.profit) * (ohlcv[3] / self._prev_ohlcv[3])
-                    - self.value
+                self.profit = self.value - (self.value - opening_profit) * (
+                    ohlcv[3] / self._entry_close
                 )
-        self._prev_ohlcv = ohlcv
         if self.profit <= -self.value:
             self.liquidation = True
             self.profit = -self.value
@@ -62,30 +64,33 @@ class Strategy(ABC):
     param_storage: ParamStorage
     previous: Optional[Strategy]
     action: Action
-    trades: list[Trade]
+    trade_log: TradeLog
     iteration: int
     equity: float
     hist_equity: list[float]
-    _fee: float = 0.0
+    _context: Optional[BacktestContext]
+    _fee: float
     _last_trade_equity: float
     _in_trade: bool
 
     @classmethod
     def set_fee(cls, fee: float):
-        cls._fee = fee
+        # sets the fee of the active context, the process default outside of one
+        current_context().fee = fee
 
     def __init__(
         self,
         param_storage: Optional[ParamStorage] = None,
         previous: Optional[Strategy] = None,
+        context: Optional[BacktestContext] = None,
     ):
+        self._context = context
         if param_storage is None:
-            if not ParamStorage.global_storage_active:
-                ParamStorage.new_global()
-            self.param_storage = ParamStorage.global_storage
+            self.param_storage = self.context.param_storage
         else:
             self.param_storage = param_storage
-        self.trades = list()
+        self._fee = self.context.fee
+        self.trade_log = TradeLog()
         self.iteration = 0
         self.equity = 100.0
         self.hist_equity = list()
@@ -96,16 +101,57 @@ class Strategy(ABC):
         else:
             self.previous = None
 
+    def __getstate__(self) -> dict:
+        # copies and pickles leave the history and trades of the last run behind,
+        # they grow with the bars it ran on
+        state = vars(self).copy()
+        state.pop("hist_equity", None)
+        state.pop("trade_log", None)
+        return state
+
+    def __setstate__(self, state: dict):
+        vars(self).update(state)
+        self.hist_equity = list()
+        self.trade_log = TradeLog()
+
+    @property
+    def context(self) -> BacktestContext:
+        # unbound strategies follow whatever context is active when they run
+        return self._context if self._context is not None else current_context()
+
+    @property
+    def trades(self) -> np.recarray:
+        return self.trade_log.view()
+
+    @trades.setter
+    def trades(self, trades: TradeLog | np.ndarray | list[Trade]):
+        if isinstance(trades, TradeLog):
+            self.trade_log = trades
+        elif isinstance(trades, np.ndarray):
+            self.trade_log = TradeLog.from_records(trades)
+        else:
+            self.trade_log = TradeLog.from_trades(trades)
+
     def forward(self, ohlcv: OHLCV):
         self.iteration += 1
         if self.previous is not None:
             self.previous.forward(ohlcv)
 
     def forward_all(self, ohlcv_list: list[OHLCV]):
+        self.prepare()
         self.reset()
         for ohlcv in ohlcv_list:
             self.forward(ohlcv)
 
+    def record_actions(self, ohlcv_list: list[OHLCV]) -> np.ndarray:
+        self.prepare()
+        self.reset()
+        actions = np.empty(len(ohlcv_list), dtype=np.int32)
+        for i, ohlcv in enumerate(ohlcv_list):
+            self.forward(ohlcv)
+            actions[i] = self.action
+        return actions
+
     def update_and_forward_all(
         self, values: list[int | Enum], ohlcv_list: list[OHLCV]
     ) -> Strategy:
@@ -113,10 +159,37 @@ class Strategy(ABC):
         self.forward_all(ohlcv_list)
         return self
 
+    def indicators(self) -> list[Indicator]:
+        # the indicators of this layer and of the layers before it
+        indicators = list()
+        layer: Optional[Strategy] = self
+        while layer is not None:
+            indicators.extend(
+                attribute
+                for attribute in vars(layer).values()
+                if isinstance(attribute, Indicator)
+            )
+            layer = layer.previous
+        return indicators
+
+    def plan(self) -> IndicatorPlan:
+        # indicators that read their values from series, the others stream
+        return IndicatorPlan(
+            indicator for indicator in self.indicators() if indicator._precalc_allowed
+        )
+
+    def prepare(self):
+        # the precalculated series are all calculated in one pass before the
+        # indicators pick them up in reset
+        if (ohlcv := self.context.precalc_ohlcv) is not None:
+            self.plan().run(ohlcv)
+
     def reset(self):
         if self.previous is not None:
             self.previous.reset()
-        self.trades = list()
+        # the fee is fixed for the whole run
+        self._fee = self.context.fee
+        self.trade_log = TradeLog()
         self.iteration = 0
         self.equity = 100.0
         self.hist_equity = list()
@@ -124,11 +197,33 @@ class Strategy(ABC):
 
     def _new_trade(self, direction: TradeDirection):
         self._last_trade_equity = self.equity
-        self.trades.append(
-            Trade(direction, min(100, self.equity), self.iteration, Strategy._fee)
+        self.trade_log.open(
+            direction, min(100, self.equity), self.iteration, self._fee
         )
 
 
+class FrozenStrategy(Strategy):
+    strategy: Strategy
+    actions: np.ndarray
+    _action_list: list[int]
+
+    def __init__(self, strategy: Strategy, actions: np.ndarray):
+        super().__init__(strategy.param_storage, context=strategy._context)
+        self.strategy = strategy
+        self.actions = actions
+        self._action_list = actions.tolist()
+        self.equity = strategy.equity
+        self.hist_equity = strategy.hist_equity
+        self.trade_log = strategy.trade_log
+
+    def forward(self, ohlcv: OHLCV):
+        self.iteration += 1
+        self.action = self._action_list[self.iteration - 1]  # type: ignore
+
+    def reset(self):
+        self.iteration = 0
+
+
 class ConditionType(IntEnum):
     LESS_THAN = 1
     MORE_THAN = 2
@@ -153,8 +248,9 @@ class ConditionalStrategy(Strategy):
         indicator: Indicator,
         param_storage: Optional[ParamStorage] = None,
         previous: Optional[Strategy] = None,
+        context: Optional[BacktestContext] = None,
     ):
-        super().__init__(param_storage, previous)
+        super().__init__(param_storage, previous, context)
         self.indicator = indicator
         self.condition_threshold = self.param_storage.create_default_numerical_cell()
         if previous is not None:
@@ -176,6 +272,7 @@ class ConditionalStrategy(Strategy):
         self.indicator.reset()
 
     def forward_all(self, ohlcv_list: list[OHLCV]):
+        self.prepare()
         self.reset()
         for ohlcv in ohlcv_list:
             self.forward(ohlcv)
@@ -195,15 +292,16 @@ class LimiterStrategy(Strategy):
     indicator: Indicator
     limiter_multiplier: ParamCell[int]
     limiter_type: ParamCell[LimiterType]
-    _limiter_threshold: float
+    _limiter_threshold: float = 0.0
 
     def __init__(
         self,
         indicator: Indicator,
         param_storage: Optional[ParamStorage] = None,
         previous: Optional[Strategy] = None,
+        context: Optional[BacktestContext] = None,
     ):
-        super().__init__(param_storage, previous)
+        super().__init__(param_storage, previous, context)
         self.indicator = indicator
         self.limiter_multiplier = self.param_storage.create_cell((10, 200), 100)
         self.limiter_type = self.param_storage.create_default_categorical_cell(
@@ -237,8 +335,9 @@ class CrossoverStrategy(Strategy):
         second_indicator: Indicator,
         param_storage: Optional[ParamStorage] = None,
         previous: Optional[Strategy] = None,
+        context: Optional[BacktestContext] = None,
     ):
-        super().__init__(param_storage, previous)
+        super().__init__(param_storage, previous, context)
         self.first_indicator = first_indicator
         self.second_indicator = second_indicator
         self.crossover_handling = self.param_storage.create_default_categorical_cell(
@@ -277,8 +376,9 @@ class InvertingStrategy(Strategy):
         indicator: Optional[Indicator] = None,
         param_storage: Optional[ParamStorage] = None,
         previous: Optional[Strategy] = None,
+        context: Optional[BacktestContext] = None,
     ):
-        super().__init__(param_storage, previous)
+        super().__init__(param_storage, previous, context)
         if indicator is not None:
             self.indicator = indicator
             self.indicator.disable_precalculation_for_self()
@@ -0,0 +1,156 @@
+from __future__ import annotations
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+from fragments.strategy import Strategy, Action, CrossoverStrategy, CrossoverHandling
+from fragments.indicators import SMA, OHLCV
+from fragments.dataset import Dataset
+from fragments.optim import Engine
+from fragments import vectorized
+
+
+@dataclass
+class SweepResult:
+    first_periods: np.ndarray
+    second_periods: np.ndarray
+    handlings: list[CrossoverHandling]
+    # scores[handling, first, second], indexed like the three lists above
+    scores: np.ndarray
+    wall_time: float
+
+    @property
+    def best(self) -> tuple[int, int, CrossoverHandling]:
+        handling, first, second = np.unravel_index(
+            np.argmax(self.scores), self.scores.shape
+        )
+        return (
+            int(self.first_periods[first]),
+            int(self.second_periods[second]),
+            self.handlings[handling],
+        )
+
+    @property
+    def fun(self) -> float:
+        return float(np.max(self.scores))
+
+
+def sma_matrix(close: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    # every period from one prefix sum, in the float32 that crossovers compare in
+    cumsum = np.empty(close.shape[0] + 1, dtype=np.float64)
+    cumsum[0] = 0.0
+    np.cumsum(close, out=cumsum[1:])
+    result = np.full((periods.shape[0], close.shape[0]), np.nan, dtype=np.float32)
+    for row, period in zip(result, periods):
+        if period <= close.shape[0]:
+            row[period - 1 :] = (cumsum[period:] - cumsum[:-period]) / period
+    return result
+
+
+def crossover_events(
+    first: np.ndarray, second: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    # rows of second are crossed with first at once; nan warmup bars never compare
+    # true, so the first bar with both values only sets the previous values
+    difference = first[np.newaxis, :] - second
+    with np.errstate(invalid="ignore"):
+        crossed_up = (difference[:, :-1] <= 0) & (difference[:, 1:] > 0)
+        crossed_down = (difference[:, :-1] >= 0) & (difference[:, 1:] < 0)
+    return crossed_up, crossed_down
+
+
+def _periods(indicator: SMA, periods: Optional[Iterable[int]]) -> np.ndarray:
+    if periods is None:
+        lower, upper = indicator.period.bounds  # type: ignore
+        periods = range(lower, upper + 1)
+    return np.asarray(list(periods), dtype=np.int64)
+
+
+def sweep_crossover(
+    strategy: CrossoverStrategy,
+    func: Callable[[Strategy], float],
+    ohlcv_list: list[OHLCV] | np.ndarray | Dataset,
+    first_periods: Optional[Iterable[int]] = None,
+    second_periods: Optional[Iterable[int]] = None,
+    engine: Optional[Engine] = None,
+    block_size: int = 1 << 24,
+) -> SweepResult:
+    if not isinstance(strategy, CrossoverStrategy) or not (
+        isinstance(strategy.first_indicator, SMA)
+        and isinstance(strategy.second_indicator, SMA)
+    ):
+        raise TypeError("sweeps are only supported for a crossover of two SMAs")
+    start_time = time.perf_counter()
+    ohlcv = np.asarray(ohlcv_list, dtype=np.float64)
+    close = np.ascontiguousarray(ohlcv[:, 3])
+    if np.isnan(close).any():
+        raise ValueError("close prices contain nan")
+    first = _periods(strategy.first_indicator, first_periods)
+    second = _periods(strategy.second_indicator, second_periods)
+    handlings: list[CrossoverHandling] = list(
+        strategy.crossover_handling.bounds  # type: ignore
+    )
+
+    # layers below the crossover keep their parameters, their actions are fixed
+    previous_actions = None
+    if strategy.previous is not None:
+        previous_actions = vectorized.forward_all(strategy.previous, ohlcv)
+
+    unique, index = np.unique(np.concatenate((first, second)), return_inverse=True)
+    smas = sma_matrix(close, unique)
+    first_rows, second_rows = index[: first.shape[0]], index[first.shape[0] :]
+    # a regular crossover of (a, b) trades the same as an inverted one of (b, a),
+    # so a square grid only runs the regular handling
+    mirrored = (
+        np.array_equal(first, second) and CrossoverHandling.REGULAR in handlings
+    )
+    scores = np.full((len(handlings), first.shape[0], second.shape[0]), np.nan)
+    block = max(1, block_size // max(close.shape[0], 1))
+    actions = np.empty(close.shape[0], dtype=np.int32)
+
+    for i, first_row in enumerate(first_rows):
+        strategy.first_indicator.period.value = int(first[i])
+        for start in range(0, second.shape[0], block):
+            rows = second_rows[start : start + block]
+            crossed_up, crossed_down = crossover_events(smas[first_row], smas[rows])
+            for j in range(rows.shape[0]):
+                strategy.second_indicator.period.value = int(second[start + j])
+                up = np.flatnonzero(crossed_up[j]) + 1
+                down = np.flatnonzero(crossed_down[j]) + 1
+                for h, handling in enumerate(handlings):
+                    if mirrored and handling != CrossoverHandling.REGULAR:
+                        continue
+                    on_up, on_down = (
+                        (Action.BUY, Action.SELL)
+                        if handling == CrossoverHandling.REGULAR
+                        else (Action.SELL, Action.BUY)
+                    )
+                    actions.fill(Action.PASS)
+                    actions[up] = on_up
+                    actions[down] = on_down
+                    strategy.crossover_handling.value = handling
+                    if previous_actions is None:
+                        resolved = actions
+                    else:
+                        resolved = np.where(
+                            actions == Action.PASS, previous_actions, actions
+                        ).astype(np.int32)
+                    vectorized.run_actions(strategy, close, resolved)
+                    scores[h, i, start + j] = func(strategy)
+    if mirrored:
+        for h, handling in enumerate(handlings):
+            if handling != CrossoverHandling.REGULAR:
+                scores[h] = scores[handlings.index(CrossoverHandling.REGULAR)].T
+
+    result = SweepResult(first, second, handlings, scores, 0.0)
+    (
+        strategy.first_indicator.period.value,
+        strategy.second_indicator.period.value,
+        strategy.crossover_handling.value,
+    ) = result.best
+    if engine is None:
+        strategy.forward_all(ohlcv_list)  # type: ignore
+    else:
+        engine(strategy, ohlcv)
+    result.wall_time = time.perf_counter() - start_time
+    return result
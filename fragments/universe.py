@@ -0,0 +1,282 @@
+from __future__ import annotations
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Callable, Optional, Any
+from fragments.strategy import Strategy, ConditionalStrategy
+from fragments.indicators import OHLCV
+from fragments.context import BacktestContext, current_context
+from fragments.dataset import Dataset
+from fragments.parallel import SharedOHLCV, detach
+from fragments.vectorized import get_chain
+
+
+Aggregate = Callable[[np.ndarray], float]
+
+AGGREGATES: dict[str, Aggregate] = {
+    "mean": lambda scores: float(np.mean(scores)),
+    "median": lambda scores: float(np.median(scores)),
+    "min": lambda scores: float(np.min(scores)),
+}
+
+
+def _run_symbol(
+    strategy: Strategy,
+    func: Callable[[Strategy], float],
+    engine: Optional[Callable],
+    ohlcv: np.ndarray | Dataset,
+    fee: float,
+    precalculation: bool,
+) -> tuple[float, float]:
+    # every symbol runs in a context of its own, nothing global is switched
+    context = BacktestContext(
+        fee,
+        ohlcv if engine is None and precalculation else None,
+        strategy.param_storage,
+    )
+    with context.bound(strategy):
+        if engine is None:
+            # precalculated series stay in Indicator.cache, one set per symbol
+            strategy.forward_all(ohlcv)  # type: ignore
+        else:
+            engine(strategy, np.asarray(ohlcv, dtype=np.float64))
+    return func(strategy), strategy.equity
+
+
+_worker: dict[str, Any] = dict()
+
+
+def _init_worker(
+    strategy: Strategy,
+    func: Callable[[Strategy], float],
+    engine: Optional[Callable],
+    sources: list[Dataset | tuple[str, tuple[int, ...]]],
+    fees: list[float],
+    precalculation: bool,
+):
+    data = list()
+    shms = list()
+    for source in sources:
+        if isinstance(source, Dataset):
+            data.append(source)
+        else:
+            shm, ohlcv = SharedOHLCV.attach(source)
+            shms.append(shm)
+            data.append(ohlcv)
+    _worker.update(
+        strategy=strategy,
+        func=func,
+        engine=engine,
+        data=data,
+        fees=fees,
+        precalculation=precalculation,
+        shms=shms,
+    )
+
+
+def _evaluate_symbols(
+    args: tuple[list[int | Enum], list[int]]
+) -> list[tuple[float, float]]:
+    values, indices = args
+    strategy: Strategy = _worker["strategy"]
+    strategy.param_storage.apply_cell_values(values)
+    return [
+        _run_symbol(
+            strategy,
+            _worker["func"],
+            _worker["engine"],
+            _worker["data"][i],
+            _worker["fees"][i],
+            _worker["precalculation"],
+        )
+        for i in indices
+    ]
+
+
+class Universe:
+    symbols: list[str]
+    data: list[np.ndarray | Dataset]
+    fees: list[float]
+    n_jobs: int
+    precalculation: bool
+    scores: np.ndarray
+    equity: np.ndarray
+    _shared: list[SharedOHLCV]
+    _executor: Optional[ProcessPoolExecutor]
+    _executor_for: Optional[tuple]
+
+    def __init__(
+        self,
+        assets: dict[str, list[OHLCV] | np.ndarray | Dataset],
+        fees: Optional[dict[str, float]] = None,
+        n_jobs: int = 1,
+        precalculation: bool = True,
+    ):
+        if not assets:
+            raise ValueError("a universe needs at least one symbol")
+        self.symbols = list(assets)
+        self.data = [
+            ohlcv
+            if isinstance(ohlcv, Dataset)
+            else np.asarray(ohlcv, dtype=np.float64)
+            for ohlcv in assets.values()
+        ]
+        default_fee = current_context().fee
+        self.fees = [
+            (fees or dict()).get(symbol, default_fee) for symbol in self.symbols
+        ]
+        self.n_jobs = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+        self.precalculation = precalculation
+        self.scores = np.full(len(self.symbols), np.nan)
+        self.equity = np.full(len(self.symbols), np.nan)
+        self._shared = list()
+        self._executor = None
+        self._executor_for = None
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def fit_bounds(self, strategy: Strategy, engine: Optional[Callable] = None):
+        # conditional thresholds take their bounds from the indicator values of
+        # every symbol, not just the first one that is run
+        conditionals = [
+            layer
+            for layer in get_chain(strategy)
+            if isinstance(layer, ConditionalStrategy)
+        ]
+        try:
+            for ohlcv, symbol_fee in zip(self.data, self.fees):
+                for layer in conditionals:
+                    layer._freeze_bounds = False
+                _run_symbol(
+                    strategy,
+                    lambda _: 0.0,
+                    engine,
+                    ohlcv,
+                    symbol_fee,
+                    self.precalculation,
+                )
+        finally:
+            for layer in conditionals:
+                layer._freeze_bounds = True
+
+    def evaluate(
+        self,
+        strategy: Strategy,
+        func: Callable[[Strategy], float],
+        engine: Optional[Callable] = None,
+    ) -> np.ndarray:
+        if self.n_jobs == 1 or len(self) == 1:
+            results = [
+                _run_symbol(
+                    strategy, func, engine, ohlcv, symbol_fee, self.precalculation
+                )
+                for ohlcv, symbol_fee in zip(self.data, self.fees)
+            ]
+        else:
+            executor = self._get_executor(strategy, func, engine)
+            values = strategy.param_storage.get_cell_values()
+            chunks = np.array_split(np.arange(len(self)), self.n_jobs)
+            results = [
+                result
+                for chunk in executor.map(
+                    _evaluate_symbols,
+                    [(values, chunk.tolist()) for chunk in chunks if chunk.size],
+                )
+                for result in chunk
+            ]
+        self.scores = np.array([score for score, _ in results], dtype=np.float64)
+        self.equity = np.array([equity for _, equity in results], dtype=np.float64)
+        return self.scores
+
+    def objective(
+        self,
+        func: Callable[[Strategy], float],
+        engine: Optional[Callable] = None,
+        aggregate: str | Aggregate = "mean",
+    ) -> Callable[[Strategy], float]:
+        if aggregate == "portfolio":
+            # equal capital in every symbol, scored by the final portfolio equity
+            def objective(strategy: Strategy) -> float:
+                self.evaluate(strategy, func, engine)
+                return float(np.mean(self.equity))
+
+            return objective
+        reduce = AGGREGATES[aggregate] if isinstance(aggregate, str) else aggregate
+        return lambda strategy: reduce(self.evaluate(strategy, func, engine))
+
+    def portfolio_curve(
+        self, strategy: Strategy, engine: Optional[Callable] = None
+    ) -> np.ndarray:
+        curves = list()
+        for ohlcv, symbol_fee in zip(self.data, self.fees):
+            _run_symbol(
+                strategy,
+                lambda _: 0.0,
+                engine,
+                ohlcv,
+                symbol_fee,
+                self.precalculation,
+            )
+            curves.append(np.asarray(strategy.hist_equity, dtype=np.float64))
+        length = max(len(ohlcv) for ohlcv in self.data)
+        # symbols are aligned on their first bar and hold their last equity once
+        # their history ends
+        padded = [
+            np.pad(curve, (0, length - curve.shape[0]), mode="edge")
+            if curve.shape[0]
+            else np.full(length, 100.0)
+            for curve in curves
+        ]
+        return np.mean(padded, axis=0)
+
+    def _get_executor(
+        self,
+        strategy: Strategy,
+        func: Callable[[Strategy], float],
+        engine: Optional[Callable],
+    ) -> ProcessPoolExecutor:
+        # the workers were started with these objects, which are kept so that their
+        # ids can't be reused by others
+        if self._executor is not None and all(
+            a is b for a, b in zip(self._executor_for, (strategy, func, engine))
+        ):
+            return self._executor
+        self.close()
+        sources: list[Dataset | tuple[str, tuple[int, ...]]] = list()
+        for ohlcv in self.data:
+            if isinstance(ohlcv, Dataset) and ohlcv.path is not None:
+                sources.append(ohlcv)
+            else:
+                self._shared.append(SharedOHLCV(np.asarray(ohlcv, dtype=np.float64)))
+                sources.append(self._shared[-1].descriptor())
+        self._executor = ProcessPoolExecutor(
+            min(self.n_jobs, len(self)),
+            initializer=_init_worker,
+            initargs=(
+                detach(strategy),
+                func,
+                engine,
+                sources,
+                self.fees,
+                self.precalculation,
+            ),
+        )
+        self._executor_for = (strategy, func, engine)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_for = None
+        for shared in self._shared:
+            shared.close()
+        self._shared = list()
+
+    def __enter__(self) -> Universe:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,213 @@
+from __future__ import annotations
+import numpy as np
+from fragments import cproc
+from fragments.indicators import OHLCV
+from fragments.strategy import (
+    Strategy,
+    FrozenStrategy,
+    Action,
+    ConditionalStrategy,
+    ConditionType,
+    ConditionLogic,
+    CrossoverStrategy,
+    CrossoverHandling,
+    LimiterStrategy,
+    InvertingStrategy,
+    InvertingMultiplier,
+)
+
+
+def as_ohlcv_array(ohlcv_list: list[OHLCV] | np.ndarray) -> np.ndarray:
+    return np.asarray(ohlcv_list, dtype=np.float64)
+
+
+def get_chain(strategy: Strategy) -> list[Strategy]:
+    chain = list()
+    layer: Strategy | None = strategy
+    while layer is not None:
+        chain.append(layer)
+        layer = layer.previous
+    chain.reverse()
+    return chain
+
+
+def _resolve_actions(
+    actions: np.ndarray, previous_actions: np.ndarray | None
+) -> np.ndarray:
+    if previous_actions is None:
+        return actions
+    return np.where(actions == Action.PASS, previous_actions, actions).astype(
+        np.int32
+    )
+
+
+def conditional_actions(
+    strategy: ConditionalStrategy,
+    ohlcv: np.ndarray,
+    previous_actions: np.ndarray | None,
+) -> np.ndarray:
+    # cproc keeps indicator values in a C float, so compare in float32 as well
+    values = strategy.indicator.series(ohlcv).astype(np.float32)
+    valid = ~np.isnan(values)
+    if not strategy._freeze_bounds and valid.any():
+        truncated = values[valid].astype(np.int64)
+        lower, upper = strategy.condition_threshold.bounds
+        if (minimum := int(truncated.min())) < lower:  # type: ignore
+            lower = minimum
+        if (maximum := int(truncated.max())) > upper:  # type: ignore
+            upper = maximum
+        strategy.condition_threshold.bounds = (lower, upper)  # type: ignore
+
+    threshold = strategy.condition_threshold.value
+    on_condition = int(strategy.on_condition.value)
+    if strategy.condition_type.value == ConditionType.LESS_THAN:
+        hit = values.astype(np.float64) < threshold
+    else:
+        hit = values.astype(np.float64) >= threshold
+    actions = np.where(hit, on_condition, Action.PASS).astype(np.int32)
+
+    if previous_actions is not None and strategy.condition_logic is not None:
+        match strategy.condition_logic.value:
+            case ConditionLogic.AND:
+                actions[previous_actions != actions] = Action.CANCEL
+            case ConditionLogic.SAMEAND:
+                actions[
+                    (previous_actions == on_condition) & (previous_actions != actions)
+                ] = Action.CANCEL
+    return _resolve_actions(actions, previous_actions)
+
+
+def crossover_actions(
+    strategy: CrossoverStrategy,
+    ohlcv: np.ndarray,
+    previous_actions: np.ndarray | None,
+) -> np.ndarray:
+    first = strategy.first_indicator.series(ohlcv).astype(np.float32)
+    second = strategy.second_indicator.series(ohlcv).astype(np.float32)
+    actions = np.full(ohlcv.shape[0], Action.PASS, dtype=np.int32)
+
+    # the previous values only advance on bars where both indicators are known
+    known = np.flatnonzero(~np.isnan(first) & ~np.isnan(second))
+    if known.size != 0:
+        prev_first, prev_second = first[known[:-1]], second[known[:-1]]
+        cur_first, cur_second = first[known[1:]], second[known[1:]]
+        crossed_up = (prev_first <= prev_second) & (cur_first > cur_second)
+        crossed_down = (prev_first >= prev_second) & (cur_first < cur_second)
+        if strategy.crossover_handling.value == CrossoverHandling.REGULAR:
+            on_up, on_down = Action.BUY, Action.SELL
+        else:
+            on_up, on_down = Action.SELL, Action.BUY
+        actions[known[1:][crossed_up]] = on_up
+        actions[known[1:][crossed_down]] = on_down
+        strategy._prev_first_value = float(first[known[-1]])
+        strategy._prev_second_value = float(second[known[-1]])
+    return _resolve_actions(actions, previous_actions)
+
+
+def duration_multiplier(strategy: InvertingStrategy) -> int:
+    match strategy.invert_multiplier.value:
+        case InvertingMultiplier.DAYS:
+            return 1
+        case InvertingMultiplier.HOURS:
+            return 24
+        case InvertingMultiplier.MINUTES:
+            return 1440
+    raise RuntimeError(f"unknown multiplier {strategy.invert_multiplier.value}")
+
+
+def forward_layer(
+    strategy: Strategy, ohlcv: np.ndarray, previous_actions: np.ndarray | None
+) -> np.ndarray:
+    close = np.ascontiguousarray(ohlcv[:, 3])
+    kernel = cproc.LayerKernel(close.shape[0], strategy.context.fee)
+    if previous_actions is None:
+        resolved_previous = np.full(close.shape[0], Action.PASS, dtype=np.int32)
+    else:
+        resolved_previous = previous_actions
+
+    if isinstance(strategy, ConditionalStrategy):
+        actions = conditional_actions(strategy, ohlcv, previous_actions)
+        kernel.run_actions(close, actions)
+    elif isinstance(strategy, CrossoverStrategy):
+        actions = crossover_actions(strategy, ohlcv, previous_actions)
+        kernel.run_actions(close, actions)
+    elif isinstance(strategy, LimiterStrategy):
+        kernel.limiter_threshold = strategy._limiter_threshold
+        actions = np.empty(close.shape[0], dtype=np.int32)
+        kernel.run_limiter(
+            close,
+            resolved_previous,
+            np.ascontiguousarray(strategy.indicator.series(ohlcv)),
+            strategy.limiter_multiplier.value,
+            strategy.limiter_type.value,
+            actions,
+        )
+        strategy._limiter_threshold = kernel.limiter_threshold
+    elif isinstance(strategy, InvertingStrategy):
+        strategy._duration_multiplier = duration_multiplier(strategy)
+        if strategy.indicator is not None:
+            strategy.indicator.reset()
+        kernel.invert = strategy._invert
+        actions = np.empty(close.shape[0], dtype=np.int32)
+        kernel.run_inverting(
+            close,
+            resolved_previous,
+            strategy.indicator.stream if strategy.indicator is not None else None,
+            strategy.invert_drawdown_duration.value * strategy._duration_multiplier,
+            actions,
+        )
+        strategy._peak_equity = kernel.peak_equity
+        strategy._drawdown_duration = kernel.drawdown_duration
+        strategy._invert = kernel.invert
+    else:
+        raise NotImplementedError(
+            f"{type(strategy).__name__} is not supported by the vectorized engine"
+        )
+
+    store_kernel_state(strategy, kernel, actions)
+    return actions
+
+
+def store_kernel_state(
+    strategy: Strategy, kernel: cproc.LayerKernel, actions: np.ndarray
+):
+    strategy.iteration = actions.shape[0]
+    strategy.equity = kernel.equity
+    strategy.hist_equity = kernel.hist_equity()
+    strategy.trade_log = kernel.trade_log()
+    strategy._in_trade = kernel.in_trade
+    strategy._last_trade_equity = kernel.last_trade_equity
+    if actions.size != 0:
+        strategy.action = int(actions[-1])  # type: ignore
+
+
+def run_actions(strategy: Strategy, close: np.ndarray, actions: np.ndarray):
+    # trades a layer on actions that were resolved elsewhere
+    kernel = cproc.LayerKernel(close.shape[0], strategy.context.fee)
+    kernel.run_actions(close, actions)
+    store_kernel_state(strategy, kernel, actions)
+
+
+def frozen_actions(layer: FrozenStrategy, n_bars: int) -> np.ndarray:
+    if layer.actions.shape[0] != n_bars:
+        raise RuntimeError(
+            f"frozen layer recorded {layer.actions.shape[0]} actions, OHLCV has {n_bars} bars"
+        )
+    layer.iteration = n_bars
+    return np.ascontiguousarray(layer.actions, dtype=np.int32)
+
+
+def forward_all(
+    strategy: Strategy, ohlcv_list: list[OHLCV] | np.ndarray
+) -> np.ndarray:
+    ohlcv = as_ohlcv_array(ohlcv_list)
+    strategy.plan().run(ohlcv)
+    actions = None
+    for layer in get_chain(strategy):
+        if isinstance(layer, FrozenStrategy):
+            actions = frozen_actions(layer, ohlcv.shape[0])
+        else:
+            actions = forward_layer(layer, ohlcv, actions)
+    if isinstance(strategy, ConditionalStrategy):
+        strategy._freeze_bounds = True
+    return actions  # type: ignore
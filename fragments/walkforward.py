@@ -0,0 +1,231 @@
+from __future__ import annotations
+import os
+import copy
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Optional, Any
+from fragments.strategy import Strategy
+from fragments.indicators import Indicator, OHLCV
+from fragments.context import BacktestContext
+from fragments.dataset import Dataset
+from fragments.parallel import SharedOHLCV, detach
+from fragments.optim import Engine, optimize
+
+
+@dataclass(frozen=True)
+class Fold:
+    index: int
+    train: tuple[int, int]
+    test: tuple[int, int]
+
+
+@dataclass
+class FoldResult:
+    fold: Fold
+    x: list[int | Enum]
+    train_score: float
+    test_score: float
+    equity: np.ndarray
+    wall_time: float
+
+
+@dataclass
+class WalkForwardResult:
+    folds: list[FoldResult]
+    equity: np.ndarray
+    wall_time: float
+
+    @property
+    def params(self) -> list[list[int | Enum]]:
+        return [fold.x for fold in self.folds]
+
+
+def split(
+    n_bars: int,
+    train_size: int,
+    test_size: int,
+    anchored: bool = False,
+    step: Optional[int] = None,
+) -> list[Fold]:
+    step = test_size if step is None else step
+    if train_size < 1 or test_size < 1:
+        raise ValueError("train and test windows need at least one bar")
+    if step < test_size:
+        raise ValueError("test windows must not overlap")
+    folds = list()
+    start = 0
+    while start + train_size + test_size <= n_bars:
+        train = (0 if anchored else start, start + train_size)
+        folds.append(Fold(len(folds), train, (train[1], train[1] + test_size)))
+        start += step
+    return folds
+
+
+def stitch(folds: list[FoldResult], initial_equity: float = 100.0) -> np.ndarray:
+    # every test window starts from 100, so each one is scaled to where the
+    # previous one ended
+    curves = list()
+    scale = 1.0
+    for fold in folds:
+        curves.append(fold.equity * scale)
+        if fold.equity.shape[0] != 0:
+            scale *= fold.equity[-1] / initial_equity
+    if not curves:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(curves)
+
+
+def _window(data: np.ndarray | Dataset, bounds: tuple[int, int], share: bool):
+    # a shared window is warm: its series are sliced out of the ones for all of
+    # data, so they start with the bars before the window already seen, as they
+    # would in a live run. The indicators only look back, so bars after the window
+    # change nothing. Unshared windows start cold, without the bars before them,
+    # and their first values differ until the indicators have warmed up.
+    window = data[bounds[0] : bounds[1]]
+    if share:
+        Indicator.cache.share_window(
+            np.asarray(window), np.asarray(data), bounds[0]
+        )
+    return window
+
+
+def _run_fold(
+    data: np.ndarray | Dataset,
+    fold: Fold,
+    strategy: Strategy,
+    func: Callable[[Strategy], float],
+    engine: Optional[Engine],
+    precalculation: bool,
+    fee: float,
+    reuse_indicators: bool,
+    kwargs: dict[str, Any],
+) -> FoldResult:
+    start_time = time.perf_counter()
+    train = _window(data, fold.train, reuse_indicators)
+    test = _window(data, fold.test, reuse_indicators)
+    # train and test windows run in contexts of their own
+    with BacktestContext(
+        fee, train if precalculation else None, strategy.param_storage
+    ).bound(strategy):
+        results = optimize(strategy, func, train, engine, **kwargs)  # type: ignore
+    with BacktestContext(
+        fee, test if precalculation else None, strategy.param_storage
+    ).bound(strategy):
+        if engine is None:
+            strategy.forward_all(test)  # type: ignore
+        else:
+            engine(strategy, np.asarray(test, dtype=np.float64))
+    equity = np.asarray(strategy.hist_equity, dtype=np.float64)
+    if equity.shape[0] < len(test):
+        # history stops once a strategy is out of money, it stays flat from there
+        equity = np.pad(equity, (0, len(test) - equity.shape[0]), mode="edge")
+    return FoldResult(
+        fold,
+        list(results.x),
+        -float(results.fun),
+        func(strategy),
+        equity,
+        time.perf_counter() - start_time,
+    )
+
+
+_worker: dict[str, Any] = dict()
+
+
+def _init_worker(source: Dataset | tuple[str, tuple[int, ...]], args: tuple):
+    # the chain and the settings arrive once per worker, tasks only name a fold
+    if isinstance(source, Dataset):
+        _worker.update(shm=None, data=source)
+    else:
+        shm, ohlcv = SharedOHLCV.attach(source)
+        _worker.update(shm=shm, data=ohlcv)
+    _worker["strategy"], _worker["args"] = args[0], args[1:]
+
+
+def _run_worker_fold(fold: Fold) -> FoldResult:
+    # every fold starts from the same strategy, as it does in a single process
+    return _run_fold(
+        _worker["data"], fold, copy.deepcopy(_worker["strategy"]), *_worker["args"]
+    )
+
+
+def walk_forward(
+    strategy: Strategy,
+    func: Callable[[Strategy], float],
+    ohlcv_list: list[OHLCV] | np.ndarray | Dataset,
+    train_size: int,
+    test_size: int,
+    anchored: bool = False,
+    step: Optional[int] = None,
+    engine: Optional[Engine] = None,
+    n_jobs: int = 1,
+    reuse_indicators: bool = True,
+    **kwargs
+) -> WalkForwardResult:
+    start_time = time.perf_counter()
+    data: np.ndarray | Dataset = (
+        ohlcv_list
+        if isinstance(ohlcv_list, Dataset)
+        else np.asarray(ohlcv_list, dtype=np.float64)
+    )
+    folds = split(len(data), train_size, test_size, anchored, step)
+    if not folds:
+        raise ValueError(
+            f"{len(data)} bars are not enough for one fold of {train_size}+{test_size}"
+        )
+    precalculation = strategy.context.precalc
+    fee = strategy.context.fee
+
+    if n_jobs == 1:
+        # every fold starts from the same strategy, as it would in a worker
+        results = [
+            _run_fold(
+                data,
+                fold,
+                copy.deepcopy(strategy),
+                func,
+                engine,
+                precalculation,
+                fee,
+                reuse_indicators,
+                kwargs,
+            )
+            for fold in folds
+        ]
+    else:
+        shared_ohlcv = None
+        source: Dataset | tuple[str, tuple[int, ...]]
+        if isinstance(data, Dataset) and data.path is not None:
+            source = data
+        else:
+            shared_ohlcv = SharedOHLCV(np.asarray(data, dtype=np.float64))
+            source = shared_ohlcv.descriptor()
+        try:
+            with ProcessPoolExecutor(
+                min(n_jobs if n_jobs > 0 else (os.cpu_count() or 1), len(folds)),
+                initializer=_init_worker,
+                initargs=(
+                    source,
+                    (
+                        detach(strategy),
+                        func,
+                        engine,
+                        precalculation,
+                        fee,
+                        reuse_indicators,
+                        kwargs,
+                    ),
+                ),
+            ) as executor:
+                results = list(executor.map(_run_worker_fold, folds))
+        finally:
+            if shared_ohlcv is not None:
+                shared_ohlcv.close()
+
+    strategy.param_storage.apply_cell_values(results[-1].x)
+    return WalkForwardResult(
+        results, stitch(results), time.perf_counter() - start_time
+    )
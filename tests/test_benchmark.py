@@ -0,0 +1,51 @@
+import unittest
+import tempfile
+import os
+import json
+import numpy as np
+from fragments.benchmark import gbm_ohlcv, run_benchmarks, compare, main
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_gbm_ohlcv(self):
+        ohlcv = gbm_ohlcv(10000, seed=1)
+        np.testing.assert_array_equal(ohlcv, gbm_ohlcv(10000, seed=1))
+        self.assertEqual(ohlcv.shape, (10000, 5))
+        self.assertTrue((ohlcv[:, 1] >= ohlcv[:, [0, 3]].max(axis=1)).all())
+        self.assertTrue((ohlcv[:, 2] <= ohlcv[:, [0, 3]].min(axis=1)).all())
+        np.testing.assert_array_equal(ohlcv[1:, 0], ohlcv[:-1, 3])
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(
+            [2000], ["crossover"], ["per_bar", "vectorized"], n_calls=10
+        )
+        forward = [i for i in results if i["benchmark"] == "forward_all"]
+        self.assertEqual(
+            [(i["engine"], i["precalculation"]) for i in forward],
+            [("per_bar", False), ("per_bar", True), ("vectorized", False)],
+        )
+        self.assertEqual(
+            [i["engine"] for i in results if i["benchmark"] == "optimize"],
+            ["per_bar", "vectorized"],
+        )
+        self.assertEqual(len([i for i in results if i["benchmark"] == "stats"]), 4)
+        for entry in forward:
+            self.assertGreater(entry["peak_memory"], 0)
+            self.assertAlmostEqual(entry["bars_per_second"], 2000 / entry["seconds"])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "benchmark.json")
+            argv = [
+                "--sizes", "1000", "--strategies", "conditional",
+                "--engines", "compiled", "--optimize-limit", "0", "--no-memory",
+                "--output", output,
+            ]  # fmt: skip
+            main(argv)
+            with open(output) as f:
+                report = json.load(f)
+            self.assertEqual(len(report["results"]), 5)
+            self.assertIsNone(report["results"][0]["peak_memory"])
+            self.assertIn("numpy", report["environment"])
+            ratios = compare(report, report)
+            self.assertEqual([ratio for _, ratio in ratios], [1.0] * 5)
@@ -0,0 +1,180 @@
+import unittest
+import copy
+import pickle as pkl
+import numpy as np
+from fragments.params import ParamStorage
+from fragments.strategy import *
+from fragments.indicators import RSI, SMA, ATR, Indicator
+from fragments.stats import equity
+from fragments.optim import optimize
+from fragments import compiled, vectorized
+from tests.test_vectorized import snapshot
+
+
+class TestCompiled(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        Indicator.enable_precalculation(self.ohlcv_list)
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+        Strategy.set_fee(0.0)
+
+    def test_strategy_chain(self):
+        Strategy.set_fee(0.1)
+        param_storage = ParamStorage()
+
+        strategies = list()
+        strategies.append(
+            CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage)
+        )
+        strategies[-1].first_indicator.period.value = 5
+        strategies[-1].second_indicator.period.value = 20
+        strategies.append(
+            ConditionalStrategy(RSI(param_storage), param_storage, strategies[-1])
+        )
+        strategies[-1].condition_threshold.value = 60
+        strategies[-1].condition_logic.value = ConditionLogic.SAMEAND
+        strategies.append(
+            LimiterStrategy(ATR(param_storage), param_storage, strategies[-1])
+        )
+        strategies[-1].limiter_type.value = LimiterType.TAKE_PROFIT
+        strategies.append(
+            InvertingStrategy(param_storage=param_storage, previous=strategies[-1])
+        )
+        strategies[-1].invert_drawdown_duration.value = 5
+
+        strategies[-1].forward_all(self.ohlcv_list)
+        expected = snapshot(strategies[-1])
+        expected_bounds = param_storage.get_cell_bounds()
+        strategies[-1]._invert = False
+        strategies[-2]._limiter_threshold = 0.0
+        strategies[-3].condition_threshold.bounds = (0, 1)
+        compiled.forward_all(strategies[-1], self.ohlcv_list)
+        self.assertEqual(snapshot(strategies[-1]), expected)
+        self.assertEqual(param_storage.get_cell_bounds(), expected_bounds)
+
+    def test_inverting_indicator(self):
+        # the equity indicator streams inside the kernels
+        Strategy.set_fee(0.1)
+        snapshots = list()
+        for engine in [None, vectorized.forward_all, compiled.forward_all]:
+            param_storage = ParamStorage()
+            strategy = InvertingStrategy(
+                SMA(param_storage),
+                param_storage,
+                ConditionalStrategy(RSI(param_storage), param_storage),
+            )
+            strategy.indicator.period.value = 10  # type: ignore
+            strategy.invert_drawdown_duration.value = 3
+            strategy.previous.indicator.period.value = 5  # type: ignore
+            strategy.previous.condition_threshold.value = 55  # type: ignore
+            if engine is None:
+                strategy.forward_all(self.ohlcv_list)
+            else:
+                engine(strategy, self.ohlcv_list)
+            snapshots.append(snapshot(strategy))
+        self.assertTrue(any(trade[3] != 0 for trade in snapshots[0][0][2]))
+        self.assertEqual(snapshots[1], snapshots[0])
+        self.assertEqual(snapshots[2], snapshots[0])
+
+    def test_optimize_engine(self):
+        def run(engine):
+            param_storage = ParamStorage()
+            strategies = list()
+            strategies.append(
+                CrossoverStrategy(
+                    SMA(param_storage), SMA(param_storage), param_storage
+                )
+            )
+            strategies.append(
+                ConditionalStrategy(RSI(param_storage), param_storage, strategies[-1])
+            )
+            results = optimize(
+                strategies[-1],
+                equity,
+                self.ohlcv_list,
+                engine=engine,
+                n_calls=15,
+                random_state=42,
+            )
+            return results.fun, results.x, strategies[-1].equity
+
+        self.assertEqual(run(None), run(compiled.forward_all))
+
+    def test_compiled_chain(self):
+        Strategy.set_fee(0.1)
+        param_storage = ParamStorage()
+        crossover = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+        crossover.first_indicator.period.value = 5  # type: ignore
+        crossover.second_indicator.period.value = 20  # type: ignore
+        conditional = ConditionalStrategy(RSI(param_storage), param_storage, crossover)
+        conditional.condition_threshold.value = 60
+        limiter = LimiterStrategy(ATR(param_storage), param_storage, conditional)
+        strategy = ConditionalStrategy(RSI(param_storage), param_storage, limiter)
+        strategy.condition_threshold.value = 30
+        strategy.condition_type.value = ConditionType.MORE_THAN
+
+        chain = compiled.CompiledChain(strategy)
+        for period in [5, 9]:
+            # the chain is compiled once and picks up new parameter values
+            crossover.first_indicator.period.value = period  # type: ignore
+            strategy.forward_all(self.ohlcv_list)
+            expected = snapshot(strategy)
+            hist_equity = conditional.hist_equity
+            chain.run(self.ohlcv_list)
+            # the limiter reads its own trades, the layers below it only pass actions
+            # and keep the results of the last run that recorded them
+            self.assertEqual(snapshot(strategy), expected)
+            self.assertIs(conditional.hist_equity, hist_equity)
+
+        compiled.CompiledChain(strategy, keep_intermediate=True).run(self.ohlcv_list)
+        self.assertEqual(snapshot(strategy), expected)
+
+        # the engines compile a chain once and run it on the same kernel
+        compiled.forward_top(strategy, self.ohlcv_list)
+        chain = compiled.compiled_chain(strategy, keep_intermediate=False)
+        kernel, hist_equity = chain._kernel, strategy.hist_equity
+        first = hist_equity.copy()
+        strategy.condition_threshold.value = 20
+        compiled.forward_top(strategy, self.ohlcv_list)
+        self.assertIs(compiled.compiled_chain(strategy, False), chain)
+        self.assertIs(chain._kernel, kernel)
+        self.assertNotEqual(strategy.hist_equity.tolist(), first.tolist())
+        # histories of earlier runs are left alone
+        self.assertEqual(hist_equity.tolist(), first.tolist())
+        # copies compile their own kernel
+        copied = copy.deepcopy(strategy)
+        copied_chain = compiled.compiled_chain(copied, False)
+        self.assertIs(copied_chain.strategy, copied)
+        self.assertIsNone(copied_chain._kernel)
+        compiled.forward_top(copied, self.ohlcv_list)
+        self.assertEqual(copied.hist_equity.tolist(), strategy.hist_equity.tolist())
+        # a reset kernel runs again only once it is configured again
+        ohlcv = np.asarray(self.ohlcv_list, dtype=np.float64)
+        kernel = compiled.build_kernel(chain.chain, ohlcv)
+        kernel.run(ohlcv)
+        kernel.reset()
+        with self.assertRaises(RuntimeError):
+            kernel.run(ohlcv)
+        compiled.configure_kernel(kernel, chain.chain, ohlcv)
+        kernel.run(ohlcv)
+        # a changed chain is compiled again
+        inverted = InvertingStrategy(None, param_storage, strategy.previous)
+        strategy.previous = inverted
+        compiled.forward_top(strategy, self.ohlcv_list)
+        self.assertIsNot(compiled.compiled_chain(strategy, False), chain)
+        strategy.previous = limiter
+
+        class Custom(Strategy):
+            pass
+
+        with self.assertRaises(NotImplementedError):
+            compiled.CompiledChain(
+                ConditionalStrategy(
+                    RSI(param_storage), param_storage, Custom(param_storage)
+                )
+            )
@@ -0,0 +1,95 @@
+import unittest
+import pickle as pkl
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from fragments.strategy import Strategy, ConditionalStrategy, CrossoverStrategy
+from fragments.indicators import RSI, SMA, Indicator
+from fragments.context import BacktestContext, current_context, default_context
+from fragments import compiled
+
+
+class TestContext(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+        Strategy.set_fee(0.0)
+
+    def create_strategy(self, context=None) -> Strategy:
+        strategy = ConditionalStrategy(
+            RSI(context=context),
+            previous=CrossoverStrategy(
+                SMA(context=context), SMA(context=context), context=context
+            ),
+            context=context,
+        )
+        strategy.indicator.period.value = 14  # type: ignore
+        strategy.condition_threshold.value = 50
+        strategy.previous.first_indicator.period.value = 5  # type: ignore
+        strategy.previous.second_indicator.period.value = 20  # type: ignore
+        return strategy
+
+    def test_class_methods(self):
+        self.assertIs(current_context(), default_context)
+        context = BacktestContext(0.1, self.ohlcv_list)
+        with context:
+            self.assertIs(current_context(), context)
+            Strategy.set_fee(0.2)
+            Indicator.disable_precalculation()
+            strategy = self.create_strategy()
+        self.assertEqual(context.fee, 0.2)
+        self.assertFalse(context.precalc)
+        self.assertEqual(default_context.fee, 0.0)
+        self.assertIs(strategy.param_storage, context.param_storage)
+        self.assertIs(current_context(), default_context)
+
+    def test_concurrent_runs(self):
+        half = np.asarray(self.ohlcv_list[:120], dtype=np.float64)
+        runs = [
+            (0.0, self.ohlcv_list, None),
+            (0.1, self.ohlcv_list, None),
+            (0.1, half, None),
+            (0.1, half, compiled.forward_all),
+        ]
+        expected = list()
+        for fee, ohlcv, engine in runs:
+            Strategy.set_fee(fee)
+            Indicator.enable_precalculation(ohlcv)
+            strategy = self.create_strategy()
+            if engine is None:
+                strategy.forward_all(ohlcv)
+            else:
+                engine(strategy, np.asarray(ohlcv, dtype=np.float64))
+            expected.append((strategy.equity, strategy.trades.profit.tolist()))
+        Indicator.disable_precalculation()
+        Strategy.set_fee(0.0)
+
+        def run(args) -> tuple:
+            fee, ohlcv, engine = args
+            context = BacktestContext(fee, ohlcv)
+            strategy = self.create_strategy(context)
+            for _ in range(5):
+                if engine is None:
+                    strategy.forward_all(ohlcv)
+                else:
+                    engine(strategy, np.asarray(ohlcv, dtype=np.float64))
+            return strategy.equity, strategy.trades.profit.tolist()
+
+        with ThreadPoolExecutor(len(runs)) as executor:
+            self.assertEqual(list(executor.map(run, runs * 3)), expected * 3)
+        self.assertFalse(current_context().precalc)
+
+    def test_bound(self):
+        strategy = self.create_strategy(BacktestContext())
+        strategy.forward_all(self.ohlcv_list)
+        no_fee = strategy.equity
+        context = BacktestContext(0.1, self.ohlcv_list, strategy.param_storage)
+        with context.bound(strategy):
+            strategy.forward_all(self.ohlcv_list)
+            indicator = strategy.previous.first_indicator  # type: ignore
+            self.assertIs(indicator.context, context)
+        self.assertNotEqual(strategy.equity, no_fee)
+        strategy.forward_all(self.ohlcv_list)
+        self.assertEqual(strategy.equity, no_fee)
@@ -0,0 +1,97 @@
+import unittest
+import tempfile
+import os
+import pickle as pkl
+import numpy as np
+from fragments.dataset import Dataset
+from fragments.params import ParamStorage
+from fragments.strategy import ConditionalStrategy
+from fragments.indicators import RSI, Indicator
+from fragments.context import current_context
+from fragments.stats import equity
+from fragments.optim import optimize
+
+
+class TestDataset(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        self.path = os.path.join(self.directory.name, "GOOG")
+        self.dataset = Dataset.from_pickle("./data/GOOG.pkl", self.path, {"symbol": "GOOG"})
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+        self.directory.cleanup()
+
+    def test_roundtrip(self):
+        dataset = Dataset.open(self.path)
+        self.assertEqual(len(dataset), len(self.ohlcv_list))
+        self.assertEqual(dataset.metadata, {"symbol": "GOOG"})
+        self.assertEqual(list(dataset), [tuple(map(float, i)) for i in self.ohlcv_list])
+        self.assertEqual(dataset[3], tuple(map(float, self.ohlcv_list[3])))
+        np.testing.assert_array_equal(
+            dataset.column("close"), [i[3] for i in self.ohlcv_list]
+        )
+
+    def test_zero_copy(self):
+        ohlcv = np.asarray(self.dataset, dtype=np.float64)
+        self.assertIs(ohlcv, np.asarray(self.dataset))
+        self.assertTrue(ohlcv.flags.f_contiguous)
+        self.assertTrue(ohlcv[:, 3].flags.c_contiguous)
+        self.assertIsInstance(ohlcv.base, np.memmap)
+
+        Indicator.enable_precalculation(self.dataset)  # type: ignore
+        self.assertIs(current_context().precalc_ohlcv, ohlcv)
+
+        restored = pkl.loads(pkl.dumps(self.dataset))
+        self.assertEqual(restored.path, self.path)
+        self.assertIsInstance(np.asarray(restored).base, np.memmap)
+
+    def test_forward_all_and_optimize(self):
+        def run(ohlcv_list, **kwargs):
+            param_storage = ParamStorage()
+            strategy = ConditionalStrategy(RSI(param_storage), param_storage)
+            results = optimize(
+                strategy, equity, ohlcv_list, n_calls=12, random_state=42, **kwargs
+            )
+            return results.fun, results.x, list(strategy.hist_equity)
+
+        self.assertEqual(run(self.dataset), run(self.ohlcv_list))
+        self.assertEqual(
+            run(self.dataset, n_jobs=2, batch_size=4),
+            run(self.ohlcv_list, batch_size=4),
+        )
+        self.assertEqual(
+            run(self.dataset[50:], n_jobs=2, batch_size=4),
+            run(self.ohlcv_list[50:], batch_size=4),
+        )
+
+    def test_range_slicing(self):
+        start = np.datetime64("2022-01-03", "ms").astype(np.int64)
+        timestamps = start + np.arange(len(self.ohlcv_list)) * 86_400_000
+        path = os.path.join(self.directory.name, "GOOG_timestamped")
+        dataset = Dataset.from_pickle("./data/GOOG.pkl", path, timestamps=timestamps)
+
+        window = dataset.between("2022-01-05", np.datetime64("2022-01-10"))
+        self.assertEqual(len(window), 5)
+        self.assertEqual(window.offset, 2)
+        self.assertEqual(list(window), [tuple(map(float, i)) for i in self.ohlcv_list[2:7]])
+        np.testing.assert_array_equal(window.timestamps, timestamps[2:7])
+        self.assertFalse(np.asarray(window).flags.owndata)
+        self.assertTrue(np.shares_memory(np.asarray(window), np.asarray(dataset)))
+        self.assertEqual(len(dataset.between(end=timestamps[10])), 10)
+        self.assertEqual(len(dataset.between(timestamps[-1] + 1)), 0)
+
+        tail = dataset[-20:][5:]
+        self.assertEqual(tail.offset, len(self.ohlcv_list) - 15)
+        restored = pkl.loads(pkl.dumps(Dataset.open(path)[-20:][5:]))
+        self.assertEqual(list(restored), [tuple(map(float, i)) for i in self.ohlcv_list[-15:]])
+        np.testing.assert_array_equal(restored.timestamps, timestamps[-15:])
+
+        with self.assertRaises(ValueError):
+            self.dataset.between("2022-01-05")
+        with self.assertRaises(ValueError):
+            dataset[::2]
+        with self.assertRaises(ValueError):
+            Dataset.create(path, self.ohlcv_list, timestamps=timestamps[::-1])
@@ -0,0 +1,88 @@
+import unittest
+import tempfile
+import os
+import pickle as pkl
+import numpy as np
+from fragments.params import ParamStorage
+from fragments.strategy import ConditionalStrategy, CrossoverStrategy
+from fragments.indicators import SMA, RSI, Indicator
+from fragments.context import current_context
+from fragments.dataset import Dataset
+from fragments.stats import equity
+from fragments.vectorized import forward_all
+from fragments.halving import (
+    successive_halving,
+    prefix_fidelities,
+    resampled_fidelities,
+)
+
+
+class TestHalving(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        self.strategy = ConditionalStrategy(
+            RSI(param_storage),
+            param_storage,
+            CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage),
+        )
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+
+    def test_fidelities(self):
+        ohlcv = np.asarray(self.ohlcv_list, dtype=np.float64)
+        fidelities = prefix_fidelities(ohlcv, 3, 3, min_bars=20)
+        self.assertEqual([len(i) for i in fidelities], [28, 84, 252])
+        self.assertTrue(np.shares_memory(fidelities[0], ohlcv))
+        sma = SMA(ParamStorage())
+        sma.period.value = 10
+        np.testing.assert_array_equal(
+            sma.series(fidelities[1]), sma.series(ohlcv)[:84]
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            dataset = Dataset.create(os.path.join(directory, "GOOG"), self.ohlcv_list)
+            fidelities = resampled_fidelities(dataset, [5, 2])
+            self.assertEqual([len(i) for i in fidelities], [51, 126, 252])
+            self.assertIs(fidelities[-1], dataset)
+
+    def test_successive_halving(self):
+        results = successive_halving(
+            self.strategy,
+            equity,
+            self.ohlcv_list,
+            n_candidates=9,
+            hyperband=False,
+            min_bars=20,
+            random_state=42,
+        )
+        self.assertEqual([i["n_candidates"] for i in results.rungs], [9, 3, 1])
+        self.assertEqual([i["n_bars"] for i in results.rungs], [28, 84, 252])
+        self.assertEqual(results.nfev, 13)
+        self.assertEqual(-results.fun, self.strategy.equity)
+        self.assertEqual(self.strategy.param_storage.get_cell_values(), results.x)
+
+    def test_hyperband(self):
+        Indicator.enable_precalculation(self.ohlcv_list)
+        results = successive_halving(
+            self.strategy,
+            equity,
+            self.ohlcv_list,
+            engine=forward_all,
+            n_candidates=9,
+            min_bars=20,
+            random_state=42,
+        )
+        brackets = [
+            [i["n_candidates"] for i in results.rungs if i["bracket"] == bracket]
+            for bracket in range(3)
+        ]
+        self.assertEqual(brackets, [[9, 3, 1], [5, 1], [3]])
+        self.assertEqual(len(results.x_iters), 5)
+        self.assertEqual(results.fun, min(results.func_vals))
+        self.assertEqual(-results.fun, self.strategy.equity)
+        self.assertEqual(len(current_context().precalc_ohlcv), len(self.ohlcv_list))
+        self.strategy.forward_all(self.ohlcv_list)
+        self.assertEqual(-results.fun, self.strategy.equity)
@@ -1,5 +1,6 @@
 import unittest
 import pickle as pkl
+import numpy as np
 from fragments.indicators import *
 from fragments.params import ParamStorage
 
@@ -60,7 +61,6 @@ class TestIndicators(unittest.TestCase):
         self.assertAlmostEqual(atr.forward(ohlcv_list[2]), 2.42, 2)  # type: ignore
         Indicator.disable_precalculation()
 
-    # FIXME: why is this so different from TA-Lib's version?
     def test_atr(self):
         with open("./data/GOOG.pkl", "rb") as f:
             ohlcv_list = pkl.load(f)
@@ -69,8 +69,23 @@ class TestIndicators(unittest.TestCase):
         atr.period.value = 2
         atr.reset()
         self.assertEqual(atr.forward(ohlcv_list[0]), None)
-        self.assertAlmostEqual(atr.forward(ohlcv_list[1]), 1.87, 2)  # type: ignore
-        self.assertAlmostEqual(atr.forward(ohlcv_list[2]), 2.33, 2)  # type: ignore
+        self.assertEqual(atr.forward(ohlcv_list[1]), None)
+        self.assertAlmostEqual(atr.forward(ohlcv_list[2]), 2.42, 2)  # type: ignore
+
+    def test_streaming_matches_precalc(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+        ohlcv = np.asarray(ohlcv_list, dtype=np.float64)
+        for indicator_type in [SMA, RSI, ATR]:
+            for period in [2, 5, 14]:
+                indicator = indicator_type(ParamStorage())
+                indicator.period.value = period
+                indicator.reset()
+                streamed = [indicator.forward(row) for row in ohlcv_list]
+                expected = indicator.calculate(ohlcv)
+                np.testing.assert_array_equal(
+                    np.array(streamed, dtype=np.float64), expected
+                )
 
     def test_precalc_sma(self):
         ohlcv_list = [(0, 0, 0, 1, 0), (0, 0, 0, 2, 0), (0, 0, 0, 1, 0)]
@@ -86,3 +101,72 @@ class TestIndicators(unittest.TestCase):
         self.assertEqual(sma.forward((0, 0, 0, 1, 0)), None)
         self.assertEqual(sma.forward((0, 0, 0, 2, 0)), 1.5)
         self.assertEqual(sma.forward((0, 0, 0, 1, 0)), 1.5)
+
+    def test_indicator_cache(self):
+        ohlcv = np.arange(1, 101, dtype=np.float64).repeat(5).reshape(100, 5)
+        previous_cache = Indicator.cache
+        Indicator.cache = IndicatorCache(max_bytes=2 * ohlcv.shape[0] * 8)
+        try:
+            param_storage = ParamStorage()
+            first, second = SMA(param_storage), SMA(param_storage)
+            first.period.value = second.period.value = 10
+            self.assertIs(first.series(ohlcv), second.series(ohlcv))
+            self.assertEqual(Indicator.cache.hits, 1)
+            self.assertEqual(Indicator.cache.misses, 1)
+            self.assertFalse(first.series(ohlcv).flags.writeable)
+
+            second.period.value = 20
+            RSI(param_storage).series(ohlcv)
+            second.series(ohlcv)
+            self.assertEqual(Indicator.cache.misses, 3)
+            self.assertEqual(Indicator.cache.evictions, 1)
+            self.assertEqual(Indicator.cache.stats()["entries"], 2)
+
+            del ohlcv
+            self.assertEqual(Indicator.cache.stats()["entries"], 0)
+            self.assertEqual(Indicator.cache.size, 0)
+        finally:
+            Indicator.cache = previous_cache
+
+    def test_indicator_plan(self):
+        rng = np.random.default_rng(0)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 500)))
+        ohlcv = np.column_stack(
+            [close, close * 1.01, close * 0.99, close, np.ones_like(close)]
+        )
+        ohlcv[:3, 3] = np.nan
+        previous_cache = Indicator.cache
+        Indicator.cache = IndicatorCache()
+        try:
+            param_storage = ParamStorage()
+            indicators = [
+                SMA(param_storage),
+                SMA(param_storage),
+                RSI(param_storage),
+                ATR(param_storage),
+                ATR(param_storage),
+            ]
+            for indicator, period in zip(indicators, [5, 5, 14, 7, 30]):
+                indicator.period.value = period
+
+            class Custom(SMA):
+                def fused(self):
+                    return None
+
+            custom = Custom(param_storage)
+            custom.period.value = 5
+            plan = IndicatorPlan([*indicators, custom])
+            self.assertEqual(plan.run(ohlcv), 5)
+            self.assertEqual(plan.run(ohlcv), 0)
+            misses = Indicator.cache.misses
+            for indicator in [*indicators, custom]:
+                self.assertTrue(
+                    np.array_equal(
+                        indicator.series(ohlcv),
+                        indicator.calculate(ohlcv),
+                        equal_nan=True,
+                    )
+                )
+            self.assertEqual(Indicator.cache.misses, misses)
+        finally:
+            Indicator.cache = previous_cache
@@ -0,0 +1,89 @@
+import unittest
+import pickle as pkl
+import numpy as np
+from fragments.params import ParamStorage
+from fragments.strategy import CrossoverStrategy
+from fragments.indicators import SMA, Indicator
+from fragments.optim import optimize
+from fragments import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        Indicator.enable_precalculation(self.ohlcv_list)
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+
+    def test_equity_metrics(self):
+        equity = np.array([100.0, 110.0, 99.0, 104.5, 121.0, 60.5, 70.0])
+        self.assertAlmostEqual(metrics.max_drawdown(equity), 0.5)
+        self.assertEqual(metrics.drawdown_duration(equity), 2)
+        self.assertEqual(metrics.drawdown_duration(np.arange(5.0)), 0)
+
+        returns = [0.1, -0.1, 5.5 / 99, 16.5 / 104.5, -0.5, 9.5 / 60.5]
+        self.assertAlmostEqual(
+            metrics.sharpe_ratio(equity, 1), np.mean(returns) / np.std(returns)
+        )
+        downside = np.sqrt(np.mean([min(i, 0) ** 2 for i in returns]))
+        self.assertAlmostEqual(
+            metrics.sortino_ratio(equity, 1), np.mean(returns) / downside
+        )
+        self.assertAlmostEqual(metrics.calmar_ratio(equity, 6), (0.7 - 1) / 0.5)
+        self.assertEqual(metrics.sharpe_ratio(np.full(5, 100.0)), 0.0)
+
+    def test_trade_metrics(self):
+        profits = np.array([100, 50, -100, -50, 100, 150, 50, 0], dtype=np.float64)
+        self.assertAlmostEqual(metrics.win_rate(profits), 5 / 8)
+        self.assertAlmostEqual(metrics.profit_factor(profits), 450 / 150)
+        self.assertAlmostEqual(metrics.sqn(profits), 1.38, 2)
+        self.assertEqual(metrics.profit_factor(np.array([1.0])), np.inf)
+        self.assertEqual(metrics.sqn(np.array([1.0])), 1.0)
+        self.assertEqual(metrics.sqn(np.array([-1.0, 0.0])), 0.0)
+
+    def test_compute_metrics(self):
+        param_storage = ParamStorage()
+        strategy = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+        strategy.first_indicator.period.value = 5
+        strategy.second_indicator.period.value = 20
+        strategy.forward_all(self.ohlcv_list)
+        result = metrics.compute_metrics(strategy)
+
+        curve = [100.0] + list(strategy.hist_equity)
+        peak, drawdown = curve[0], 0.0
+        for value in curve:
+            peak = max(peak, value)
+            drawdown = max(drawdown, (peak - value) / peak)
+        profits = [trade.profit for trade in strategy.trades]
+        self.assertNotEqual(len(profits), 0)
+        self.assertEqual(result.n_trades, len(profits))
+        self.assertAlmostEqual(result.total_profit, sum(profits))
+        self.assertAlmostEqual(result.max_drawdown, drawdown)
+        self.assertAlmostEqual(
+            result.win_rate, sum(i > 0 for i in profits) / len(profits)
+        )
+        objective = pkl.loads(pkl.dumps(metrics.objective("sharpe")))
+        self.assertEqual(objective(strategy), result.sharpe)
+        self.assertAlmostEqual(metrics.objective("max_drawdown")(strategy), -drawdown)
+        with self.assertRaises(ValueError):
+            metrics.objective("equity")
+
+    def test_optimize_objective(self):
+        param_storage = ParamStorage()
+        strategy = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+        results = optimize(
+            strategy,
+            metrics.objective("sortino"),
+            self.ohlcv_list,
+            n_calls=10,
+            random_state=42,
+        )
+        self.assertAlmostEqual(
+            -results.fun, metrics.compute_metrics(strategy).sortino
+        )
@@ -1,12 +1,25 @@
 import unittest
 import pickle as pkl
 import os
+import tempfile
+from unittest import mock
+import numpy as np
+from typing import Callable
 from fragments.params import ParamStorage
-from fragments.strategy import ConditionalStrategy, CrossoverStrategy, LimiterStrategy
+from fragments.strategy import (
+    Strategy,
+    ConditionalStrategy,
+    CrossoverStrategy,
+    CrossoverHandling,
+    LimiterStrategy,
+)
 from fragments.indicators import RSI, SMA, ATR, Indicator
 from fragments.stats import equity
 from fragments.optim import *
 
+# read by an objective in test_evaluation_cache
+SCALE = 1.0
+
 
 class TestOptim(unittest.TestCase):
     @unittest.skipIf(os.getenv("TEST_OPTIM") is None, "TEST_OPTIM is not set")
@@ -129,3 +142,264 @@ class TestOptim(unittest.TestCase):
         self.assertEqual(first_results.fun, second_results.fun)
         self.assertEqual(first_results.x, second_results.x)
         self.assertEqual(first_equity, second_equity)
+
+    def test_frozen_previous_layers(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+
+        def run(freeze_previous):
+            param_storage = ParamStorage()
+            strategies = list()
+            strategies.append(
+                CrossoverStrategy(
+                    SMA(param_storage), SMA(param_storage), param_storage
+                )
+            )
+            strategies.append(
+                ConditionalStrategy(RSI(param_storage), param_storage, strategies[-1])
+            )
+            optimize(strategies[-1], equity, ohlcv_list, n_calls=10, random_state=42)
+            first_equity = strategies[-1].equity
+
+            param_storage = ParamStorage()
+            strategies.append(
+                LimiterStrategy(ATR(param_storage), param_storage, strategies[-1])
+            )
+            self.assertIs(find_frozen_layer(strategies[-1]), strategies[-1])
+            results = optimize(
+                strategies[-1],
+                equity,
+                ohlcv_list,
+                freeze_previous=freeze_previous,
+                n_calls=10,
+                random_state=42,
+            )
+            self.assertIs(strategies[-1].previous, strategies[-2])
+            self.assertEqual(strategies[-2].equity, first_equity)
+            return results.fun, results.x, strategies[-1].equity
+
+        self.assertEqual(run(True), run(False))
+
+    def test_pruning(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        strategy = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+
+        def run(values, pruner):
+            param_storage.apply_cell_values(values)
+            score = pruner.evaluate(strategy, equity, ohlcv_list)
+            strategy.forward_all(ohlcv_list)
+            return score, equity(strategy)
+
+        pruner = Pruner(interval=20, tolerance=0.01)
+        best, expected = run([9, 7, CrossoverHandling.REGULAR], pruner)
+        self.assertEqual(best, expected)
+        score, expected = run([9, 7, CrossoverHandling.INVERTED], pruner)
+        self.assertLess(expected, 100)
+        self.assertLess(score, best)
+        self.assertEqual(pruner.pruned, 1)
+        self.assertEqual(pruner.bars_run + pruner.bars_skipped, 2 * len(ohlcv_list))
+
+        Strategy.set_fee(100.0)
+        try:
+            score, expected = run([9, 7, CrossoverHandling.REGULAR], pruner)
+        finally:
+            Strategy.set_fee(0.0)
+        self.assertEqual(score, expected)
+        self.assertEqual(pruner.bust, 1)
+
+        # pruned runs calculate their indicators like full runs do
+        with mock.patch.object(
+            Strategy, "prepare", autospec=True, side_effect=Strategy.prepare
+        ) as prepare:
+            pruner.evaluate(strategy, equity, ohlcv_list)
+        prepare.assert_called_once_with(strategy)
+
+        results = optimize(
+            strategy,
+            equity,
+            ohlcv_list,
+            pruner=Pruner(interval=20),
+            n_calls=10,
+            random_state=42,
+        )
+        self.assertEqual(results.pruning["evaluations"], 10)
+        self.assertEqual(-results.fun, strategy.equity)
+        with self.assertRaises(ValueError):
+            optimize(strategy, equity, ohlcv_list, n_jobs=2, pruner=Pruner())
+
+    def test_evaluation_cache(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        strategy = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "evaluations.pkl")
+            first = optimize(
+                strategy,
+                equity,
+                ohlcv_list,
+                cache=EvaluationCache(path),
+                n_calls=10,
+                random_state=42,
+            )
+            self.assertEqual(first.cache["misses"], 10 - first.cache["hits"])
+            second = optimize(
+                strategy,
+                equity,
+                ohlcv_list,
+                cache=EvaluationCache(path),
+                n_calls=10,
+                random_state=42,
+            )
+            self.assertEqual(second.cache["hit_rate"], 1.0)
+            self.assertEqual(list(second.func_vals), list(first.func_vals))
+            self.assertEqual(-second.fun, strategy.equity)
+
+        cache = EvaluationCache()
+        context = cache.context(strategy, equity, ohlcv_list)
+        self.assertEqual(context, cache.context(strategy, equity, list(ohlcv_list)))
+        self.assertNotEqual(context, cache.context(strategy, equity, ohlcv_list[1:]))
+        self.assertNotEqual(
+            context, cache.context(strategy, lambda s: s.equity, ohlcv_list)
+        )
+        limiter = LimiterStrategy(ATR(ParamStorage()), param_storage, strategy)
+        limited = cache.context(limiter, equity, ohlcv_list)
+        limiter.indicator.period.value += 1
+        self.assertNotEqual(limited, cache.context(limiter, equity, ohlcv_list))
+        self.assertEqual(
+            cache.key(context, [np.int64(5), CrossoverHandling.INVERTED]),
+            (context, (5, ("CrossoverHandling", 2))),
+        )
+
+        def scaled(k: float, floor: float = 0.0) -> Callable[[Strategy], float]:
+            return lambda s: max(s.equity * k, floor)
+
+        # closures differ by what they captured and by their defaults
+        scaled_context = cache.context(strategy, scaled(2.0), ohlcv_list)
+        self.assertEqual(
+            scaled_context, cache.context(strategy, scaled(2.0), ohlcv_list)
+        )
+        self.assertNotEqual(
+            scaled_context, cache.context(strategy, scaled(3.0), ohlcv_list)
+        )
+        self.assertNotEqual(
+            scaled_context, cache.context(strategy, scaled(2.0, 1.0), ohlcv_list)
+        )
+        self.assertNotEqual(
+            cache.context(strategy, lambda s, k=2: s.equity * k, ohlcv_list),
+            cache.context(strategy, lambda s, k=3: s.equity * k, ohlcv_list),
+        )
+
+        # so do functions by the globals they read
+        def scaled_global(s: Strategy) -> float:
+            return s.equity * SCALE
+
+        global SCALE
+        SCALE = 2.0
+        global_context = cache.context(strategy, scaled_global, ohlcv_list)
+        SCALE = 3.0
+        self.assertNotEqual(
+            global_context, cache.context(strategy, scaled_global, ohlcv_list)
+        )
+
+        # captured values that can't be fingerprinted are never persisted
+        opaque = object()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.pkl")
+            cache = EvaluationCache(path)
+            with self.assertWarns(UserWarning):
+                context = cache.context(
+                    strategy, lambda s: s.equity if opaque else 0.0, ohlcv_list
+                )
+            self.assertTrue(context.startswith(UNPERSISTED))
+            cache.put(context, [5, 20], 1.0)
+            self.assertEqual(cache.get(context, [5, 20]), 1.0)
+            cache.save()
+            self.assertEqual(len(EvaluationCache(path)), 0)
+
+    def test_checkpoint(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        strategy = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+        evaluations = list()
+
+        def interrupted(strategy: Strategy) -> float:
+            if len(evaluations) == 12:
+                raise KeyboardInterrupt
+            evaluations.append(strategy.param_storage.get_cell_values())
+            return equity(strategy)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.pkl")
+            with self.assertRaises(KeyboardInterrupt):
+                optimize(
+                    strategy,
+                    interrupted,
+                    ohlcv_list,
+                    checkpoint=Checkpoint(path, interval=5),
+                    n_calls=20,
+                    random_state=42,
+                )
+            self.assertEqual(len(Checkpoint(path)), 12)
+            evaluations.clear()
+            results = optimize(
+                strategy,
+                interrupted,
+                ohlcv_list,
+                checkpoint=Checkpoint(path),
+                n_calls=20,
+                random_state=42,
+            )
+            self.assertEqual(len(results.func_vals), 20)
+            self.assertEqual(len(evaluations), 8)
+            self.assertEqual(-results.fun, strategy.equity)
+            with self.assertRaises(ValueError):
+                optimize(strategy, equity, ohlcv_list, checkpoint=Checkpoint(path))
+
+            warm = optimize(
+                strategy,
+                equity,
+                ohlcv_list[:-10],
+                warm_start=Checkpoint(path),
+                n_calls=10,
+                random_state=42,
+            )
+            self.assertEqual(len(warm.func_vals), 30)
+            self.assertEqual(list(warm.func_vals[:20]), list(results.func_vals))
+
+            # points outside the bounds are not told and don't count as done
+            checkpoint = Checkpoint(path)
+            checkpoint.x_iters = [[1, 150, values[2]] for values in checkpoint.x_iters]
+            checkpoint.save()
+            evaluations.clear()
+            results = optimize(
+                strategy,
+                interrupted,
+                ohlcv_list,
+                checkpoint=Checkpoint(path),
+                n_calls=10,
+                random_state=42,
+            )
+            self.assertEqual(len(evaluations), 10)
+
+        checkpoint = Checkpoint(os.path.join(directory, "missing.pkl"))
+        checkpoint.x_iters = [
+            [1, 150, CrossoverHandling.INVERTED],
+            [5, 5, None],
+            [5, 20, CrossoverHandling.INVERTED],
+        ]
+        checkpoint.func_vals = [-1.0, -2.0, -3.0]
+        self.assertEqual(
+            checkpoint.points(param_storage.get_cell_bounds()),
+            ([[5, 20, CrossoverHandling.INVERTED]], [-3.0]),
+        )
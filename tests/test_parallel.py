@@ -0,0 +1,149 @@
+import unittest
+import pickle as pkl
+import numpy as np
+from fragments.params import ParamStorage
+from fragments.strategy import ConditionalStrategy, CrossoverStrategy, FrozenStrategy
+from fragments.indicators import RSI, SMA, Indicator
+from fragments.stats import equity
+from fragments.optim import optimize
+from fragments.context import BacktestContext
+from fragments.benchmark import gbm_ohlcv
+from fragments.parallel import (
+    SharedOHLCV,
+    ProcessPoolEvaluator,
+    ThreadPoolEvaluator,
+    evaluate_batch,
+)
+
+
+class TestParallel(unittest.TestCase):
+    def test_shared_ohlcv(self):
+        ohlcv = np.arange(25, dtype=np.float64).reshape(5, 5)
+        shared = SharedOHLCV(ohlcv)
+        shm, array = SharedOHLCV.attach(shared.descriptor())
+        np.testing.assert_array_equal(array, ohlcv)
+        self.assertFalse(array.flags.writeable)
+        del array
+        shm.close()
+        shared.close()
+
+    def test_process_pool_evaluator(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        strategy = ConditionalStrategy(RSI(param_storage), param_storage)
+        points = [[period, threshold, 1, 1] for period in (5, 10) for threshold in (30, 70)]
+
+        expected = list()
+        for values in points:
+            strategy.update_and_forward_all(values, ohlcv_list)
+            expected.append(-equity(strategy))
+        with ProcessPoolEvaluator(
+            strategy, equity, np.asarray(ohlcv_list), n_jobs=2
+        ) as evaluator:
+            self.assertEqual(evaluator(points), expected)
+
+    def test_process_pool_payload(self):
+        ohlcv = gbm_ohlcv(200000)
+        param_storage = ParamStorage()
+        strategy = ConditionalStrategy(
+            RSI(param_storage),
+            param_storage,
+            CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage),
+        )
+        # a chain bound to a context that precalculates on a large dataset
+        BacktestContext(0.1, ohlcv, param_storage).bind(strategy)
+        strategy.forward_all(ohlcv)  # type: ignore
+        self.assertGreater(len(pkl.dumps(ohlcv)), 8_000_000)
+        with ProcessPoolEvaluator(strategy, equity, ohlcv, n_jobs=1) as evaluator:
+            # the workers attach the shared OHLCV, the chain is sent without it
+            self.assertLess(len(pkl.dumps(evaluator.executor._initargs)), 50_000)
+        self.assertIs(strategy.context.precalc_ohlcv, ohlcv)
+
+    def test_thread_pool_evaluator(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        strategy = ConditionalStrategy(
+            RSI(param_storage),
+            param_storage,
+            CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage),
+        )
+        points = [
+            [5, 20, 1, period, threshold, 1, 1, 1]
+            for period in (5, 10)
+            for threshold in (30, 70)
+        ] * 4
+
+        expected = list()
+        for values in points:
+            strategy.update_and_forward_all(values, ohlcv_list)
+            expected.append(equity(strategy))
+        equity_before = strategy.equity
+        scores = evaluate_batch(strategy, equity, np.asarray(ohlcv_list), points, 4)
+        self.assertEqual(scores.tolist(), expected)
+        self.assertEqual(strategy.equity, equity_before)
+        with ThreadPoolEvaluator(
+            strategy, equity, np.asarray(ohlcv_list), n_jobs=2
+        ) as evaluator:
+            self.assertEqual(evaluator(points), [-value for value in expected])
+
+    def test_thread_pool_copies(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        crossover = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+        frozen = FrozenStrategy(crossover, crossover.record_actions(ohlcv_list))
+        strategy = ConditionalStrategy(RSI(ParamStorage()), ParamStorage(), frozen)
+        Indicator.enable_precalculation(ohlcv_list)
+        try:
+            strategy.forward_all(ohlcv_list)
+        finally:
+            Indicator.disable_precalculation()
+        indicator = strategy.indicator
+        self.assertIsNotNone(indicator._precalc_ohlcv)
+        with ThreadPoolEvaluator(
+            strategy, equity, np.asarray(ohlcv_list), n_jobs=2
+        ) as evaluator:
+            workers = [evaluator._chains.get().strategy for _ in range(2)]
+        for worker in workers:
+            self.assertIsNot(worker, strategy)
+            self.assertIsNone(worker.indicator._precalc_ohlcv)
+            self.assertFalse(hasattr(worker.indicator, "_precalc_result"))
+            self.assertEqual(len(worker.hist_equity), 0)
+            self.assertIsNot(worker.previous, frozen)
+            self.assertIs(worker.previous.strategy, crossover)  # type: ignore
+            self.assertIs(worker.previous.actions, frozen.actions)  # type: ignore
+
+    def test_optimize_batches_reproducible(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv_list = pkl.load(f)
+
+        def run(n_jobs, backend="process"):
+            param_storage = ParamStorage()
+            strategies = list()
+            strategies.append(
+                CrossoverStrategy(
+                    SMA(param_storage), SMA(param_storage), param_storage
+                )
+            )
+            strategies.append(
+                ConditionalStrategy(RSI(param_storage), param_storage, strategies[-1])
+            )
+            results = optimize(
+                strategies[-1],
+                equity,
+                ohlcv_list,
+                n_jobs=n_jobs,
+                backend=backend,
+                batch_size=4,
+                n_calls=12,
+                random_state=42,
+            )
+            self.assertEqual(len(results.func_vals), 12)
+            return results.fun, results.x, strategies[-1].equity
+
+        self.assertEqual(run(1), run(2))
+        self.assertEqual(run(1), run(2, "thread"))
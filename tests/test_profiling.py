@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import os
+import json
+import pickle as pkl
+import threading
+from fragments.params import ParamStorage
+from fragments.strategy import CrossoverStrategy, ConditionalStrategy
+from fragments.indicators import SMA, RSI
+from fragments.stats import equity
+from fragments.optim import optimize
+from fragments import profiling
+from fragments.profiling import Profiler
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        param_storage = ParamStorage()
+        self.strategy = ConditionalStrategy(
+            RSI(param_storage),
+            param_storage,
+            CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage),
+        )
+
+    def test_profile_optimize(self):
+        forward = CrossoverStrategy.forward
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            with Profiler(path, allocations=True) as profiler:
+                optimize(
+                    self.strategy,
+                    equity,
+                    self.ohlcv_list,
+                    n_calls=10,
+                    random_state=42,
+                )
+                with self.assertRaises(RuntimeError):
+                    Profiler().__enter__()
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+
+        self.assertIs(CrossoverStrategy.forward, forward)
+        self.assertIs(profiling.span("evaluation"), profiling._disabled)
+        spans = profiler.report()["spans"]
+        self.assertEqual(spans["evaluation"]["count"], 10)
+        self.assertEqual(spans["objective"]["count"], 10)
+        self.assertEqual(spans["surrogate:tell"]["count"], 10)
+        # one run to fit the bounds, ten evaluations and the final run
+        self.assertEqual(spans["forward_all"]["count"], 12)
+        self.assertEqual(
+            spans["forward:CrossoverStrategy"]["count"], 12 * len(self.ohlcv_list)
+        )
+        self.assertLess(
+            spans["forward:ConditionalStrategy"]["self"],
+            spans["forward:ConditionalStrategy"]["total"],
+        )
+        self.assertIsNone(spans["forward:CrossoverStrategy"]["net_blocks"])
+        self.assertIsNotNone(spans["evaluation"]["net_blocks"])
+        self.assertNotEqual(profiler.report()["allocations"], [])
+
+        names = {event["name"] for event in events}
+        self.assertIn("evaluation", names)
+        self.assertIn("reset:SMA", names)
+        self.assertNotIn("forward:CrossoverStrategy", names)
+        self.assertTrue(all(event["ph"] == "X" for event in events))
+
+    def test_threads(self):
+        entered, done = threading.Event(), threading.Event()
+
+        def inner():
+            entered.wait()
+            with profiling.span("inner"):
+                pass
+            done.set()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            with Profiler(path) as profiler:
+                thread = threading.Thread(target=inner)
+                thread.start()
+                with profiling.span("outer"):
+                    entered.set()
+                    done.wait()
+                thread.join()
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+
+        # a span on another thread is not a child of the one open here
+        outer = profiler.report()["spans"]["outer"]
+        self.assertEqual(outer["self"], outer["total"])
+        tids = {event["name"]: event["tid"] for event in events}
+        self.assertEqual(tids["outer"], threading.get_ident())
+        self.assertEqual(tids["inner"], thread.ident)
@@ -0,0 +1,89 @@
+import unittest
+import tempfile
+import os
+import pickle as pkl
+import numpy as np
+from fragments.dataset import Dataset
+from fragments.resample import resample, interval_label, parse_interval
+
+
+def reference(ohlcv_list, groups):
+    result = list()
+    for group in groups:
+        bars = [ohlcv_list[i] for i in group]
+        result.append(
+            (
+                bars[0][0],
+                max(i[1] for i in bars),
+                min(i[2] for i in bars),
+                bars[-1][3],
+                sum(i[4] for i in bars),
+            )
+        )
+    return result
+
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = [tuple(map(float, i)) for i in pkl.load(f)]
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_intervals(self):
+        self.assertEqual(parse_interval("15m"), 15 * 60 * 1000)
+        self.assertEqual(interval_label("120m"), "2h")
+        self.assertEqual(interval_label(7), "7bars")
+        with self.assertRaises(ValueError):
+            parse_interval("0h")
+        with self.assertRaises(ValueError):
+            interval_label("15 minutes")
+
+    def test_resample_bars(self):
+        ohlcv, timestamps = resample(np.asarray(self.ohlcv_list), 7)
+        groups = [
+            range(i, min(i + 7, len(self.ohlcv_list)))
+            for i in range(0, len(self.ohlcv_list), 7)
+        ]
+        np.testing.assert_allclose(ohlcv, reference(self.ohlcv_list, groups))
+        self.assertIsNone(timestamps)
+
+    def test_resample_time(self):
+        # daily bars with a gap, in weeks aligned to the epoch (a thursday)
+        day = 86_400_000
+        timestamps = np.arange(len(self.ohlcv_list), dtype=np.int64) * day
+        timestamps[30:] += 3 * day
+        ohlcv, resampled_timestamps = resample(
+            np.asarray(self.ohlcv_list), "1w", timestamps
+        )
+        weeks = timestamps // (7 * day)
+        groups = [np.flatnonzero(weeks == i) for i in np.unique(weeks)]
+        np.testing.assert_allclose(ohlcv, reference(self.ohlcv_list, groups))
+        np.testing.assert_array_equal(resampled_timestamps, np.unique(weeks) * 7 * day)
+
+    def test_dataset_cache(self):
+        path = os.path.join(self.directory.name, "GOOG")
+        timestamps = np.arange(len(self.ohlcv_list), dtype=np.int64) * 3_600_000
+        dataset = Dataset.create(path, self.ohlcv_list, {"symbol": "GOOG"}, timestamps)
+
+        resampled = dataset.resample("240m")
+        self.assertEqual(resampled.path, os.path.join(path, "resampled", "4h"))
+        self.assertEqual(resampled.metadata, {"symbol": "GOOG", "resampled_from": "4h"})
+        self.assertEqual(len(resampled), -(-len(self.ohlcv_list) // 4))
+        np.testing.assert_array_equal(resampled, dataset.resample(4))
+        np.testing.assert_array_equal(Dataset.open(path).resample("4h"), resampled)
+        self.assertIsInstance(
+            np.asarray(Dataset.open(path).resample("4h")).base, np.memmap
+        )
+
+        window = dataset[2:50].resample("4h")
+        self.assertIsNone(window.path)
+        groups = [range(2, 4)] + [range(i, i + 4) for i in range(4, 52, 4)]
+        groups[-1] = range(48, 50)
+        np.testing.assert_allclose(window, reference(self.ohlcv_list, groups))
+
+        Dataset.create(path, self.ohlcv_list[:10], timestamps=timestamps[:10])
+        self.assertFalse(os.path.exists(os.path.join(path, "resampled")))
+        self.assertEqual(len(Dataset.open(path).resample("4h")), 3)
@@ -0,0 +1,134 @@
+import unittest
+import tempfile
+import os
+import pickle as pkl
+import numpy as np
+from fragments.dataset import Dataset
+from fragments.params import ParamStorage
+from fragments.strategy import (
+    Strategy,
+    FrozenStrategy,
+    ConditionalStrategy,
+    ConditionType,
+    CrossoverStrategy,
+    CrossoverHandling,
+    LimiterStrategy,
+    InvertingStrategy,
+)
+from fragments.indicators import RSI, SMA, ATR
+from fragments.serialize import save_chain, load_chain
+
+
+class TestSerialize(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        self.dataset = Dataset.create(
+            os.path.join(self.directory.name, "GOOG"), self.ohlcv_list
+        )
+        self.path = os.path.join(self.directory.name, "chain.npz")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_strategy(self) -> Strategy:
+        param_storage = ParamStorage()
+        # the indicators create their cells before the layer that uses them
+        crossover = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+        crossover.first_indicator.period.value = 5  # type: ignore
+        crossover.second_indicator.period.value = 20  # type: ignore
+        crossover.crossover_handling.value = CrossoverHandling.INVERTED
+        conditional = ConditionalStrategy(
+            RSI(param_storage), param_storage, crossover
+        )
+        conditional.indicator.period.value = 14  # type: ignore
+        conditional.condition_threshold.value = 60
+        conditional.condition_type.value = ConditionType.MORE_THAN
+        limiter = LimiterStrategy(ATR(ParamStorage()), ParamStorage(), conditional)
+        strategy = InvertingStrategy(SMA(ParamStorage()), ParamStorage(), limiter)
+        strategy.indicator.period.value = 3  # type: ignore
+        return strategy
+
+    def assertSameChain(self, loaded: Strategy, strategy: Strategy):
+        while strategy is not None:
+            self.assertIs(type(loaded), type(strategy))
+            self.assertEqual(
+                loaded.param_storage.get_cell_values(),
+                strategy.param_storage.get_cell_values(),
+            )
+            self.assertEqual(
+                loaded.param_storage.get_cell_bounds(),
+                strategy.param_storage.get_cell_bounds(),
+            )
+            loaded, strategy = loaded.previous, strategy.previous  # type: ignore
+        self.assertIsNone(loaded)
+
+    def test_roundtrip(self):
+        strategy = self.create_strategy()
+        strategy.forward_all(self.dataset)
+        save_chain(strategy, self.path, self.dataset)
+        loaded = load_chain(self.path)
+        self.assertSameChain(loaded, strategy)
+        # without histories a loaded chain has not run yet
+        self.assertEqual((loaded.equity, loaded.iteration), (100.0, 0))
+        self.assertEqual(len(loaded.hist_equity), 0)
+        self.assertEqual(len(loaded.trades), 0)
+        # layers sharing a storage still do after loading
+        self.assertIs(
+            loaded.previous.previous.param_storage,  # type: ignore
+            loaded.previous.previous.previous.param_storage,  # type: ignore
+        )
+
+        loaded = load_chain(self.path, histories=True)
+        self.assertSameChain(loaded, strategy)
+        self.assertEqual(loaded.equity, strategy.equity)
+        np.testing.assert_array_equal(loaded.hist_equity, strategy.hist_equity)
+        self.assertEqual(loaded.trades.tolist(), strategy.trades.tolist())
+
+        # state that carries over between runs is kept
+        strategy.previous._limiter_threshold = 1.5  # type: ignore
+        strategy._invert = True
+        save_chain(strategy, self.path)
+        loaded = load_chain(self.path)
+        self.assertEqual(loaded.previous._limiter_threshold, 1.5)  # type: ignore
+        self.assertTrue(loaded._invert)  # type: ignore
+
+    def test_stored_histories(self):
+        strategy = self.create_strategy()
+        strategy.forward_all(self.ohlcv_list)
+        save_chain(strategy, self.path)
+        with self.assertRaises(ValueError):
+            load_chain(self.path, histories=True)
+
+        save_chain(strategy, self.path, histories=True)
+        self.assertEqual(load_chain(self.path).iteration, 0)
+        loaded = load_chain(self.path, histories=True)
+        self.assertEqual(
+            (loaded.equity, loaded.iteration), (strategy.equity, strategy.iteration)
+        )
+        np.testing.assert_array_equal(
+            loaded.previous.hist_equity, strategy.previous.hist_equity  # type: ignore
+        )
+        self.assertEqual(
+            loaded.previous.trades.tolist(),  # type: ignore
+            strategy.previous.trades.tolist(),  # type: ignore
+        )
+        loaded.forward_all(self.ohlcv_list)
+        self.assertEqual(loaded.equity, strategy.equity)
+
+    def test_frozen(self):
+        previous = self.create_strategy()
+        frozen = FrozenStrategy(previous, previous.record_actions(self.ohlcv_list))
+        strategy = ConditionalStrategy(RSI(ParamStorage()), ParamStorage(), frozen)
+        strategy.forward_all(self.ohlcv_list)
+        save_chain(strategy, self.path, self.dataset)
+        loaded = load_chain(self.path, histories=True)
+        self.assertIsInstance(loaded.previous, FrozenStrategy)
+        np.testing.assert_array_equal(
+            loaded.previous.actions, frozen.actions  # type: ignore
+        )
+        self.assertEqual(loaded.equity, strategy.equity)
+        self.assertEqual(loaded.previous.equity, frozen.equity)  # type: ignore
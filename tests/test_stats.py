@@ -21,10 +21,10 @@ class TestStats(unittest.TestCase):
         strategy.condition_type.value = ConditionType.MORE_THAN
         strategy.on_condition.value = Action.BUY
 
-        strategy.forward((0, 0, 0, 1, 0))
-        strategy.forward((0, 0, 0, 1, 0))
         strategy.forward((0, 0, 0, 1, 0))
         strategy.forward((0, 0, 0, 2, 0))
+        strategy.forward((0, 0, 0, 3, 0))
+        strategy.forward((0, 0, 0, 6, 0))
         self.assertEqual(total_profit(strategy), 100.0)
 
     def test_sqn(self):
@@ -1,7 +1,9 @@
 import unittest
+import pickle as pkl
 from fragments.strategy import *
 from typing import cast
-from fragments.indicators import RSI, ATR, SMA
+from fragments.indicators import RSI, ATR, SMA, Indicator
+from fragments.benchmark import gbm_ohlcv
 from fragments.params import ParamStorage
 
 
@@ -15,12 +17,12 @@ class TestStrategies(unittest.TestCase):
 
         strategy.forward((0, 0, 0, 1, 0))
         self.assertEqual(len(strategy.trades), 0)
-        strategy.forward((0, 0, 0, 1, 0))
+        strategy.forward((0, 0, 0, 2, 0))
         self.assertEqual(len(strategy.trades), 0)
-        strategy.forward((0, 0, 0, 1, 0))
+        strategy.forward((0, 0, 0, 3, 0))
         self.assertEqual(len(strategy.trades), 1)
         self.assertEqual(strategy.equity, 100.0)
-        strategy.forward((0, 0, 0, 2, 0))
+        strategy.forward((0, 0, 0, 6, 0))
         self.assertEqual(len(strategy.trades), 1)
         self.assertEqual(strategy.equity, 200.0)
 
@@ -29,8 +31,8 @@ class TestStrategies(unittest.TestCase):
         strategy = ConditionalStrategy(RSI(param_storage), param_storage)
 
         strategy.forward((0, 0, 0, 1, 0))
-        strategy.forward((0, 0, 0, 1, 0))
-        strategy.forward((0, 0, 0, 1, 0))
+        strategy.forward((0, 0, 0, 2, 0))
+        strategy.forward((0, 0, 0, 3, 0))
         self.assertEqual(strategy.condition_threshold.bounds, (0, 100))
 
     def test_crossover_strategy_and_equity_calculation(self):
@@ -169,3 +171,61 @@ class TestStrategies(unittest.TestCase):
         strategies[3].forward((0, 0, 0, 1, 0))
         strategies[3].forward((0, 0, 0, 1, 0))
         self.assertEqual(len(strategies[1].trades), 1)
+
+    def test_frozen_strategy(self):
+        param_storage = ParamStorage()
+        ohlcv_list = [(0, 0, 0, 1, 0)] * 3 + [(0, 0, 0, 2, 0)] * 3
+
+        strategies = list()
+        strategies.append(ConditionalStrategy(RSI(param_storage), param_storage))
+        strategies[0].condition_type.value = ConditionType.MORE_THAN
+        strategies[0].on_condition.value = Action.BUY
+        actions = strategies[0].record_actions(ohlcv_list)
+        self.assertEqual(actions.tolist(), [4, 4, 1, 1, 1, 1])
+
+        strategies.append(
+            ConditionalStrategy(
+                RSI(param_storage),
+                param_storage,
+                FrozenStrategy(strategies[0], actions),
+            )
+        )
+        strategies[1].condition_type.value = ConditionType.MORE_THAN
+        strategies[1].on_condition.value = Action.BUY
+        strategies[1].forward_all(ohlcv_list)
+        self.assertEqual(strategies[1].previous.iteration, len(ohlcv_list))
+        self.assertEqual(strategies[1].previous.equity, strategies[0].equity)
+        self.assertEqual(strategies[1].equity, 200.0)
+
+    def test_pickle_leaves_runs_behind(self):
+        def pickled(n_bars: int) -> bytes:
+            param_storage = ParamStorage()
+            strategy = LimiterStrategy(
+                ATR(param_storage),
+                param_storage,
+                ConditionalStrategy(
+                    RSI(param_storage),
+                    param_storage,
+                    CrossoverStrategy(
+                        SMA(param_storage), SMA(param_storage), param_storage
+                    ),
+                ),
+            )
+            ohlcv = gbm_ohlcv(n_bars)
+            Indicator.enable_precalculation(ohlcv)
+            try:
+                strategy.forward_all(ohlcv)  # type: ignore
+            finally:
+                Indicator.disable_precalculation()
+            self.assertEqual(len(strategy.hist_equity), n_bars)
+            return pkl.dumps(strategy)
+
+        # the size does not grow with the bars the chain last ran on, only the
+        # scalars of its state differ
+        self.assertLess(abs(len(pickled(10000)) - len(pickled(100))), 64)
+        restored = pkl.loads(pickled(100))
+        self.assertEqual(len(restored.hist_equity), 0)
+        self.assertEqual(len(restored.trades), 0)
+        self.assertIsNone(restored.indicator._precalc_ohlcv)  # type: ignore
+        restored.forward_all(gbm_ohlcv(100))
+        self.assertEqual(len(restored.hist_equity), 100)
@@ -0,0 +1,72 @@
+import unittest
+import pickle as pkl
+import numpy as np
+from fragments.params import ParamStorage
+from fragments.strategy import *
+from fragments.indicators import SMA, RSI, Indicator
+from fragments.sweep import sweep_crossover, sma_matrix
+from fragments.vectorized import forward_all
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        Indicator.enable_precalculation(self.ohlcv_list)
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+        Strategy.set_fee(0.0)
+
+    def test_sma_matrix(self):
+        close = np.asarray(self.ohlcv_list, dtype=np.float64)[:, 3].copy()
+        smas = sma_matrix(close, np.array([2, 30, 300]))
+        for row, period in zip(smas, (2, 30)):
+            self.assertTrue(np.isnan(row[: period - 1]).all())
+            np.testing.assert_allclose(
+                row[period - 1 :],
+                np.convolve(close, np.full(period, 1 / period), "valid"),
+                rtol=1e-6,
+            )
+        self.assertTrue(np.isnan(smas[2]).all())
+
+    def test_sweep(self):
+        Strategy.set_fee(0.1)
+        param_storage = ParamStorage()
+        strategy = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage
+        )
+        func = lambda strategy: strategy.equity
+        result = sweep_crossover(strategy, func, self.ohlcv_list)
+        self.assertEqual(result.scores.shape, (2, 119, 119))
+        np.testing.assert_array_equal(result.scores[1], result.scores[0].T)
+
+        first, second, handling = result.best
+        self.assertEqual(strategy.first_indicator.period.value, first)
+        self.assertEqual(strategy.crossover_handling.value, handling)
+        self.assertEqual(strategy.equity, result.fun)
+        for first, second in [(2, 3), (5, 20), (50, 10), (7, 7), (120, 2)]:
+            for h, handling in enumerate(result.handlings):
+                strategy.first_indicator.period.value = first
+                strategy.second_indicator.period.value = second
+                strategy.crossover_handling.value = handling
+                forward_all(strategy, self.ohlcv_list)
+                self.assertEqual(
+                    result.scores[h, first - 2, second - 2], func(strategy)
+                )
+
+    def test_sweep_previous(self):
+        param_storage = ParamStorage()
+        conditional = ConditionalStrategy(RSI(param_storage), param_storage)
+        conditional.condition_threshold.value = 60
+        conditional.condition_type.value = ConditionType.MORE_THAN
+        strategy = CrossoverStrategy(
+            SMA(param_storage), SMA(param_storage), param_storage, conditional
+        )
+        result = sweep_crossover(
+            strategy, lambda strategy: strategy.equity, self.ohlcv_list, range(2, 12)
+        )
+        self.assertEqual(result.scores.shape, (2, 10, 119))
+        self.assertFalse(np.isnan(result.scores).any())
+        strategy.forward_all(self.ohlcv_list)
+        self.assertEqual(strategy.equity, result.fun)
@@ -1,4 +1,6 @@
 import unittest
+import pickle as pkl
+import numpy as np
 from fragments.strategy import *
 
 
@@ -56,3 +58,42 @@ class TestTrade(unittest.TestCase):
         self.assertEqual(trade.liquidation, True)
         trade.forward((0, 0, 0, 5, 0))
         self.assertEqual(trade.profit, -100.0)
+
+
+class TestTradeLog(unittest.TestCase):
+    def test_growth_and_view(self):
+        trade_log = TradeLog(2)
+        for i in range(5):
+            trade_log.open(TradeDirection.LONG, 100.0, i * 2 + 1, 0.0)
+            trade_log.mark(1.0, i * 2 + 1)
+            trade_log.mark(1.5, i * 2 + 2)
+        self.assertEqual(len(trade_log), 5)
+        self.assertGreaterEqual(trade_log.capacity, 5)
+
+        trades = trade_log.view()
+        self.assertEqual(trades.profit.tolist(), [50.0] * 5)
+        self.assertEqual(trades.iteration.tolist(), [1, 3, 5, 7, 9])
+        self.assertEqual(trades[-1].exit_iteration, 10)
+        self.assertEqual(trades[-1].entry_close, 1.0)
+        self.assertEqual(trades[-1].exit_close, 1.5)
+        with self.assertRaises(ValueError):
+            trades.profit[0] = 0.0
+
+        restored = pkl.loads(pkl.dumps(trade_log))
+        np.testing.assert_array_equal(restored.view(), trades)
+
+    def test_matches_trade(self):
+        closes = [1.0, 1.5, 0.7, 2.2, 1.9]
+        for direction in TradeDirection:
+            trade = Trade(direction, 80.0, 1, 0.1)
+            trade_log = TradeLog()
+            trade_log.open(direction, 80.0, 1, 0.1)
+            for i, close in enumerate(closes):
+                trade.forward((0, 0, 0, close, 0))
+                trade_log.mark(close, i + 1)
+                self.assertEqual(trade_log.view()[0].profit, trade.profit)
+            self.assertEqual(trade_log.view()[0].liquidation, trade.liquidation)
+
+        converted = TradeLog.from_trades([trade])
+        self.assertEqual(converted.view()[0].profit, trade.profit)
+        self.assertEqual(converted.view()[0].exit_iteration, len(closes))
@@ -0,0 +1,102 @@
+import unittest
+import pickle as pkl
+import numpy as np
+from fragments.params import ParamStorage
+from fragments.strategy import Strategy, ConditionalStrategy, CrossoverStrategy
+from fragments.indicators import RSI, SMA, Indicator
+from fragments.context import current_context
+from fragments.stats import equity
+from fragments.optim import optimize
+from fragments.universe import Universe
+from fragments import compiled
+
+
+class TestUniverse(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            ohlcv = np.asarray(pkl.load(f), dtype=np.float64)
+        self.assets = {
+            "GOOG": ohlcv,
+            "DOUBLE": ohlcv * [2, 2, 2, 2, 1],
+            "TAIL": ohlcv[100:],
+            "REVERSED": ohlcv[::-1].copy(),
+        }
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+        Strategy.set_fee(0.0)
+
+    def create_strategy(self):
+        param_storage = ParamStorage()
+        strategy = ConditionalStrategy(
+            RSI(param_storage),
+            param_storage,
+            CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage),
+        )
+        strategy.condition_threshold.value = 50
+        strategy.previous.first_indicator.period.value = 5  # type: ignore
+        strategy.previous.second_indicator.period.value = 20  # type: ignore
+        return strategy
+
+    def test_evaluate(self):
+        fees = {"DOUBLE": 0.1}
+        expected = list()
+        for symbol, ohlcv in self.assets.items():
+            Strategy.set_fee(fees.get(symbol, 0.0))
+            strategy = self.create_strategy()
+            strategy.forward_all(ohlcv)
+            expected.append(strategy.equity)
+        Strategy.set_fee(0.0)
+
+        universe = Universe(self.assets, fees)
+        scores = universe.evaluate(self.create_strategy(), equity)
+        self.assertEqual(scores.tolist(), expected)
+        self.assertFalse(current_context().precalc)
+        self.assertEqual(current_context().fee, 0.0)
+
+        scores = universe.evaluate(self.create_strategy(), equity, compiled.forward_all)
+        self.assertEqual(scores.tolist(), expected)
+
+        with Universe(self.assets, fees, n_jobs=2) as parallel:
+            strategy = self.create_strategy()
+            strategy.forward_all(self.assets["GOOG"])  # type: ignore
+            self.assertEqual(parallel.evaluate(strategy, equity).tolist(), expected)
+            self.assertEqual(
+                parallel.objective(equity, aggregate="min")(strategy), min(expected)
+            )
+            executor = parallel._executor
+            # the workers get the chain without the data of its last run
+            sent = executor._initargs[0]  # type: ignore
+            self.assertEqual(len(sent.hist_equity), 0)
+            self.assertIsNone(sent._context)
+            parallel.evaluate(strategy, equity)
+            self.assertIs(parallel._executor, executor)
+            # another strategy gets workers of its own
+            parallel.evaluate(self.create_strategy(), equity)
+            self.assertIsNot(parallel._executor, executor)
+
+        curve = universe.portfolio_curve(self.create_strategy())
+        self.assertEqual(curve.shape, (len(self.assets["GOOG"]),))
+        self.assertAlmostEqual(curve[-1], np.mean(expected))
+
+    def test_optimize(self):
+        def run(n_jobs):
+            strategy = self.create_strategy()
+            with Universe(self.assets, n_jobs=n_jobs) as universe:
+                results = optimize(
+                    strategy,
+                    equity,
+                    universe,
+                    engine=compiled.forward_all,
+                    aggregate="median",
+                    n_calls=10,
+                    random_state=42,
+                )
+                self.assertEqual(-results.fun, np.median(universe.scores))
+                # the workers are shut down with the optimization
+                self.assertIsNone(universe._executor)
+            return results.fun, results.x, strategy.param_storage.get_cell_bounds()
+
+        sequential = run(1)
+        self.assertNotEqual(sequential[2][-4], (0, 1))
+        self.assertEqual(run(2), sequential)
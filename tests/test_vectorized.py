@@ -0,0 +1,85 @@
+import unittest
+import pickle as pkl
+from fragments.params import ParamStorage
+from fragments.strategy import *
+from fragments.indicators import RSI, SMA, ATR, Indicator
+from fragments.vectorized import forward_all
+
+
+def snapshot(strategy: Strategy):
+    layers = list()
+    layer = strategy
+    while layer is not None:
+        layers.append(
+            (
+                layer.equity,
+                list(layer.hist_equity),
+                [
+                    (t.direction, t.value, t.iteration, t.profit, t.liquidation)
+                    for t in layer.trades
+                ],
+                layer.action,
+            )
+        )
+        layer = layer.previous
+    return layers
+
+
+class TestVectorized(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        Indicator.enable_precalculation(self.ohlcv_list)
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+        Strategy.set_fee(0.0)
+
+    def test_conditional_strategy(self):
+        param_storage = ParamStorage()
+        strategy = ConditionalStrategy(RSI(param_storage), param_storage)
+        strategy.condition_threshold.value = 50
+        strategy.condition_type.value = ConditionType.MORE_THAN
+
+        strategy.forward_all(self.ohlcv_list)
+        expected = snapshot(strategy)
+        expected_bounds = strategy.condition_threshold.bounds
+        strategy._freeze_bounds = False
+        strategy.condition_threshold.bounds = (0, 1)
+        forward_all(strategy, self.ohlcv_list)
+        self.assertEqual(snapshot(strategy), expected)
+        self.assertEqual(strategy.condition_threshold.bounds, expected_bounds)
+        self.assertTrue(strategy._freeze_bounds)
+
+    def test_strategy_chain(self):
+        Strategy.set_fee(0.1)
+        param_storage = ParamStorage()
+
+        strategies = list()
+        strategies.append(
+            CrossoverStrategy(SMA(param_storage), SMA(param_storage), param_storage)
+        )
+        strategies[-1].first_indicator.period.value = 5
+        strategies[-1].second_indicator.period.value = 20
+        strategies.append(
+            ConditionalStrategy(RSI(param_storage), param_storage, strategies[-1])
+        )
+        strategies[-1].condition_threshold.value = 40
+        strategies[-1].condition_logic.value = ConditionLogic.SAMEAND
+        strategies[-1].on_condition.value = Action.SELL
+        strategies.append(
+            LimiterStrategy(ATR(param_storage), param_storage, strategies[-1])
+        )
+        strategies[-1].limiter_multiplier.value = 150
+        strategies.append(
+            InvertingStrategy(param_storage=param_storage, previous=strategies[-1])
+        )
+        strategies[-1].invert_drawdown_duration.value = 5
+
+        strategies[-1].forward_all(self.ohlcv_list)
+        expected = snapshot(strategies[-1])
+        strategies[-1]._invert = False
+        strategies[-2]._limiter_threshold = 0.0
+        forward_all(strategies[-1], self.ohlcv_list)
+        self.assertEqual(snapshot(strategies[-1]), expected)
+        self.assertNotEqual(len(strategies[-1].trades), 0)
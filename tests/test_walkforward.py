@@ -0,0 +1,105 @@
+import unittest
+import pickle as pkl
+import numpy as np
+from fragments.params import ParamStorage
+from fragments.strategy import ConditionalStrategy, CrossoverStrategy
+from fragments.indicators import RSI, SMA, Indicator
+from fragments.context import current_context
+from fragments.stats import equity
+from fragments.walkforward import Fold, FoldResult, split, stitch, walk_forward
+
+
+class TestWalkForward(unittest.TestCase):
+    def setUp(self):
+        with open("./data/GOOG.pkl", "rb") as f:
+            self.ohlcv_list = pkl.load(f)
+        Indicator.enable_precalculation(self.ohlcv_list)
+
+    def tearDown(self):
+        Indicator.disable_precalculation()
+
+    def test_split(self):
+        self.assertEqual(
+            split(10, 4, 2),
+            [
+                Fold(0, (0, 4), (4, 6)),
+                Fold(1, (2, 6), (6, 8)),
+                Fold(2, (4, 8), (8, 10)),
+            ],
+        )
+        self.assertEqual(
+            [fold.train for fold in split(10, 4, 2, anchored=True, step=3)],
+            [(0, 4), (0, 7)],
+        )
+        with self.assertRaises(ValueError):
+            split(10, 4, 2, step=1)
+
+    def test_stitch(self):
+        folds = [
+            FoldResult(Fold(0, (0, 1), (1, 3)), [], 0, 0, np.array([110.0, 120.0]), 0),
+            FoldResult(Fold(1, (0, 3), (3, 5)), [], 0, 0, np.array([50.0, 150.0]), 0),
+        ]
+        np.testing.assert_allclose(stitch(folds), [110.0, 120.0, 60.0, 180.0])
+
+    def test_shared_window(self):
+        ohlcv = np.asarray(self.ohlcv_list, dtype=np.float64)
+        window = ohlcv[50:120]
+        Indicator.cache.share_window(window, ohlcv, 50)
+        indicator = RSI(ParamStorage())
+        np.testing.assert_array_equal(
+            indicator.series(window), indicator.series(ohlcv)[50:120]
+        )
+        self.assertFalse(np.isnan(indicator.series(window)).any())
+
+    def test_warm_window(self):
+        ohlcv = np.asarray(self.ohlcv_list, dtype=np.float64)
+        window = ohlcv[50:120]
+        Indicator.cache.share_window(window, ohlcv, 50)
+        sma, rsi = SMA(ParamStorage()), RSI(ParamStorage())
+        for indicator in (sma, rsi):
+            indicator.period.value = 5  # type: ignore
+            # warm series are those of a run on the bars up to the window's end
+            np.testing.assert_array_equal(
+                indicator.series(window), indicator.series(ohlcv[:120])[50:]
+            )
+        # a cold window has no values until it has warmed up, then catches up
+        warm, cold = sma.series(window), sma.series(window.copy())
+        self.assertTrue(np.isnan(cold[:4]).all())
+        np.testing.assert_allclose(cold[4:], warm[4:])
+        warm, cold = rsi.series(window), rsi.series(window.copy())
+        self.assertFalse(np.isnan(warm).any())
+        self.assertGreater(abs(cold[10] - warm[10]), 0.1)
+        np.testing.assert_allclose(cold[40:], warm[40:], atol=1e-2)
+
+    def test_walk_forward(self):
+        def run(**kwargs):
+            param_storage = ParamStorage()
+            strategy = ConditionalStrategy(
+                RSI(param_storage),
+                param_storage,
+                CrossoverStrategy(
+                    SMA(param_storage), SMA(param_storage), param_storage
+                ),
+            )
+            return walk_forward(
+                strategy,
+                equity,
+                self.ohlcv_list,
+                120,
+                40,
+                n_calls=10,
+                random_state=42,
+                **kwargs
+            )
+
+        precalc_ohlcv = current_context().precalc_ohlcv
+        result = run()
+        self.assertEqual(len(result.folds), 3)
+        self.assertEqual(result.equity.shape, (120,))
+        self.assertTrue(all(fold.wall_time > 0 for fold in result.folds))
+        self.assertEqual(result.folds[0].test_score, result.folds[0].equity[-1])
+        self.assertIs(current_context().precalc_ohlcv, precalc_ohlcv)
+
+        parallel = run(n_jobs=2)
+        self.assertEqual(parallel.params, result.params)
+        np.testing.assert_array_equal(parallel.equity, result.equity)